@@ -998,7 +998,23 @@ class TrackerWindow(QWidget):
             self.label.setText("Error: Tracker not running.")
             return
 
-        data = self.tracker.stop()
+        # Emissions are computed and uploaded in the background, keep the UI responsive
+        self.stop_btn.setEnabled(False)
+        self.label.setText("⏳ Finalizing your session…")
+        self.stop_future = self.tracker.stop(wait=False)
+        self.stop_poll_timer = QTimer()
+        self.stop_poll_timer.timeout.connect(self.check_stop_finished)
+        self.stop_poll_timer.start(100)
+
+    def check_stop_finished(self):
+        if not self.stop_future.done():
+            return
+        self.stop_poll_timer.stop()
+        try:
+            data = self.stop_future.result()
+        except Exception as e:
+            QMessageBox.warning(self, "Tracking Error", f"Stopping the tracker failed:\n\n{e}")
+            data = None
 
         if data:
             self.label.setText(
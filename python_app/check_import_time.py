@@ -0,0 +1,96 @@
+"""
+Import-time budget of the codecarbon package, checked with `python -X importtime`.
+
+Importing codecarbon must stay cheap: it is imported by every tracked process,
+and the desktop app imports it when a session starts. The optional backends
+(HTTP and metrics outputs, GPU, Apple powermetrics, co2signal, pandas for the
+dashboard) are imported on first use, so this script fails when:
+
+* one of the modules of `LAZY_MODULES` is imported by `import codecarbon`;
+* the import takes longer than its budget, with the best of a few runs.
+
+cd python_app
+python check_import_time.py [--verbose]
+
+"""
+
+import os
+import re
+import subprocess
+import sys
+
+# Modules checked, with their budget in ms
+BUDGETS_MS = {
+    "codecarbon": 300,
+}
+# Modules that are only imported on first use
+LAZY_MODULES = (
+    "arrow",
+    "asyncio",
+    "cpuinfo",
+    "numpy",
+    "pandas",
+    "prometheus_client",
+    "pynvml",
+    "rapidfuzz",
+    "requests",
+)
+RUNS = 5
+IMPORTTIME_LINE = re.compile(r"^import time:\s+\d+ \|\s+(\d+) \|\s+(\S+)$")
+
+app_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+def import_times(module):
+    """
+    Cumulative import time (us) of each module imported by a fresh interpreter
+    importing `module`.
+    """
+    env = dict(os.environ, PYTHONPATH=app_dir)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            times[match.group(2)] = int(match.group(1))
+    return times
+
+
+def main():
+    verbose = "--verbose" in sys.argv
+    failed = False
+    for module, budget_ms in BUDGETS_MS.items():
+        # The first run also compiles the modules
+        import_times(module)
+        runs = [import_times(module) for _ in range(RUNS)]
+        best = min(runs, key=lambda times: times[module])
+        elapsed_ms = best[module] / 1000
+
+        lazy = [name for name in LAZY_MODULES if name in best]
+        if lazy:
+            print(f"{module} imports {', '.join(lazy)}, which should be lazy")
+            failed = True
+        if elapsed_ms > budget_ms:
+            print(
+                f"{module} takes {elapsed_ms:.0f} ms to import (budget {budget_ms} ms)"
+            )
+            failed = True
+        else:
+            print(f"{module}: {elapsed_ms:.0f} ms (budget {budget_ms} ms)")
+
+        if verbose:
+            for name, elapsed in sorted(best.items(), key=lambda item: -item[1])[:20]:
+                print(f"  {elapsed / 1000:8.1f} ms  {name}")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,10 +4,18 @@ The Carbon Tracker module. The following objects/decorators belong to the Public
 
 from ._version import __version__  # noqa
 from .emissions_tracker import (
+    AsyncEmissionsTracker,
+    AsyncOfflineEmissionsTracker,
     EmissionsTracker,
     OfflineEmissionsTracker,
     track_emissions,
 )
 
-__all__ = ["EmissionsTracker", "OfflineEmissionsTracker", "track_emissions"]
+__all__ = [
+    "AsyncEmissionsTracker",
+    "AsyncOfflineEmissionsTracker",
+    "EmissionsTracker",
+    "OfflineEmissionsTracker",
+    "track_emissions",
+]
 __app_name__ = "codecarbon"
@@ -2,10 +2,10 @@
 
 Based on https://kernelpanic.io/the-modern-way-to-call-apis-in-python
 
-TODO : use async call to API
+Emissions can be uploaded without blocking an event loop with httpx.
 """
 
-# from httpx import AsyncClient
+import asyncio
 import dataclasses
 import json
 from datetime import timedelta, tzinfo
@@ -60,6 +60,7 @@ class ApiClient:  # (AsyncClient)
         self.api_key = api_key
         self.conf = conf
         self.access_token = access_token
+        self._httpx_warned = False
         if self.experiment_id is not None and create_run_automatically:
             self._create_run(self.experiment_id)
 
@@ -196,7 +197,11 @@ class ApiClient:  # (AsyncClient)
             return None
         return r.json()
 
-    def add_emission(self, carbon_emission: dict):
+    def _prepare_emission(self, carbon_emission: dict):
+        """
+        Build the payload of an emission to upload.
+        :return: The payload, None if the emission can not be sent.
+        """
         assert self.experiment_id is not None
         if self.run_id is None:
             logger.warning(
@@ -208,12 +213,12 @@ class ApiClient:  # (AsyncClient)
                 logger.error(
                     "ApiClient.add_emission still no run_id, aborting for this time !"
                 )
-            return False
+            return None
         if carbon_emission["duration"] < 1:
             logger.warning(
                 "ApiClient : emissions not sent because of a duration smaller than 1."
             )
-            return False
+            return None
         emission = EmissionCreate(
             timestamp=get_datetime_with_timezone(),
             run_id=self.run_id,
@@ -228,8 +233,13 @@ class ApiClient:  # (AsyncClient)
             ram_energy=carbon_emission["ram_energy"],
             energy_consumed=carbon_emission["energy_consumed"],
         )
+        return dataclasses.asdict(emission)
+
+    def add_emission(self, carbon_emission: dict):
+        payload = self._prepare_emission(carbon_emission)
+        if payload is None:
+            return False
         try:
-            payload = dataclasses.asdict(emission)
             url = self.url + "/emissions"
             headers = self._get_headers()
             r = requests.post(url=url, json=payload, timeout=2, headers=headers)
@@ -242,6 +252,40 @@ class ApiClient:  # (AsyncClient)
             return False
         return True
 
+    async def add_emission_async(self, carbon_emission: dict):
+        """
+        Same as `add_emission`, without blocking the event loop.
+        Needs httpx, otherwise `add_emission` is run in a worker thread.
+        """
+        try:
+            from httpx import AsyncClient
+        except ImportError:
+            if not self._httpx_warned:
+                self._httpx_warned = True
+                logger.warning(
+                    "httpx is not installed, emissions are sent from a worker thread."
+                    + " Please install it using `pip install httpx`"
+                )
+            return await asyncio.get_running_loop().run_in_executor(
+                None, self.add_emission, carbon_emission
+            )
+        payload = self._prepare_emission(carbon_emission)
+        if payload is None:
+            return False
+        try:
+            url = self.url + "/emissions"
+            headers = self._get_headers()
+            async with AsyncClient(timeout=2) as client:
+                r = await client.post(url=url, json=payload, headers=headers)
+            if r.status_code != 201:
+                self._log_error(url, payload, r)
+                return False
+            logger.debug(f"ApiClient - Successful upload emission {payload} to {url}")
+        except Exception as e:
+            logger.error(e, exc_info=True)
+            return False
+        return True
+
     def _create_run(self, experiment_id: str):
         """
         Create the experiment for project_id
@@ -0,0 +1,162 @@
+"""
+Reads the resource usage of a cgroup v2, for tracking_mode="cgroup": the
+processes of a container or a Kubernetes pod, sidecars included.
+"""
+
+import os
+import re
+from typing import Dict, Optional, Tuple
+
+OCTAL_ESCAPE = re.compile(r"\\([0-7]{3})")
+
+
+def find_cgroup2_mount(
+    mountinfo: str = "/proc/self/mountinfo",
+) -> Optional[Tuple[str, str]]:
+    """
+    Mount point of the cgroup v2 hierarchy, e.g. /sys/fs/cgroup, or
+    /sys/fs/cgroup/unified on the hosts mounting both cgroup v1 and v2.
+    :return: The mount point, and the path of the hierarchy mounted there,
+             "/" unless a sub-tree is mounted, or None if it is not mounted.
+    """
+    try:
+        with open(mountinfo) as f:
+            lines = f.readlines()
+    except OSError:
+        return None
+    for line in lines:
+        # "36 35 0:30 / /sys/fs/cgroup rw,nosuid - cgroup2 cgroup2 rw", the
+        # optional fields before " - " vary in number
+        mount, _, filesystem = line.partition(" - ")
+        if filesystem.split(" ", 1)[0] != "cgroup2":
+            continue
+        fields = mount.split(" ")
+        # Spaces and backslashes are escaped as octal in the paths
+        root, mount_point = (
+            OCTAL_ESCAPE.sub(lambda match: chr(int(match.group(1), 8)), field)
+            for field in fields[3:5]
+        )
+        return mount_point, root
+    return None
+
+
+def find_cgroup(
+    path: Optional[str] = None,
+    root: Optional[str] = None,
+    proc_cgroup: str = "/proc/self/cgroup",
+    mountinfo: str = "/proc/self/mountinfo",
+) -> str:
+    """
+    Directory of a cgroup v2.
+    :param path: directory of the cgroup, absolute or relative to `root`.
+                 Defaults to the cgroup of the current process.
+    :param root: mount point of the cgroup v2 hierarchy, found in `mountinfo`
+                 by default.
+    :raises FileNotFoundError: without a cgroup v2 at `path`.
+    """
+    if path is not None and os.path.isdir(path):
+        directory = path
+    else:
+        mount = (root, "/") if root is not None else find_cgroup2_mount(mountinfo)
+        if mount is None:
+            raise FileNotFoundError(f"No cgroup v2 hierarchy mounted in {mountinfo}")
+        mount_point, mounted = mount
+        if path is None:
+            path = CGroup._read_own_cgroup(proc_cgroup)
+            # The cgroup is given from the root of the hierarchy, which may
+            # not be the one mounted, e.g. in a container
+            if mounted != "/" and (path == mounted or path.startswith(mounted + "/")):
+                path = path[len(mounted) :]
+        directory = os.path.normpath(os.path.join(mount_point, path.lstrip("/")))
+    if not os.path.isfile(os.path.join(directory, "cpu.stat")):
+        raise FileNotFoundError(f"No cgroup v2 with a cpu.stat file at {directory}")
+    return directory
+
+
+class CGroup:
+    """
+    A cgroup v2 directory, whose `cpu.stat`, `memory.current` and `cpu.max`
+    files are kept open and read with `os.pread`: reading the usage of the
+    cgroup costs a few sysfs reads, whatever the number of processes in it.
+    """
+
+    # cpu.stat holds a few lines of counters
+    READ_SIZE = 4096
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        root: Optional[str] = None,
+        proc_cgroup: str = "/proc/self/cgroup",
+        mountinfo: str = "/proc/self/mountinfo",
+    ):
+        """
+        :param path: directory of the cgroup, absolute or relative to `root`.
+                     Defaults to the cgroup of the current process.
+        :param root: mount point of the cgroup v2 hierarchy, found in
+                     `mountinfo` by default.
+        :param proc_cgroup: file giving the cgroup of the current process.
+        :param mountinfo: file listing the mount points of the current process.
+        :raises FileNotFoundError: without a cgroup v2 at `path`.
+        """
+        self.path = find_cgroup(path, root, proc_cgroup, mountinfo)
+        self._fds: Dict[str, int] = {}
+        for name in ("cpu.stat", "memory.current", "cpu.max"):
+            try:
+                self._fds[name] = os.open(os.path.join(self.path, name), os.O_RDONLY)
+            except OSError:
+                # memory.current and cpu.max do not exist in the root cgroup
+                continue
+
+    @staticmethod
+    def _read_own_cgroup(proc_cgroup: str) -> str:
+        """
+        Path of the cgroup v2 of the current process, relative to the root of
+        the hierarchy, from a line like "0::/kubepods/pod1234/container".
+        """
+        with open(proc_cgroup) as f:
+            for line in f:
+                hierarchy, _, path = line.strip().split(":", 2)
+                if hierarchy == "0":
+                    return path
+        raise FileNotFoundError(f"No cgroup v2 found in {proc_cgroup}")
+
+    def _read(self, name: str) -> Optional[str]:
+        fd = self._fds.get(name)
+        if fd is None:
+            return None
+        return os.pread(fd, self.READ_SIZE, 0).decode()
+
+    def cpu_usage(self) -> float:
+        """
+        Cumulative CPU time (s) used by the processes of the cgroup.
+        """
+        for line in self._read("cpu.stat").splitlines():
+            key, _, value = line.partition(" ")
+            if key == "usage_usec":
+                return int(value) / 1_000_000
+        return 0.0
+
+    def memory_bytes(self) -> Optional[int]:
+        """
+        Memory used by the processes of the cgroup, None if not available.
+        """
+        value = self._read("memory.current")
+        return int(value) if value else None
+
+    def cpu_limit(self) -> Optional[float]:
+        """
+        Number of CPUs the cgroup is allowed to use, None if it is not limited.
+        """
+        value = self._read("cpu.max")
+        if not value:
+            return None
+        quota, _, period = value.strip().partition(" ")
+        if quota == "max":
+            return None
+        return int(quota) / int(period or 100_000)
+
+    def close(self) -> None:
+        for fd in self._fds.values():
+            os.close(fd)
+        self._fds = {}
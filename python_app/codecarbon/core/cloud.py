@@ -1,7 +1,5 @@
 from typing import Any, Dict, Optional
 
-import requests
-
 from codecarbon.external.logger import logger
 
 
@@ -51,6 +49,8 @@ def get_env_cloud_details(timeout: int = 1) -> Optional[Any]:
         'region': 'us-east-1',
         'version': '2017-09-30'}}
     """
+    import requests
+
     for provider in CLOUD_METADATA_MAPPING.keys():
         try:
             params = CLOUD_METADATA_MAPPING[provider]
@@ -1,7 +1,5 @@
 from typing import Any, Dict
 
-import requests
-
 from codecarbon.core.units import EmissionsPerKWh, Energy
 from codecarbon.external.geography import GeoMetadata
 
@@ -37,6 +35,8 @@ def get_emissions(
         CO2SignalAPIError:
             If the CO2 Signal API request fails or returns an error.
     """
+    import requests
+
     params: Dict[str, Any]
     if geo.latitude:
         params = {"lat": geo.latitude, "lon": geo.longitude}
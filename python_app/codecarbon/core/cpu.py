@@ -4,19 +4,22 @@ using Intel Power Gadget
 https://software.intel.com/content/www/us/en/develop/articles/intel-power-gadget.html
 """
 
+import csv
+import json
 import os
 import re
 import shutil
 import subprocess
 import sys
-from typing import Dict, Optional, Tuple
+import threading
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 
-import pandas as pd
 import psutil
-from rapidfuzz import fuzz, process, utils
 
-from codecarbon.core.rapl import RAPLFile
-from codecarbon.core.units import Time
+from codecarbon.core.rapl import RAPLEnergyCounters, RAPLFile
+from codecarbon.core.units import Energy, Power, Time
 from codecarbon.core.util import detect_cpu_model
 from codecarbon.external.logger import logger
 from codecarbon.input import DataSource
@@ -24,6 +27,11 @@ from codecarbon.input import DataSource
 # default W value per core for a CPU if no model is found in the ref csv
 DEFAULT_POWER_PER_CORE = 4
 
+# Kinds of RAPL domains, matched against the start of the zone names
+RAPL_DOMAINS = ("package", "core", "uncore", "dram", "psys")
+# Names given to the measured domains, after the ones used by Power Gadget
+RAPL_DOMAIN_NAMES = {"package": "Processor", "dram": "DRAM", "psys": "Platform"}
+
 
 def is_powergadget_available() -> bool:
     """
@@ -208,14 +216,21 @@ class IntelPowerGadget:
         self._log_values()
         cpu_details = {}
         try:
-            cpu_data = pd.read_csv(self._log_file_path).dropna()
-            for col_name in cpu_data.columns:
+            with open(self._log_file_path, newline="") as f:
+                reader = csv.DictReader(f)
+                # Skip the incomplete rows, e.g. the summary at the end of the log
+                cpu_data = [
+                    row for row in reader if None not in row and all(row.values())
+                ]
+                col_names = reader.fieldnames or []
+            for col_name in col_names:
                 if col_name in ["System Time", "Elapsed Time (sec)", "RDTSC"]:
                     continue
+                values = [float(row[col_name]) for row in cpu_data]
                 if "Cumulative" in col_name:
-                    cpu_details[col_name] = cpu_data[col_name].iloc[-1]
+                    cpu_details[col_name] = values[-1]
                 else:
-                    cpu_details[col_name] = cpu_data[col_name].mean()
+                    cpu_details[col_name] = sum(values) / len(values)
         except Exception as e:
             logger.info(
                 f"Unable to read Intel Power Gadget logged file at {self._log_file_path}\n \
@@ -244,7 +259,9 @@ class IntelRAPL:
     Attributes:
         _lin_rapl_dir (str): The directory path where Intel RAPL files are located.
         _system (str): The platform of the running system, typically used to ensure compatibility.
+        _domains_filter (Optional[Sequence[str]]): Kinds of RAPL domains to read, all of them if None.
         _rapl_files (List[RAPLFile]): A list of RAPLFile objects representing the files to read energy data from.
+        _counters (RAPLEnergyCounters): The RAPL files, kept open and read in a single pass.
         _cpu_details (Dict): A dictionary storing the latest CPU energy details.
         _last_mesure (int): Placeholder for storing the last measurement time.
 
@@ -258,13 +275,31 @@ class IntelRAPL:
         get_static_cpu_details() -> Dict:
             Returns the CPU details without recalculating them.
 
+        get_package_energy(duration: Time) -> Energy:
+            Reads the energy consumed by the CPU packages since the last read.
+
+        get_package_power() -> Power:
+            Returns the power of the CPU packages over the last read.
+
+        get_domain_energy(duration: Time, domain: str) -> Energy:
+            Reads the energy consumed by a kind of RAPL domain, e.g. "dram" or "psys".
+
+        get_domain_power(domain: str) -> Power:
+            Returns the power of a kind of RAPL domain over the last read.
+
     """
 
-    def __init__(self, rapl_dir="/sys/class/powercap/intel-rapl/subsystem"):
+    def __init__(
+        self,
+        rapl_dir="/sys/class/powercap/intel-rapl/subsystem",
+        domains: Optional[Sequence[str]] = None,
+    ):
         self._lin_rapl_dir = rapl_dir
         self._system = sys.platform.lower()
+        self._domains_filter = domains
         self._rapl_files = []
         self._setup_rapl()
+        self._setup_counters()
         self._cpu_details: Dict = {}
 
         self._last_mesure = 0
@@ -284,64 +319,120 @@ class IntelRAPL:
         else:
             raise SystemError("Platform not supported by Intel RAPL Interface")
 
-    def _fetch_rapl_files(self) -> None:
+    def _list_rapl_zones(self) -> List[str]:
         """
-        Fetches RAPL files from the RAPL directory
+        List the directories of the RAPL zones, like `intel-rapl:$i`, along with
+        their sub-zones, like `intel-rapl:$i:$j`, whether they are listed next to
+        their parent or nested in it.
         """
+        zones = []
+        seen = set()
+        pending = [self._lin_rapl_dir]
+        while pending:
+            directory = pending.pop(0)
+            for entry in sorted(os.listdir(directory)):
+                if ":" not in entry:
+                    continue
+                path = os.path.join(directory, entry)
+                real_path = os.path.realpath(path)
+                if real_path in seen or not os.path.isdir(path):
+                    continue
+                seen.add(real_path)
+                zones.append(path)
+                pending.append(path)
+        return zones
 
-        # consider files like `intel-rapl:$i`
-        files = list(filter(lambda x: ":" in x, os.listdir(self._lin_rapl_dir)))
+    @staticmethod
+    def _get_domain(name: str) -> str:
+        """
+        Kind of RAPL domain from the name of its zone, e.g. "package-0".
+        """
+        for domain in RAPL_DOMAINS:
+            if name.startswith(domain):
+                return domain
+        return name
 
-        i = 0
-        for file in files:
-            path = os.path.join(self._lin_rapl_dir, file, "name")
+    def _fetch_rapl_files(self) -> None:
+        """
+        Fetches RAPL files from the RAPL directory
+        """
+        counts = Counter()
+        for zone in self._list_rapl_zones():
+            path = os.path.join(zone, "name")
             with open(path) as f:
                 name = f.read().strip()
-                # Fake the name used by Power Gadget
-                # We ignore "core" in name as it seems to be included in "package" for Intel CPU.
-                # TODO: Use "dram" for memory power
-                if "package" in name:
-                    name = f"Processor Energy Delta_{i}(kWh)"
-                    i += 1
-                # RAPL file to take measurement from
-                rapl_file = os.path.join(self._lin_rapl_dir, file, "energy_uj")
-                # RAPL file containing maximum possible value of energy_uj above which it wraps
-                rapl_file_max = os.path.join(
-                    self._lin_rapl_dir, file, "max_energy_range_uj"
-                )
-                try:
-                    # Try to read the file to be sure we can
-                    with open(rapl_file, "r") as f:
-                        _ = float(f.read())
-                    self._rapl_files.append(
-                        RAPLFile(name=name, path=rapl_file, max_path=rapl_file_max)
+            domain = self._get_domain(name)
+            if self._domains_filter is not None and domain not in self._domains_filter:
+                continue
+            # Fake the name used by Power Gadget
+            # We ignore "core" in name as it seems to be included in "package" for Intel CPU.
+            if domain in RAPL_DOMAIN_NAMES:
+                name = f"{RAPL_DOMAIN_NAMES[domain]} Energy Delta_{counts[domain]}(kWh)"
+                counts[domain] += 1
+            # RAPL file to take measurement from
+            rapl_file = os.path.join(zone, "energy_uj")
+            # RAPL file containing maximum possible value of energy_uj above which it wraps
+            rapl_file_max = os.path.join(zone, "max_energy_range_uj")
+            try:
+                # Try to read the file to be sure we can
+                with open(rapl_file, "r") as f:
+                    _ = float(f.read())
+                self._rapl_files.append(
+                    RAPLFile(
+                        name=name,
+                        path=rapl_file,
+                        max_path=rapl_file_max,
+                        domain=domain,
                     )
-                    logger.debug("We will read Intel RAPL files at %s", rapl_file)
-                except PermissionError as e:
-                    raise PermissionError(
-                        "PermissionError : Unable to read Intel RAPL files for CPU power, we will use a constant for your CPU power."
-                        + " Please view https://github.com/mlco2/codecarbon/issues/244"
-                        + " for workarounds : %s",
-                        e,
-                    ) from e
+                )
+                logger.debug("We will read Intel RAPL files at %s", rapl_file)
+            except PermissionError as e:
+                raise PermissionError(
+                    "PermissionError : Unable to read Intel RAPL files for CPU power, we will use a constant for your CPU power."
+                    + " Please view https://github.com/mlco2/codecarbon/issues/244"
+                    + " for workarounds : %s",
+                    e,
+                ) from e
+
+    @property
+    def domains(self) -> List[str]:
+        """
+        Kinds of RAPL domains found, e.g. ["package", "dram", "psys"].
+        """
+        return list(self._domain_indexes)
 
-    def get_cpu_details(self, duration: Time) -> Dict:
+    def has_domain(self, domain: str) -> bool:
+        return domain in self._domain_indexes
+
+    def _setup_counters(self) -> None:
         """
-        Fetches the CPU Energy Deltas by fetching values from RAPL files
+        Keep the RAPL files open and preallocate the arrays the counters are
+        read into, so that a measure does not allocate per domain.
         """
-        cpu_details = {}
-        try:
-            list(map(lambda rapl_file: rapl_file.delta(duration), self._rapl_files))
+        self._counters = RAPLEnergyCounters(self._rapl_files)
+        count = len(self._counters)
+        self._readings = array("d", bytes(8 * count))
+        self._last_readings = array("d", bytes(8 * count))
+        # Energy in micro-joules and power in W of each domain over the last measure
+        self._energy_deltas_uj = array("d", bytes(8 * count))
+        self._powers_W = array("d", bytes(8 * count))
+        self._domain_indexes: Dict[str, List[int]] = {}
+        for i, rapl_file in enumerate(self._rapl_files):
+            self._domain_indexes.setdefault(rapl_file.domain, []).append(i)
+        # Power in W of each kind of domain over the last measure
+        self._domain_power_W: Dict[str, float] = dict.fromkeys(
+            self._domain_indexes, 0.0
+        )
 
-            for rapl_file in self._rapl_files:
-                logger.debug(rapl_file)
-                cpu_details[rapl_file.name] = rapl_file.energy_delta.kWh
-                # We fake the name used by Power Gadget when using RAPL
-                if "Energy" in rapl_file.name:
-                    cpu_details[rapl_file.name.replace("Energy", "Power")] = (
-                        rapl_file.power.W
-                    )
-        except Exception as e:
+    def _read_deltas(self, duration: Time) -> bool:
+        """
+        Read all the RAPL domains in one pass and compute the energy and power
+        of each of them since the last read.
+        :return: False if the counters could not be read.
+        """
+        try:
+            self._counters.read(self._readings)
+        except (OSError, ValueError) as e:
             logger.info(
                 "Unable to read Intel RAPL files at %s\n \
                 Exception occurred %s",
@@ -349,6 +440,71 @@ class IntelRAPL:
                 e,
                 exc_info=True,
             )
+            for domain in self._domain_power_W:
+                self._domain_power_W[domain] = 0.0
+            return False
+        seconds = duration.seconds
+        max_uj = self._counters.max_uj
+        for i, reading in enumerate(self._readings):
+            delta = reading - self._last_readings[i]
+            if delta < 0:
+                # The counter wrapped around
+                delta += max_uj[i]
+            self._energy_deltas_uj[i] = delta
+            self._powers_W[i] = delta * 1e-6 / seconds if seconds > 0 else 0.0
+            self._last_readings[i] = reading
+        for domain, indexes in self._domain_indexes.items():
+            self._domain_power_W[domain] = sum(self._powers_W[i] for i in indexes)
+        return True
+
+    def get_domain_energy(self, duration: Time, domain: str) -> Energy:
+        """
+        Energy consumed by the RAPL domains of a kind, e.g. "dram", since the
+        last read. All the domains are read: the other kinds will only count
+        the energy consumed from now on.
+        Also updates the power returned by `get_domain_power()`.
+        """
+        if not self._read_deltas(duration):
+            return Energy.from_energy(0.0)
+        return Energy.from_ujoules(
+            sum(self._energy_deltas_uj[i] for i in self._domain_indexes.get(domain, []))
+        )
+
+    def get_domain_power(self, domain: str) -> Power:
+        """
+        Power of the RAPL domains of a kind over the last read, without reading
+        them again.
+        """
+        return Power.from_watts(self._domain_power_W.get(domain, 0.0))
+
+    def get_package_energy(self, duration: Time) -> Energy:
+        """
+        Energy consumed by the CPU packages since the last read.
+        Also updates the power returned by `get_package_power()`.
+        """
+        return self.get_domain_energy(duration, "package")
+
+    def get_package_power(self) -> Power:
+        """
+        Power of the CPU packages over the last read, without reading them again.
+        """
+        return self.get_domain_power("package")
+
+    def get_cpu_details(self, duration: Time) -> Dict:
+        """
+        Fetches the CPU Energy Deltas by fetching values from RAPL files
+        """
+        cpu_details = {}
+        if self._read_deltas(duration):
+            for i, rapl_file in enumerate(self._rapl_files):
+                cpu_details[rapl_file.name] = Energy.from_ujoules(
+                    self._energy_deltas_uj[i]
+                ).kWh
+                # We fake the name used by Power Gadget when using RAPL
+                if "Energy" in rapl_file.name:
+                    cpu_details[rapl_file.name.replace("Energy", "Power")] = (
+                        self._powers_W[i]
+                    )
         self._cpu_details = cpu_details
         logger.debug("get_cpu_details %s", self._cpu_details)
         return cpu_details
@@ -363,8 +519,165 @@ class IntelRAPL:
         """
         Starts monitoring CPU energy consumption.
         """
-        for rapl_file in self._rapl_files:
-            rapl_file.start()
+        self._counters.read(self._last_readings)
+
+    def energy_counters(self) -> RAPLEnergyCounters:
+        """
+        Open the counters of the CPU packages for high-frequency reads.
+        """
+        return RAPLEnergyCounters(
+            [
+                rapl_file
+                for rapl_file in self._rapl_files
+                if rapl_file.domain == "package"
+            ]
+        )
+
+
+class CPUPowerIndex:
+    """
+    Index of the TDP of the CPU models listed in `data/hardware/cpu_power.csv`,
+    to match a CPU model without a fuzzy search over every row:
+
+    * an exact map of the lower-cased names, for direct matches;
+    * an inverted index of the tokens of the names, for token set matches.
+
+    The index of the packaged CSV is built once per process, see `shared()`.
+    """
+
+    _shared: Optional["CPUPowerIndex"] = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, rows: Iterable[Tuple[str, float]]):
+        """
+        :param rows: (name, TDP in W) of each CPU model, in the order of preference
+                     for ambiguous matches.
+        """
+        from rapidfuzz import utils
+
+        self.names: List[str] = []
+        # TDP as found in the rows, only parsed when looked up
+        self._tdps: Dict[str, str] = {}
+        self._lower_names: Dict[str, str] = {}
+        self._tokens: List[int] = []
+        self._postings: Dict[str, List[int]] = {}
+        for i, (name, tdp) in enumerate(rows):
+            self.names.append(name)
+            self._tdps.setdefault(name, tdp)
+            self._lower_names.setdefault(name.lower(), name)
+            tokens = set(utils.default_process(name).split())
+            # Only the number of tokens of each name is needed to match
+            self._tokens.append(len(tokens))
+            for token in tokens:
+                self._postings.setdefault(token, []).append(i)
+
+    @classmethod
+    def from_csv(cls, path) -> "CPUPowerIndex":
+        with open(path, newline="", encoding="utf-8") as f:
+            return cls((row["Name"], row["TDP"]) for row in csv.DictReader(f))
+
+    @classmethod
+    def shared(cls) -> "CPUPowerIndex":
+        """
+        The index of the packaged CSV, built on first use.
+        """
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls(DataSource().get_cpu_power_rows())
+            return cls._shared
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def get_tdp(self, name: str) -> Optional[float]:
+        tdp = self._tdps.get(name)
+        return float(tdp) if tdp is not None else None
+
+    def find_direct(self, model: str) -> Optional[str]:
+        """
+        First name equal to `model`, ignoring the case.
+        """
+        return self._lower_names.get(model.lower())
+
+    def find_token_set(self, model: str) -> List[str]:
+        """
+        Names whose tokens are a subset or a superset of the tokens of `model`,
+        in the order of the rows.
+        """
+        from rapidfuzz import utils
+
+        tokens = set(utils.default_process(model).split())
+        if not tokens:
+            return []
+        # Number of tokens of the model found in each row
+        hits: Dict[int, int] = {}
+        for token in tokens:
+            for i in self._postings.get(token, ()):
+                hits[i] = hits.get(i, 0) + 1
+        return [
+            self.names[i]
+            for i in sorted(hits)
+            if hits[i] == len(tokens) or hits[i] == self._tokens[i]
+        ]
+
+
+class TDPCache:
+    """
+    TDP resolved for the CPU models of this machine, persisted between runs so
+    that `TDP` neither loads the CSV of CPU models nor searches it again.
+
+    Entries are keyed by the raw model returned by `detect_cpu_model()`, and
+    dropped when the CSV of CPU models changes. The cache lives in
+    `$XDG_CACHE_HOME/codecarbon`, `~/.cache/codecarbon` by default.
+    """
+
+    FILE_NAME = "cpu_tdp.json"
+
+    def __init__(self, path: Optional[str] = None):
+        if path is None:
+            cache_dir = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+                os.path.expanduser("~"), ".cache"
+            )
+            path = os.path.join(cache_dir, "codecarbon", self.FILE_NAME)
+        self.path = path
+        self._data_version = self._get_data_version()
+
+    @staticmethod
+    def _get_data_version() -> str:
+        try:
+            stat = os.stat(DataSource().cpu_power_path)
+            return f"{stat.st_size}-{stat.st_mtime_ns}"
+        except OSError:
+            return ""
+
+    def _load(self) -> Dict:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                content = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if content.get("data_version") != self._data_version:
+            return {}
+        return content.get("models", {})
+
+    def get(self, model: str) -> Optional[Dict]:
+        """
+        :return: {"name": matched name or None, "tdp": TDP in W or None} if the
+                 model was already resolved, else None.
+        """
+        return self._load().get(model)
+
+    def set(self, model: str, name: Optional[str], tdp: Optional[float]) -> None:
+        models = self._load()
+        models[model] = {"name": name, "tdp": tdp}
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"data_version": self._data_version, "models": models}, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.debug(f"Unable to write the CPU TDP cache {self.path}: {e}")
 
 
 class TDP:
@@ -389,20 +702,26 @@ class TDP:
         self.model, self.tdp = self._main()
 
     @staticmethod
-    def _get_cpu_constant_power(match: str, cpu_power_df: pd.DataFrame) -> int:
+    def _get_cpu_constant_power(match: str, cpu_index: "CPUPowerIndex") -> int:
         """Extract constant power from matched CPU"""
-        return float(cpu_power_df[cpu_power_df["Name"] == match]["TDP"].values[0])
+        return cpu_index.get_tdp(match)
 
     def _get_cpu_power_from_registry(self, cpu_model_raw: str) -> Optional[int]:
-        cpu_power_df = DataSource().get_cpu_power_data()
-        cpu_matching = self._get_matching_cpu(cpu_model_raw, cpu_power_df)
+        cache = TDPCache()
+        cached = cache.get(cpu_model_raw)
+        if cached is not None:
+            logger.debug(f"CPU : TDP of {cpu_model_raw} read from {cache.path}")
+            return cached["tdp"]
+        cpu_index = CPUPowerIndex.shared()
+        cpu_matching = self._get_matching_cpu(cpu_model_raw, cpu_index)
+        power = None
         if cpu_matching:
-            power = self._get_cpu_constant_power(cpu_matching, cpu_power_df)
-            return power
-        return None
+            power = self._get_cpu_constant_power(cpu_matching, cpu_index)
+        cache.set(cpu_model_raw, cpu_matching, power)
+        return power
 
     def _get_matching_cpu(
-        self, model_raw: str, cpu_df: pd.DataFrame, greedy=False
+        self, model_raw: str, cpu_index: "CPUPowerIndex", greedy=False
     ) -> str:
         """
         Get matching cpu name
@@ -410,7 +729,9 @@ class TDP:
         :args:
             model_raw (str): raw name of the cpu model detected on the machine
 
-            cpu_df (DataFrame): table containing cpu models along their tdp
+            cpu_index (CPUPowerIndex): index of the cpu models along their tdp.
+            A mapping of the "Name" and "TDP" columns, e.g. a DataFrame, is
+            also accepted.
 
             greedy (default False): if multiple cpu models match with an equal
             ratio of similarity, greedy (True) selects the first model,
@@ -425,25 +746,19 @@ class TDP:
             still enables the relative comparison of models emissions running
             on the same machine.
 
-            THRESHOLD_DIRECT defines the similarity ratio value to consider
-            almost-exact matches.
+            Direct matches are names equal to the model, ignoring the case, as
+            with a `fuzz.ratio` of 100.
 
-            THRESHOLD_TOKEN_SET defines the similarity ratio value to consider
-            token_set matches (for more detail see fuzz.token_set_ratio).
+            Token set matches are names whose tokens are a subset or a superset
+            of the tokens of the model, as with a `fuzz.token_set_ratio` of 100.
         """
-        THRESHOLD_DIRECT: int = 100
-        THRESHOLD_TOKEN_SET: int = 100
+        if not isinstance(cpu_index, CPUPowerIndex):
+            cpu_index = CPUPowerIndex(zip(cpu_index["Name"], cpu_index["TDP"]))
 
-        direct_match = process.extractOne(
-            model_raw,
-            cpu_df["Name"],
-            processor=lambda s: s.lower(),
-            scorer=fuzz.ratio,
-            score_cutoff=THRESHOLD_DIRECT,
-        )
+        direct_match = cpu_index.find_direct(model_raw)
 
         if direct_match:
-            return direct_match[0]
+            return direct_match
 
         model_raw = model_raw.replace("(R)", "")
         start_cpu = model_raw.find(" CPU @ ")
@@ -451,31 +766,15 @@ class TDP:
             model_raw = model_raw[0:start_cpu]
         model_raw = model_raw.replace(" CPU", "")
         model_raw = re.sub(r" @\s*\d+\.\d+GHz", "", model_raw)
-        direct_match = process.extractOne(
-            model_raw,
-            cpu_df["Name"],
-            processor=lambda s: s.lower(),
-            scorer=fuzz.ratio,
-            score_cutoff=THRESHOLD_DIRECT,
-        )
+        direct_match = cpu_index.find_direct(model_raw)
 
         if direct_match:
-            return direct_match[0]
-        indirect_matches = process.extract(
-            model_raw,
-            cpu_df["Name"],
-            processor=utils.default_process,
-            scorer=fuzz.token_set_ratio,
-            score_cutoff=THRESHOLD_TOKEN_SET,
-        )
+            return direct_match
+        indirect_matches = cpu_index.find_token_set(model_raw)
 
         if indirect_matches:
-            if (
-                greedy
-                or len(indirect_matches) == 1
-                or indirect_matches[0][1] != indirect_matches[1][1]
-            ):
-                return indirect_matches[0][0]
+            if greedy or len(indirect_matches) == 1:
+                return indirect_matches[0]
 
         return None
 
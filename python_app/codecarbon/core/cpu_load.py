@@ -0,0 +1,349 @@
+"""
+Estimation of the CPU load from the cumulative CPU times, and of the CPU power
+from that load.
+
+The load is the share of CPU time spent busy between two reads of the counters,
+so reading it never waits: each read is O(1) and returns the load since the
+previous one, whatever the interval between them.
+"""
+
+import math
+import re
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional, Sequence
+
+import psutil
+
+from codecarbon.core.cgroup import CGroup
+from codecarbon.core.process_tree import ProcessTree
+from codecarbon.external.logger import logger
+from codecarbon.input import DataSource
+
+# A load curve gives the power (W) of a CPU from its TDP (W) and its load (0-1)
+LoadCurve = Callable[[float, float], float]
+
+
+def linear_load_curve(tdp: float, load: float) -> float:
+    """
+    Power proportional to the load.
+    """
+    return tdp * load
+
+
+def cubic_load_curve(tdp: float, load: float) -> float:
+    """
+    Cubic relationship with a minimum of 10% of the TDP.
+    """
+    return tdp * (0.1 + 0.9 * load**3)
+
+
+def threadripper_load_curve(tdp: float, load: float) -> float:
+    """
+    Curve fitted on AMD Ryzen Threadripper CPUs.
+    """
+    if load < 0.1:  # Below 10% CPU load
+        return tdp * (0.05 * load * 10)
+    elif load <= 0.3:  # 10-30% load - linear phase
+        return tdp * (0.05 + 1.8 * (load - 0.1))
+    elif load <= 0.5:  # 30-50% load - adjusted coefficients
+        # Increased base power and adjusted curve
+        base_power = 0.45  # Increased from 0.41
+        power_range = 0.50  # Increased from 0.44
+        factor = ((load - 0.3) / 0.2) ** 1.8  # Reduced power from 2.0 to 1.8
+        return tdp * (base_power + power_range * factor)
+    else:  # Above 50% - plateau phase
+        return tdp * (0.85 + 0.15 * (1 - math.exp(-(load - 0.5) * 5)))
+
+
+class TableLoadCurve:
+    """
+    Curve given by the share of the TDP used at evenly spaced loads from 0 to 1,
+    interpolated linearly between them: evaluating it is O(1).
+    """
+
+    def __init__(self, shares: Sequence[float]):
+        if len(shares) < 2:
+            raise ValueError("A load curve table needs at least 2 values")
+        self.shares = tuple(float(share) for share in shares)
+        self._last_index = len(self.shares) - 1
+
+    def __call__(self, tdp: float, load: float) -> float:
+        position = min(max(load, 0.0), 1.0) * self._last_index
+        index = min(int(position), self._last_index - 1)
+        low = self.shares[index]
+        return tdp * (low + (position - index) * (self.shares[index + 1] - low))
+
+    def __repr__(self) -> str:
+        return f"TableLoadCurve({list(self.shares)})"
+
+
+# Curves available by name, can be extended with custom curves
+LOAD_CURVES: Dict[str, LoadCurve] = {
+    "linear": linear_load_curve,
+    "cubic": cubic_load_curve,
+    "threadripper": threadripper_load_curve,
+}
+
+# Curves fitted on the measurements of data/hardware/cpu_load_profiling, by CPU
+# family, loaded on first use
+_fitted_load_curves: Optional[Dict[str, TableLoadCurve]] = None
+_fitted_load_curves_lock = threading.Lock()
+
+
+def get_fitted_load_curves() -> Dict[str, TableLoadCurve]:
+    """
+    The curves fitted for each CPU family, see
+    `data/hardware/cpu_load_profiling/fit_load_curves.py`.
+    """
+    global _fitted_load_curves
+    with _fitted_load_curves_lock:
+        if _fitted_load_curves is None:
+            try:
+                data = DataSource().get_cpu_load_curves_data()
+                loads = data["load"]
+                step = 1.0 / (len(loads) - 1)
+                if any(abs(load - i * step) > 1e-6 for i, load in enumerate(loads)):
+                    raise ValueError("loads are not evenly spaced from 0 to 1")
+                _fitted_load_curves = {
+                    family: TableLoadCurve(curve["power"])
+                    for family, curve in data["curves"].items()
+                }
+            except Exception as e:
+                logger.warning(f"Unable to load the fitted CPU load curves: {e}")
+                _fitted_load_curves = {}
+        return _fitted_load_curves
+
+
+def get_fitted_load_curve(model: Optional[str]) -> Optional[TableLoadCurve]:
+    """
+    The fitted curve of the family of a CPU model, None if there is none.
+    :param model: CPU model, as detected or as named in cpu_power.csv.
+    """
+    if not model:
+        return None
+    model = re.sub(r"\((R|TM)\)|®|™", "", model)
+    model = re.sub(r"\s+", " ", model).replace(" CPU ", " ")
+    curves = get_fitted_load_curves()
+    for family in sorted(curves, key=len, reverse=True):
+        if re.search(re.escape(family) + r"(?![0-9A-Za-z])", model):
+            return curves[family]
+    return None
+
+
+def get_load_curve(curve) -> LoadCurve:
+    """
+    :param curve: name of a curve of `LOAD_CURVES` or of a CPU family with a
+                  fitted curve, or a curve itself.
+    """
+    if callable(curve):
+        return curve
+    if curve in LOAD_CURVES:
+        return LOAD_CURVES[curve]
+    fitted_curves = get_fitted_load_curves()
+    if curve in fitted_curves:
+        return fitted_curves[curve]
+    raise ValueError(
+        f"Unknown CPU load curve {curve!r}, expected one of "
+        f"{list(LOAD_CURVES) + list(fitted_curves)}"
+    )
+
+
+def _busy_and_total_times(times) -> List[float]:
+    """
+    Busy and total CPU time from `psutil.cpu_times()`, counted as psutil does
+    for `cpu_percent()`.
+    """
+    total = sum(times)
+    if sys.platform.startswith("linux"):
+        # Guest time is already counted in user time
+        total -= getattr(times, "guest", 0) + getattr(times, "guest_nice", 0)
+    busy = total - times.idle - getattr(times, "iowait", 0)
+    return [busy, total]
+
+
+class CPULoad(ABC):
+    """
+    The load of the CPU since the previous read.
+    """
+
+    # Shortest window (s) a load is computed over, once a first load is: a
+    # shorter one, e.g. a measure right after a monitoring tick, gives the
+    # previous load and the window goes on
+    min_interval = 0.5
+
+    def __init__(self):
+        self._last_load = 0.0
+        # Time (s) of the previous load
+        self._last_load_time: Optional[float] = None
+
+    def _is_window_too_short(self, now: float) -> bool:
+        return (
+            self._last_load_time is not None
+            and now - self._last_load_time < self.min_interval
+        )
+
+    @abstractmethod
+    def start(self) -> None:
+        """
+        Read the counters the first load is computed from.
+        """
+
+    @abstractmethod
+    def load(self) -> float:
+        """
+        :return: The load since the previous call, or since `start()`, from 0 to 1
+                 of the whole machine.
+        """
+
+
+class MachineCPULoad(CPULoad):
+    """
+    Load of all the CPUs of the machine, from `psutil.cpu_times()`.
+
+    With `per_core`, the load of each core is also computed, see
+    `per_core_loads`.
+    """
+
+    def __init__(self, per_core: bool = False):
+        super().__init__()
+        self.per_core = per_core
+        self.per_core_loads: List[float] = []
+        self._last_times: Optional[List[List[float]]] = None
+
+    def _read_times(self) -> List[List[float]]:
+        if self.per_core:
+            return [_busy_and_total_times(t) for t in psutil.cpu_times(percpu=True)]
+        return [_busy_and_total_times(psutil.cpu_times())]
+
+    def start(self) -> None:
+        self._last_times = self._read_times()
+
+    def load(self) -> float:
+        now = time.monotonic()
+        if self._is_window_too_short(now):
+            return self._last_load
+        times = self._read_times()
+        if self._last_times is None or len(times) != len(self._last_times):
+            self._last_times = times
+            return self._last_load
+        loads = []
+        busy_delta = total_delta = 0.0
+        for (busy, total), (last_busy, last_total) in zip(times, self._last_times):
+            loads.append(
+                min(max((busy - last_busy) / (total - last_total), 0.0), 1.0)
+                if total > last_total
+                else 0.0
+            )
+            busy_delta += busy - last_busy
+            total_delta += total - last_total
+        if total_delta <= 0:
+            # No time elapsed since the previous read
+            return self._last_load
+        self._last_times = times
+        if self.per_core:
+            self.per_core_loads = loads
+        self._last_load = min(max(busy_delta / total_delta, 0.0), 1.0)
+        self._last_load_time = now
+        return self._last_load
+
+
+class ProcessCPULoad(CPULoad):
+    """
+    Load of the machine due to a process, from the CPU time of the process over
+    the wall-clock time elapsed on all the CPUs.
+
+    With a `process_tree`, the CPU time of all the descendants of the process is
+    included, e.g. the workers of a `multiprocessing` pool.
+    """
+
+    def __init__(
+        self,
+        process: psutil.Process,
+        cpu_count: int,
+        process_tree: Optional[ProcessTree] = None,
+    ):
+        super().__init__()
+        self._process = process
+        self._cpu_count = max(cpu_count, 1)
+        self._process_tree = process_tree
+        self._last_cpu_time: Optional[float] = None
+        self._last_time = 0.0
+
+    def _read_cpu_time(self) -> float:
+        if self._process_tree is not None:
+            return self._process_tree.cpu_time()
+        times = self._process.cpu_times()
+        return times.user + times.system
+
+    def start(self) -> None:
+        self._last_cpu_time = self._read_cpu_time()
+        self._last_time = time.monotonic()
+
+    def load(self) -> float:
+        now = time.monotonic()
+        if self._is_window_too_short(now):
+            return self._last_load
+        cpu_time = self._read_cpu_time()
+        if self._last_cpu_time is None:
+            self._last_cpu_time, self._last_time = cpu_time, now
+            return self._last_load
+        elapsed = now - self._last_time
+        if elapsed <= 0:
+            return self._last_load
+        load = (cpu_time - self._last_cpu_time) / (elapsed * self._cpu_count)
+        self._last_cpu_time, self._last_time = cpu_time, now
+        self._last_load = min(max(load, 0.0), 1.0)
+        self._last_load_time = now
+        return self._last_load
+
+
+class CGroupCPULoad(CPULoad):
+    """
+    Load of the machine due to the processes of a cgroup, from the CPU usage of
+    the cgroup over the wall-clock time elapsed on all the CPUs.
+
+    Also gives `busy_share`: the share of the busy CPU time of the machine used
+    by the cgroup, to apportion the energy measured for the whole machine.
+    """
+
+    def __init__(self, cgroup: CGroup, cpu_count: int):
+        super().__init__()
+        self._cgroup = cgroup
+        self._cpu_count = max(cpu_count, 1)
+        self.busy_share = 0.0
+        # CPU usage of the cgroup (s), busy time of the machine (s), time (s)
+        self._last: Optional[List[float]] = None
+
+    def _read(self) -> List[float]:
+        busy, _ = _busy_and_total_times(psutil.cpu_times())
+        return [self._cgroup.cpu_usage(), busy, time.monotonic()]
+
+    def start(self) -> None:
+        self._last = self._read()
+
+    def load(self) -> float:
+        if self._is_window_too_short(time.monotonic()):
+            return self._last_load
+        usage, busy, now = self._read()
+        if self._last is None:
+            self._last = [usage, busy, now]
+            return self._last_load
+        last_usage, last_busy, last_time = self._last
+        elapsed = now - last_time
+        if elapsed <= 0:
+            return self._last_load
+        self._last = [usage, busy, now]
+        usage_delta = usage - last_usage
+        busy_delta = busy - last_busy
+        if busy_delta > 0:
+            self.busy_share = min(max(usage_delta / busy_delta, 0.0), 1.0)
+        else:
+            # The busy time of the machine is counted in ticks, coarser than the
+            # CPU usage of the cgroup
+            self.busy_share = 1.0 if usage_delta > 0 else 0.0
+        self._last_load = min(max(usage_delta / (elapsed * self._cpu_count), 0.0), 1.0)
+        self._last_load_time = now
+        return self._last_load
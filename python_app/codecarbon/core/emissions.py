@@ -6,9 +6,9 @@ https://github.com/mlco2/impact
 https://github.com/responsibleproblemsolving/energy-usage
 """
 
-from typing import Dict, Optional
-
-import pandas as pd
+import threading
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional, Tuple
 
 from codecarbon.core import co2_signal
 from codecarbon.core.units import EmissionsPerKWh, Energy
@@ -16,13 +16,165 @@ from codecarbon.external.geography import CloudMetadata, GeoMetadata
 from codecarbon.external.logger import logger
 from codecarbon.input import DataSource, DataSourceException
 
+# Countries with data by region
+REGIONAL_DATA_COUNTRIES = ("USA", "CAN")
+
+
+class CarbonIntensityTable:
+    """
+    Carbon intensity (kg.CO2eq/kWh) of the electricity of every country of the
+    global energy mix and of every region of `REGIONAL_DATA_COUNTRIES`, computed
+    once from the reference data so that an emissions computation is a lookup
+    and a multiplication.
+
+    The table of a data source is built once per process, see `shared()`.
+    """
+
+    _shared: Dict[Tuple, "CarbonIntensityTable"] = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(
+        self,
+        countries: Mapping[str, float],
+        regions: Mapping[Tuple[str, str], float],
+        world_average: float,
+        errors: Optional[Mapping[str, str]] = None,
+    ):
+        """
+        :param countries: carbon intensity by country ISO code.
+        :param regions: carbon intensity by (country ISO code, region).
+        :param world_average: carbon intensity used for the unknown countries.
+        :param errors: why a country of the data uses the world average, by
+                       country ISO code.
+        """
+        self.countries = MappingProxyType(dict(countries))
+        self.regions = MappingProxyType(dict(regions))
+        self.world_average = world_average
+        self.errors = MappingProxyType(dict(errors or {}))
+
+    @classmethod
+    def from_data_source(cls, data_source: DataSource) -> "CarbonIntensityTable":
+        carbon_intensity_per_source = data_source.get_carbon_intensity_per_source_data()
+        world_average = EmissionsPerKWh.from_g_per_kWh(
+            carbon_intensity_per_source.get("world_average")
+        ).kgs_per_kWh
+
+        countries = {}
+        errors = {}
+        for iso_code, energy_mix in data_source.get_global_energy_mix_data().items():
+            try:
+                countries[iso_code] = Emissions._energy_mix_carbon_intensity(
+                    energy_mix, carbon_intensity_per_source
+                ).kgs_per_kWh
+            except ValueError as e:
+                countries[iso_code] = world_average
+                errors[iso_code] = str(e)
+
+        regions = {}
+        for iso_code in REGIONAL_DATA_COUNTRIES:
+            for region, emissions_per_kWh in cls._region_rates(
+                data_source, iso_code.lower()
+            ):
+                regions[(iso_code, region)] = emissions_per_kWh.kgs_per_kWh
+        return cls(countries, regions, world_average, errors)
+
+    @staticmethod
+    def _region_rates(data_source: DataSource, country_iso_code: str):
+        """
+        (region, EmissionsPerKWh) of the regions of a country, from its emissions
+        data if any, else from its energy mix.
+        """
+        try:
+            emissions_data = data_source.get_country_emissions_data(country_iso_code)
+        except DataSourceException:
+            # This country has regional data at the energy mix level,
+            # not the emissions level
+            for region, energy_mix in data_source.get_country_energy_mix_data(
+                country_iso_code
+            ).items():
+                try:
+                    yield region, Emissions._region_energy_mix_to_emissions_rate(
+                        energy_mix
+                    )
+                except (KeyError, TypeError, ZeroDivisionError):
+                    logger.debug(
+                        f"Incomplete energy mix for {region} ({country_iso_code})"
+                    )
+            return
+        for region, data in emissions_data.items():
+            # Skip the metadata, e.g. "_unit"
+            if not region.startswith("_"):
+                yield region, EmissionsPerKWh.from_lbs_per_mWh(data["emissions"])
+
+    @classmethod
+    def shared(cls, data_source: DataSource) -> "CarbonIntensityTable":
+        """
+        The table of the reference data of `data_source`, built on first use.
+        """
+        key = (data_source.module_name,) + tuple(sorted(data_source.config.items()))
+        table = cls._shared.get(key)
+        if table is None:
+            with cls._shared_lock:
+                table = cls._shared.get(key)
+                if table is None:
+                    table = cls.from_data_source(data_source)
+                    cls._shared[key] = table
+        return table
+
+    def country(self, country_iso_code: str) -> Optional[float]:
+        """
+        Carbon intensity (kg.CO2eq/kWh) of a country, None if it is unknown.
+        """
+        return self.countries.get(country_iso_code)
+
+    def region(self, country_iso_code: str, region: str) -> Optional[float]:
+        """
+        Carbon intensity (kg.CO2eq/kWh) of a region, None if it is unknown.
+        """
+        return self.regions.get((country_iso_code.upper(), region))
+
 
 class Emissions:
+    # source:
+    # https://github.com/responsibleproblemsolving/energy-usage#conversion-to-co2
+    _REGION_EMISSIONS_BY_SOURCE: Dict[str, EmissionsPerKWh] = {
+        "coal": EmissionsPerKWh.from_kgs_per_kWh(0.995725971),
+        "petroleum": EmissionsPerKWh.from_kgs_per_kWh(0.8166885263),
+        "naturalGas": EmissionsPerKWh.from_kgs_per_kWh(0.7438415916),
+    }
+
     def __init__(
         self, data_source: DataSource, co2_signal_api_token: Optional[str] = None
     ):
         self._data_source = data_source
         self._co2_signal_api_token = co2_signal_api_token
+        self._carbon_intensity_table: Optional[CarbonIntensityTable] = None
+
+    @property
+    def carbon_intensity_table(self) -> CarbonIntensityTable:
+        if self._carbon_intensity_table is None:
+            self._carbon_intensity_table = CarbonIntensityTable.shared(
+                self._data_source
+            )
+        return self._carbon_intensity_table
+
+    def _get_cloud_region_data(
+        self, cloud: CloudMetadata, missing: str
+    ) -> Mapping[str, Any]:
+        """
+        Returns the Impact Data of the cloud region
+        :param missing: description of the data looked for, for the error message
+        """
+        cloud_region = self._data_source.get_cloud_region_data(
+            cloud.provider, cloud.region
+        )
+        if cloud_region is None:
+            raise ValueError(
+                f"Unable to find {missing} for "
+                f"cloud_provider={cloud.provider}, "
+                f"cloud_region={cloud.region}"
+            )
+        return cloud_region
 
     def get_cloud_emissions(
         self, energy: Energy, cloud: CloudMetadata, geo: GeoMetadata = None
@@ -35,12 +187,9 @@ class Emissions:
         :return: CO2 emissions in kg
         """
 
-        df: pd.DataFrame = self._data_source.get_cloud_emissions_data()
         try:
             emissions_per_kWh: EmissionsPerKWh = EmissionsPerKWh.from_g_per_kWh(
-                df.loc[
-                    (df["provider"] == cloud.provider) & (df["region"] == cloud.region)
-                ]["impact"].item()
+                self._get_cloud_region_data(cloud, "carbon intensity")["impact"]
             )
             emissions = emissions_per_kWh.kgs_per_kWh * energy.kWh  # kgs
         except Exception as e:
@@ -55,14 +204,8 @@ class Emissions:
                     energy, geo
                 )  # float: kg co2_eq
             else:
-                carbon_intensity_per_source = (
-                    DataSource().get_carbon_intensity_per_source_data()
-                )
                 emissions = (
-                    EmissionsPerKWh.from_g_per_kWh(
-                        carbon_intensity_per_source.get("world_average")
-                    ).kgs_per_kWh
-                    * energy.kWh
+                    self.carbon_intensity_table.world_average * energy.kWh
                 )  # kgs
         return emissions
 
@@ -70,50 +213,23 @@ class Emissions:
         """
         Returns the Country Name where the cloud region is located
         """
-        df: pd.DataFrame = self._data_source.get_cloud_emissions_data()
-        flags = (df["provider"] == cloud.provider) & (df["region"] == cloud.region)
-        selected = df.loc[flags]
-        if not len(selected):
-            raise ValueError(
-                "Unable to find country name for "
-                f"cloud_provider={cloud.provider}, "
-                f"cloud_region={cloud.region}"
-            )
-        return selected["country_name"].item()
+        return self._get_cloud_region_data(cloud, "country name")["country_name"]
 
     def get_cloud_country_iso_code(self, cloud: CloudMetadata) -> str:
         """
         Returns the Country ISO Code where the cloud region is located
         """
-        df: pd.DataFrame = self._data_source.get_cloud_emissions_data()
-        flags = (df["provider"] == cloud.provider) & (df["region"] == cloud.region)
-        selected = df.loc[flags]
-        if not len(selected):
-            raise ValueError(
-                "Unable to find country ISO Code for "
-                f"cloud_provider={cloud.provider}, "
-                f"cloud_region={cloud.region}"
-            )
-        return selected["countryIsoCode"].item()
+        return self._get_cloud_region_data(cloud, "country ISO Code")["countryIsoCode"]
 
     def get_cloud_geo_region(self, cloud: CloudMetadata) -> str:
         """
         Returns the State/City where the cloud region is located
         """
-        df: pd.DataFrame = self._data_source.get_cloud_emissions_data()
-        flags = (df["provider"] == cloud.provider) & (df["region"] == cloud.region)
-        selected = df.loc[flags]
-        if not len(selected):
-            raise ValueError(
-                "Unable to find State/City name for "
-                f"cloud_provider={cloud.provider}, "
-                f"cloud_region={cloud.region}"
-            )
-
-        state = selected["state"].item()
+        cloud_region = self._get_cloud_region_data(cloud, "State/City name")
+        state = cloud_region["state"]
         if state is not None:
             return state
-        city = selected["city"].item()
+        city = cloud_region["city"]
         return city
 
     def get_private_infra_emissions(self, energy: Energy, geo: GeoMetadata) -> float:
@@ -134,7 +250,7 @@ class Emissions:
                 )
 
         compute_with_regional_data: bool = (geo.region is not None) and (
-            geo.country_iso_code.upper() in ["USA", "CAN"]
+            geo.country_iso_code.upper() in REGIONAL_DATA_COUNTRIES
         )
 
         if compute_with_regional_data:
@@ -158,33 +274,16 @@ class Emissions:
         :param geo: Country and region metadata.
         :return: CO2 emissions in kg
         """
-        try:
-            country_emissions_data = self._data_source.get_country_emissions_data(
-                geo.country_iso_code.lower()
-            )
-
-            if geo.region not in country_emissions_data:
-                # TODO: Deal with missing data, default to something
-                raise ValueError(
-                    f"Region: {geo.region} not found for Country"
-                    + f" with ISO CODE : {geo.country_iso_code}"
-                )
-
-            emissions_per_kWh: EmissionsPerKWh = EmissionsPerKWh.from_lbs_per_mWh(
-                country_emissions_data[geo.region]["emissions"]
-            )
-        except DataSourceException:
-            # This country has regional data at the energy mix level,
-            # not the emissions level
-            country_energy_mix_data = self._data_source.get_country_energy_mix_data(
-                geo.country_iso_code.lower()
-            )
-            region_energy_mix_data = country_energy_mix_data[geo.region]
-            emissions_per_kWh = self._region_energy_mix_to_emissions_rate(
-                region_energy_mix_data
+        kgs_per_kWh = self.carbon_intensity_table.region(
+            geo.country_iso_code, geo.region
+        )
+        if kgs_per_kWh is None:
+            # TODO: Deal with missing data, default to something
+            raise ValueError(
+                f"Region: {geo.region} not found for Country"
+                + f" with ISO CODE : {geo.country_iso_code}"
             )
-
-        return emissions_per_kWh.kgs_per_kWh * energy.kWh  # kgs
+        return kgs_per_kWh * energy.kWh  # kgs
 
     def get_country_emissions(self, energy: Energy, geo: GeoMetadata) -> float:
         """
@@ -195,32 +294,23 @@ class Emissions:
         :param geo: Country and region metadata
         :return: CO2 emissions in kg
         """
-        energy_mix = self._data_source.get_global_energy_mix_data()
+        table = self.carbon_intensity_table
+        kgs_per_kWh = table.country(geo.country_iso_code)
 
-        if geo.country_iso_code not in energy_mix:
+        if kgs_per_kWh is None:
             logger.warning(
                 f"We do not have data for {geo.country_iso_code}, using world average."
             )
-            carbon_intensity_per_source = (
-                DataSource().get_carbon_intensity_per_source_data()
-            )
-            return (
-                EmissionsPerKWh.from_g_per_kWh(
-                    carbon_intensity_per_source.get("world_average")
-                ).kgs_per_kWh
-                * energy.kWh
-            )  # kgs
+            return table.world_average * energy.kWh  # kgs
 
-        country_energy_mix: Dict = energy_mix[geo.country_iso_code]
-        emissions_per_kWh = self._global_energy_mix_to_emissions_rate(
-            country_energy_mix
-        )
+        if geo.country_iso_code in table.errors:
+            logger.error(f"{table.errors[geo.country_iso_code]}, using world average.")
         logger.debug(
-            f"We apply an energy mix of {emissions_per_kWh.kgs_per_kWh * 1000:.0f}"
+            f"We apply an energy mix of {kgs_per_kWh * 1000:.0f}"
             + f" g.CO2eq/kWh for {geo.country_name}"
         )
 
-        return emissions_per_kWh.kgs_per_kWh * energy.kWh  # kgs
+        return kgs_per_kWh * energy.kWh  # kgs
 
     @staticmethod
     def _global_energy_mix_to_emissions_rate(energy_mix: Dict) -> EmissionsPerKWh:
@@ -231,15 +321,35 @@ class Emissions:
         :return: an EmissionsPerKwh object representing the average emissions rate
             in Kgs.CO2 / kWh
         """
+        carbon_intensity_per_source = (
+            DataSource().get_carbon_intensity_per_source_data()
+        )
+        try:
+            return Emissions._energy_mix_carbon_intensity(
+                energy_mix, carbon_intensity_per_source
+            )
+        except ValueError as e:
+            logger.error(f"{e}, using world average.")
+            return EmissionsPerKWh.from_g_per_kWh(
+                carbon_intensity_per_source.get("world_average")
+            )
+
+    @staticmethod
+    def _energy_mix_carbon_intensity(
+        energy_mix: Mapping, carbon_intensity_per_source: Mapping
+    ) -> EmissionsPerKWh:
+        """
+        Emissions per kWh of a mix of electricity sources, see
+        `_global_energy_mix_to_emissions_rate`.
+        :param carbon_intensity_per_source: carbon intensity of each source of
+            electricity, in g.CO2eq/kWh
+        :raise ValueError: when the sources do not add up to the total
+        """
         # If we have the chance to have the carbon intensity for this country
         if energy_mix.get("carbon_intensity"):
             return EmissionsPerKWh.from_g_per_kWh(energy_mix.get("carbon_intensity"))
 
         # Else we compute it from the energy mix.
-        # Read carbon_intensity from the json data file.
-        carbon_intensity_per_source = (
-            DataSource().get_carbon_intensity_per_source_data()
-        )
         carbon_intensity = 0
         energy_sum = energy_mix["total_TWh"]
         energy_sum_computed = 0
@@ -258,11 +368,8 @@ class Emissions:
 
         # Sanity check
         if energy_sum_computed != energy_sum:
-            logger.error(
-                f"We find {energy_sum_computed} TWh instead of {energy_sum} TWh for {energy_mix.get('country_name')}, using world average."
-            )
-            return EmissionsPerKWh.from_g_per_kWh(
-                carbon_intensity_per_source.get("world_average")
+            raise ValueError(
+                f"We find {energy_sum_computed} TWh instead of {energy_sum} TWh for {energy_mix.get('country_name')}"
             )
 
         return EmissionsPerKWh.from_g_per_kWh(carbon_intensity)
@@ -277,13 +384,6 @@ class Emissions:
             "petroleum" and "naturalGas" and "total"
         :return: an EmissionsPerKwh object representing the average emissions rate
         """
-        # source:
-        # https://github.com/responsibleproblemsolving/energy-usage#conversion-to-co2
-        emissions_by_source: Dict[str, EmissionsPerKWh] = {
-            "coal": EmissionsPerKWh.from_kgs_per_kWh(0.995725971),
-            "petroleum": EmissionsPerKWh.from_kgs_per_kWh(0.8166885263),
-            "naturalGas": EmissionsPerKWh.from_kgs_per_kWh(0.7438415916),
-        }
         emissions_percentage: Dict[str, float] = {}
         for energy_type in energy_mix.keys():
             if energy_type not in ["total", "isoCode", "country_name"]:
@@ -300,7 +400,7 @@ class Emissions:
                 [
                     emissions_percentage[source]
                     * value.kgs_per_kWh  # % (0.x)  # kgs / kWh
-                    for source, value in emissions_by_source.items()
+                    for source, value in Emissions._REGION_EMISSIONS_BY_SOURCE.items()
                 ]
             )
         )
@@ -1,8 +1,10 @@
+import time
 from dataclasses import dataclass, field
-from typing import Any, Dict, List, Union
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
 
 import pynvml
 
+from codecarbon.core.process_tree import ProcessTree
 from codecarbon.core.units import Energy, Power, Time
 from codecarbon.external.logger import logger
 
@@ -51,12 +53,7 @@ class GPUDevice:
         """
         Compute the energy/power used since last call.
         """
-        new_last_energy = energy = self._get_energy_kwh()
-        self.power = self.power.from_energies_and_delay(
-            energy, self.last_energy, duration
-        )
-        self.energy_delta = energy - self.last_energy
-        self.last_energy = new_last_energy
+        self.update_energy(self._get_energy_kwh(), duration)
         return {
             "name": self._gpu_name,
             "uuid": self._uuid,
@@ -64,6 +61,17 @@ class GPUDevice:
             "power_usage": self.power,
         }
 
+    def update_energy(self, energy: Energy, duration: Time) -> None:
+        """
+        Compute the energy/power used since last call from a reading of the
+        total energy consumption.
+        """
+        self.power = self.power.from_energies_and_delay(
+            energy, self.last_energy, duration
+        )
+        self.energy_delta = energy - self.last_energy
+        self.last_energy = energy
+
     def get_static_details(self) -> Dict[str, Any]:
         return {
             "name": self._gpu_name,
@@ -201,6 +209,89 @@ class GPUDevice:
             return []
 
 
+class GPUProcessShare:
+    """
+    Share of the activity of a GPU due to the processes of a `ProcessTree`, to
+    charge them only their part of the energy of a shared GPU.
+
+    The share is the part of the SM utilization of the processes sampled by
+    NVML since the previous read that comes from the tree. When NVML has no
+    utilization samples, e.g. while the GPU is idle or when the driver does
+    not support them, the share is the part of the memory of the compute
+    processes used by the tree. NVML reports host pids: in a container with
+    its own pid namespace, the processes of the tree are not found.
+
+    NVML is read at most once every `min_interval` seconds, the share being
+    reused in between, so that tracking at 1 Hz costs at most one or two NVML
+    calls per GPU every `min_interval`.
+    """
+
+    def __init__(
+        self,
+        gpu_device: GPUDevice,
+        process_tree: ProcessTree,
+        min_interval: float = 5.0,
+    ):
+        self.gpu_device = gpu_device
+        self.process_tree = process_tree
+        self.min_interval = min_interval
+        self._share = 0.0
+        # Timestamp (µs) of the last utilization sample read
+        self._last_seen_timestamp = 0
+        self._last_read: Optional[float] = None
+
+    def _utilization_share(self, pids: set) -> Optional[float]:
+        """
+        Share of the SM utilization since the previous read, None if there is
+        no sample.
+        """
+        try:
+            samples = pynvml.nvmlDeviceGetProcessUtilization(
+                self.gpu_device.handle, self._last_seen_timestamp
+            )
+        except pynvml.NVMLError:
+            # No sample since the previous read, or not supported
+            return None
+        total = tracked = 0
+        for sample in samples:
+            self._last_seen_timestamp = max(self._last_seen_timestamp, sample.timeStamp)
+            total += sample.smUtil
+            if sample.pid in pids:
+                tracked += sample.smUtil
+        if total == 0:
+            return None
+        return tracked / total
+
+    def _memory_share(self, pids: set) -> float:
+        """
+        Share of the memory of the compute processes of the GPU.
+        """
+        processes = self.gpu_device._get_compute_processes()
+        total = sum(p["used_memory"] or 0 for p in processes)
+        tracked = sum(p["used_memory"] or 0 for p in processes if p["pid"] in pids)
+        if total > 0:
+            return tracked / total
+        if processes:
+            # Memory usage not available, split between the processes
+            return sum(p["pid"] in pids for p in processes) / len(processes)
+        return 0.0
+
+    def share(self) -> float:
+        """
+        :return: The share (0-1) of the GPU used by the tracked processes.
+        """
+        now = time.monotonic()
+        if self._last_read is not None and now - self._last_read < self.min_interval:
+            return self._share
+        self._last_read = now
+        pids = {process.pid for process in self.process_tree.processes()}
+        share = self._utilization_share(pids)
+        if share is None:
+            share = self._memory_share(pids)
+        self._share = min(max(share, 0.0), 1.0)
+        return self._share
+
+
 class AllGPUDevices:
     def __init__(self) -> None:
         if is_gpu_details_available():
@@ -214,6 +305,7 @@ class AllGPUDevices:
             handle = pynvml.nvmlDeviceGetHandleByIndex(i)
             gpu_device = GPUDevice(handle=handle, gpu_index=i)
             self.devices.append(gpu_device)
+        self._static_info: Optional[List[Dict[str, Any]]] = None
 
     def get_gpu_static_info(self) -> List:
         """Get all GPUs static information.
@@ -228,16 +320,15 @@ class AllGPUDevices:
             }
         ]
         """
-        try:
-            devices_static_info = []
-            for i in range(self.device_count):
-                gpu_device = self.devices[i]
-                devices_static_info.append(gpu_device.get_static_details())
-            return devices_static_info
-
-        except pynvml.NVMLError:
-            logger.warning("Failed to retrieve gpu static info", exc_info=True)
-            return []
+        if self._static_info is None:
+            try:
+                self._static_info = [
+                    gpu_device.get_static_details() for gpu_device in self.devices
+                ]
+            except pynvml.NVMLError:
+                logger.warning("Failed to retrieve gpu static info", exc_info=True)
+                return []
+        return [dict(static_info) for static_info in self._static_info]
 
     def get_gpu_details(self) -> List:
         """Get all GPUs instantaneous metrics
@@ -294,6 +385,52 @@ class AllGPUDevices:
             logger.warning("Failed to retrieve gpu information", exc_info=True)
             return []
 
+    def get_total_energies(
+        self, gpu_ids: Optional[Iterable[int]] = None
+    ) -> Dict[int, Optional[int]]:
+        """
+        Total energy consumption (mJ) of the GPUs in `gpu_ids` (all by default)
+        since the driver was last reloaded, by index, None for the GPUs where it
+        cannot be read. Only the energy is read, with one NVML call per GPU:
+        NVML has no call reading several GPUs at once.
+        """
+        gpu_ids = range(self.device_count) if gpu_ids is None else gpu_ids
+        return {
+            gpu_index: self.devices[gpu_index]._get_total_energy_consumption()
+            for gpu_index in gpu_ids
+        }
+
+    def get_energy_delta(
+        self,
+        last_duration: Time,
+        gpu_ids: Optional[Iterable[int]] = None,
+        process_shares: Optional[List[GPUProcessShare]] = None,
+    ) -> Tuple[Power, Energy]:
+        """
+        Total power and energy of the GPUs in `gpu_ids` (all by default) since
+        the last call, from a single sweep over their energy counters, the other
+        GPUs are not read. Unlike `get_delta`, no details of the GPUs are
+        returned.
+        :param process_shares: share of each GPU charged, for all GPUs by default.
+        """
+        gpu_ids = (
+            range(self.device_count)
+            if gpu_ids is None
+            else sorted(set(gpu_ids) & set(range(self.device_count)))
+        )
+        total_power = Power.from_watts(0)
+        total_energy = Energy.from_energy(kWh=0)
+        for gpu_index, energy in self.get_total_energies(gpu_ids).items():
+            gpu_device = self.devices[gpu_index]
+            if energy is None:
+                gpu_device.update_energy(gpu_device.last_energy, last_duration)
+            else:
+                gpu_device.update_energy(Energy.from_millijoules(energy), last_duration)
+            share = 1.0 if process_shares is None else process_shares[gpu_index].share()
+            total_power += gpu_device.power * share
+            total_energy += gpu_device.energy_delta * share
+        return total_power, total_energy
+
 
 def is_gpu_details_available() -> bool:
     """Returns True if the GPU details are available."""
@@ -0,0 +1,200 @@
+"""
+High-frequency sampling of the CPU energy, to measure short sections of code
+such as a kernel or a request handler.
+"""
+
+import threading
+import time
+from array import array
+from typing import Any, Dict, Optional
+
+from codecarbon.core.rapl import RAPLEnergyCounters
+from codecarbon.core.timeseries import Series
+from codecarbon.core.units import Energy
+from codecarbon.external.logger import logger
+
+
+class HighFrequencySampler:
+    """
+    Sample raw RAPL energy counters at 10 to 100 Hz (or more) from a dedicated
+    thread.
+
+    The samples are written to arrays preallocated for `capacity` samples, and
+    nothing is logged or allocated in the sampling loop, so that the cost of the
+    sampler itself stays small and measurable: the time spent reading the
+    counters is recorded for each sample, see `stats()`.
+    Once `capacity` samples are recorded, the sampler stops recording.
+    The sampler owns its counter files: they are released by `close()`, or when
+    leaving the `with` block, after which the samples can still be read but the
+    sampler cannot be started again.
+
+    Usage:
+    ```py
+    with tracker.high_frequency_sampler(frequency=100) as sampler:
+        kernel()
+    series = sampler.series()
+    ```
+    """
+
+    def __init__(
+        self,
+        counters: RAPLEnergyCounters,
+        frequency: float = 100,
+        capacity: int = 100_000,
+    ):
+        """
+        :param counters: energy counters to sample, all summed up.
+        :param frequency: number of samples per second.
+        :param capacity: maximum number of samples recorded.
+        """
+        if frequency <= 0:
+            raise ValueError(f"Frequency must be positive: {frequency}")
+        if capacity <= 1:
+            raise ValueError(f"Capacity must be at least 2: {capacity}")
+        self.frequency = frequency
+        self.capacity = capacity
+        self._counters = counters
+        self._timestamps = array("d", bytes(8 * capacity))
+        self._read_times = array("d", bytes(8 * capacity))
+        self._values = array("d", bytes(8 * capacity * len(counters)))
+        self._size = 0
+        self._overflow = False
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        # Unix time matching the perf_counter time `_perf_origin`
+        self._wall_origin = 0.0
+        self._perf_origin = 0.0
+
+    def start(self) -> None:
+        """
+        Start sampling, discarding the previous samples.
+        :raises RuntimeError: if the sampler is closed.
+        """
+        if self._closed:
+            raise RuntimeError(
+                "The high-frequency sampler is closed, get a new one from the tracker"
+            )
+        if self._thread is not None:
+            return
+        self._size = 0
+        self._overflow = False
+        self._stop_event.clear()
+        self._wall_origin = time.time()
+        self._perf_origin = time.perf_counter()
+        self._thread = threading.Thread(
+            target=self._run, name="codecarbon-high-frequency-sampler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop sampling, after a last sample.
+        """
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+
+    def close(self) -> None:
+        """
+        Stop sampling and release the counter files.
+        """
+        self.stop()
+        self._counters.close()
+        self._closed = True
+
+    def __enter__(self) -> "HighFrequencySampler":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb) -> None:
+        self.close()
+
+    def _run(self) -> None:
+        # Local names, to keep the loop cheap
+        timestamps = self._timestamps
+        read_times = self._read_times
+        values = self._values
+        read = self._counters.read
+        width = len(self._counters)
+        capacity = self.capacity
+        period = 1 / self.frequency
+        perf_counter = time.perf_counter
+        wait = self._stop_event.wait
+        is_stopped = self._stop_event.is_set
+        size = 0
+        deadline = perf_counter()
+        try:
+            while True:
+                stopping = is_stopped()
+                if size == capacity:
+                    self._overflow = True
+                    break
+                start = perf_counter()
+                read(values, size * width)
+                end = perf_counter()
+                timestamps[size] = end
+                read_times[size] = end - start
+                size += 1
+                if stopping:
+                    break
+                deadline += period
+                delay = deadline - perf_counter()
+                if delay > 0:
+                    wait(delay)
+                else:
+                    # Late: restart the schedule from now
+                    deadline = perf_counter()
+        except Exception as e:
+            logger.error(f"High-frequency sampling stopped: {e}", exc_info=True)
+        finally:
+            self._size = size
+
+    def __len__(self) -> int:
+        return self._size
+
+    def series(self) -> Series:
+        """
+        :return: The energy (kWh) and mean power (W) of the CPU between each pair
+                 of consecutive samples, as read from RAPL (the PUE is not applied).
+        """
+        width = len(self._counters)
+        max_uj = self._counters.max_uj
+        series = Series()
+        for i in range(1, self._size):
+            delta_uj = 0.0
+            for k in range(width):
+                delta = self._values[i * width + k] - self._values[(i - 1) * width + k]
+                if delta < 0:
+                    # The counter wrapped around
+                    delta += max_uj[k]
+                delta_uj += delta
+            duration = self._timestamps[i] - self._timestamps[i - 1]
+            series.timestamps.append(
+                self._wall_origin + self._timestamps[i] - self._perf_origin
+            )
+            series.power.append(delta_uj * 1e-6 / duration if duration > 0 else 0.0)
+            series.energy.append(Energy.from_ujoules(delta_uj).kWh)
+        return series
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        :return: The number of samples, the target and achieved frequencies (Hz),
+                 the mean and max time spent reading the counters per sample (s),
+                 the fraction of the sampled time spent reading them, and whether
+                 the capacity was exceeded.
+        """
+        size = self._size
+        duration = self._timestamps[size - 1] - self._timestamps[0] if size > 1 else 0.0
+        read_time = sum(self._read_times[:size])
+        return {
+            "samples": size,
+            "frequency": self.frequency,
+            "achieved_frequency": (size - 1) / duration if duration > 0 else 0.0,
+            "mean_read_time": read_time / size if size else 0.0,
+            "max_read_time": max(self._read_times[:size]) if size else 0.0,
+            "overhead": read_time / duration if duration > 0 else 0.0,
+            "overflow": self._overflow,
+        }
@@ -1,7 +1,9 @@
 from time import perf_counter
 
-from codecarbon.external.hardware import CPU, GPU, RAM, AppleSiliconChip
+from codecarbon.core.units import Energy, Power
+from codecarbon.external.hardware import CPU, GPU, AppleSiliconChip
 from codecarbon.external.logger import logger
+from codecarbon.external.ram import RAM
 
 
 class MeasurePowerEnergy:
@@ -12,13 +14,13 @@ class MeasurePowerEnergy:
     _last_measured_time: int = 0
     _hardware: list
     _pue: float
-    _total_cpu_energy: float
-    _total_gpu_energy: float
-    _total_ram_energy: float
-    _total_energy: float
-    _cpu_power: float
-    _gpu_power: float
-    _ram_power: float
+    _total_cpu_energy: Energy
+    _total_gpu_energy: Energy
+    _total_ram_energy: Energy
+    _total_energy: Energy
+    _cpu_power: Power
+    _gpu_power: Power
+    _ram_power: Power
 
     def __init__(self, hardware, pue):
         """
@@ -29,14 +31,14 @@ class MeasurePowerEnergy:
         self._hardware = hardware
         self._pue = pue
         # TODO: Read initial energy values from hardware
-        self._total_cpu_energy = 0
-        self._total_gpu_energy = 0
-        self._total_ram_energy = 0
-        self._total_energy = 0
+        self._total_cpu_energy = Energy.from_energy(kWh=0)
+        self._total_gpu_energy = Energy.from_energy(kWh=0)
+        self._total_ram_energy = Energy.from_energy(kWh=0)
+        self._total_energy = Energy.from_energy(kWh=0)
         # Power cant't be read at init because we need time, so we set it to 0
-        self._cpu_power = 0
-        self._gpu_power = 0
-        self._ram_power = 0
+        self._cpu_power = Power.from_watts(watts=0)
+        self._gpu_power = Power.from_watts(watts=0)
+        self._ram_power = Power.from_watts(watts=0)
 
     def do_measure(self) -> None:
         for hardware in self._hardware:
@@ -89,9 +91,18 @@ class MeasurePowerEnergy:
                 logger.error(f"Unknown hardware type: {hardware} ({type(hardware)})")
             h_time = perf_counter() - h_time
             logger.debug(
-                f"{hardware.__class__.__name__} : {hardware.total_power().W:,.2f} "
+                f"{hardware.__class__.__name__} : {power.W:,.2f} "
                 + f"W during {last_duration:,.2f} s [measurement time: {h_time:,.4f}]"
             )
+        self._last_measured_time = perf_counter()
         logger.info(
             f"{self._total_energy.kWh:.6f} kWh of electricity used since the beginning."
         )
+
+    def monitor_power(self) -> None:
+        """
+        Average the power of hardware that does not support energy monitoring.
+        """
+        for hardware in self._hardware:
+            if isinstance(hardware, CPU):
+                hardware.monitor_power()
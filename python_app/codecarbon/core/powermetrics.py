@@ -5,8 +5,6 @@ import subprocess
 import sys
 from typing import Dict
 
-import numpy as np
-
 from codecarbon.core.util import detect_cpu_model
 from codecarbon.external.logger import logger
 
@@ -162,6 +160,8 @@ class ApplePowermetrics:
         self._log_values()
         details = dict()
         try:
+            import numpy as np
+
             with open(self._log_file_path) as f:
                 logfile = f.read()
             cpu_pattern = r"CPU Power: (\d+) mW"
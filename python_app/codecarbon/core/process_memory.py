@@ -0,0 +1,117 @@
+"""
+Memory used by the processes of a `ProcessTree`, counted with their proportional
+set size (PSS) so that the pages shared between them, e.g. by `fork()`, are
+only counted once.
+"""
+
+import os
+import threading
+from typing import Dict, Iterable, Optional
+
+import psutil
+
+from codecarbon.core.process_tree import ProcessTree
+
+
+class ProcessMemory:
+    """
+    Read the PSS of processes from `/proc/<pid>/smaps_rollup`.
+
+    The file of each process is kept open and read with `os.preadv` into a
+    preallocated buffer, so that a read does not allocate more than the parsed
+    value. When the PSS is not available (other platforms, kernels older than
+    4.14, processes of other users), the RSS reported by psutil is used.
+    """
+
+    PROC_DIR = "/proc"
+    # smaps_rollup holds about 20 lines
+    BUFFER_SIZE = 4096
+    PSS_FIELD = b"\nPss:"
+
+    def __init__(self, process_tree: ProcessTree):
+        self.process_tree = process_tree
+        self._buffer = bytearray(self.BUFFER_SIZE)
+        self._fds: Dict[int, int] = {}
+        # Processes whose PSS cannot be read, measured with their RSS
+        self._rss_only = set()
+        self._lock = threading.Lock()
+
+    def _open(self, pid: int) -> Optional[int]:
+        fd = self._fds.get(pid)
+        if fd is None and pid not in self._rss_only:
+            try:
+                fd = os.open(
+                    os.path.join(self.PROC_DIR, str(pid), "smaps_rollup"), os.O_RDONLY
+                )
+                self._fds[pid] = fd
+            except OSError:
+                self._rss_only.add(pid)
+        return fd
+
+    def _close(self, pid: int) -> None:
+        fd = self._fds.pop(pid, None)
+        if fd is not None:
+            os.close(fd)
+
+    def _read_pss(self, fd: int) -> Optional[int]:
+        """
+        PSS in bytes from an open smaps_rollup file.
+        """
+        size = os.preadv(fd, [self._buffer], 0)
+        start = self._buffer.find(self.PSS_FIELD, 0, size)
+        if start < 0:
+            return None
+        start += len(self.PSS_FIELD)
+        end = self._buffer.find(b"kB", start, size)
+        if end < 0:
+            return None
+        return int(self._buffer[start:end]) * 1024
+
+    def memory(self, process: psutil.Process) -> int:
+        """
+        Memory (bytes) used by a process, 0 if it exited.
+        """
+        with self._lock:
+            fd = self._open(process.pid)
+            if fd is not None:
+                try:
+                    pss = self._read_pss(fd)
+                    if pss is not None:
+                        return pss
+                except ProcessLookupError:
+                    # The process exited
+                    self._close(process.pid)
+                    return 0
+                except (OSError, ValueError):
+                    pass
+                self._close(process.pid)
+                self._rss_only.add(process.pid)
+        try:
+            return process.memory_info().rss
+        except psutil.Error:
+            return 0
+
+    def total(self, processes: Iterable[psutil.Process]) -> int:
+        """
+        Memory (bytes) used by `processes`. The files of the processes that are
+        not in the tree anymore are closed.
+        """
+        total = sum(self.memory(process) for process in processes)
+        self.prune()
+        return total
+
+    def prune(self) -> None:
+        """
+        Close the files of the processes that left the tree.
+        """
+        pids = {process.pid for process in self.process_tree.processes(refresh=False)}
+        with self._lock:
+            for pid in list(self._fds):
+                if pid not in pids:
+                    self._close(pid)
+            self._rss_only &= pids
+
+    def close(self) -> None:
+        with self._lock:
+            for pid in list(self._fds):
+                self._close(pid)
@@ -0,0 +1,218 @@
+"""
+The tree of the processes started by a tracked process, shared by the hardware
+measuring it in tracking_mode="process".
+"""
+
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+import psutil
+
+from codecarbon.external.logger import logger
+
+
+class ProcessTree:
+    """
+    A process and its descendants, kept up to date incrementally.
+
+    On Linux, each scan reads the `/proc/<pid>/task/<tid>/children` files of the
+    processes of the tree: the cost of a scan is proportional to the size of
+    the tree, not of the system, and `psutil.Process` handles are only created
+    for the children that appeared since the previous scan. Elsewhere, or when
+    the kernel does not expose these files, each scan lists the pids of the
+    system and only inspects the pids that appeared since the previous scan.
+    Scans are shared: one at most every `scan_interval` seconds, however many
+    components read the tree.
+
+    Descendants stay in the tree when their parent exits, as they still do work
+    on behalf of the tracked process.
+    """
+
+    PROC_DIR = "/proc"
+
+    def __init__(self, pid: int, scan_interval: float = 0.5):
+        """
+        :param pid: pid of the root of the tree.
+        :param scan_interval: seconds during which a scan is reused.
+        """
+        self.pid = pid
+        self.scan_interval = scan_interval
+        self._root = psutil.Process(pid)
+        self._processes: Dict[int, psutil.Process] = {pid: self._root}
+        # Cumulative CPU time (s) of each process at the last read
+        self._cpu_times: Dict[int, float] = {}
+        self._known_pids = set()
+        # Processes left out of the tree, with their descendants
+        self._excluded = set()
+        self._use_proc_children = os.path.exists(
+            os.path.join(self.PROC_DIR, str(pid), "task", str(pid), "children")
+        )
+        self._last_scan: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def root(self) -> psutil.Process:
+        return self._root
+
+    def exclude(self, pid: int) -> None:
+        """
+        Leave a process started by the tree out of it, e.g. a helper of the
+        tracker that should not be measured as tracked work.
+        """
+        with self._lock:
+            self._excluded.add(pid)
+            self._forget(pid)
+
+    def _forget(self, pid: int) -> None:
+        self._processes.pop(pid, None)
+        self._cpu_times.pop(pid, None)
+
+    def _read_proc_children(self, pid: int) -> Optional[List[int]]:
+        """
+        Children of all the threads of a process, None if it exited.
+        """
+        task_dir = os.path.join(self.PROC_DIR, str(pid), "task")
+        try:
+            tids = os.listdir(task_dir)
+        except FileNotFoundError:
+            return None
+        children = []
+        for tid in tids:
+            try:
+                with open(os.path.join(task_dir, tid, "children"), "rb") as f:
+                    children.extend(int(child) for child in f.read().split())
+            except (FileNotFoundError, ProcessLookupError):
+                # The thread exited
+                continue
+        return children
+
+    def _scan_proc_children(self) -> None:
+        """
+        Walk the tree through the children files of its processes.
+        Must be called with the lock.
+        """
+        pending = list(self._processes)
+        while pending:
+            pid = pending.pop()
+            children = self._read_proc_children(pid)
+            if children is None:
+                self._forget(pid)
+                continue
+            for child in children:
+                if child in self._processes or child in self._excluded:
+                    continue
+                try:
+                    self._processes[child] = psutil.Process(child)
+                except psutil.Error:
+                    continue
+                pending.append(child)
+
+    def _initial_scan(self) -> None:
+        if self._use_proc_children:
+            self._scan_proc_children()
+            return
+        self._known_pids = set(psutil.pids())
+        try:
+            children = self._root.children(recursive=True)
+        except psutil.Error as e:
+            logger.debug(f"Unable to list the children of process {self.pid}: {e}")
+            children = []
+        for child in children:
+            if child.pid not in self._excluded:
+                self._processes[child.pid] = child
+
+    def _scan(self) -> None:
+        """
+        Add the processes started by the tree since the last scan and forget the
+        ones that exited. Must be called with the lock.
+        """
+        if self._use_proc_children:
+            self._scan_proc_children()
+            return
+        pids = set(psutil.pids())
+        for pid in self._known_pids - pids:
+            self._forget(pid)
+        # Parent of each new process, read once
+        new_processes: Dict[int, psutil.Process] = {}
+        parents: Dict[int, int] = {}
+        for pid in pids - self._known_pids:
+            try:
+                process = psutil.Process(pid)
+                parents[pid] = process.ppid()
+                new_processes[pid] = process
+            except psutil.Error:
+                continue
+        self._known_pids = pids
+        # New processes may descend from other new processes
+        added = True
+        while added:
+            added = False
+            for pid, ppid in list(parents.items()):
+                if ppid in self._processes and pid not in self._excluded:
+                    self._processes[pid] = new_processes[pid]
+                    del parents[pid]
+                    added = True
+
+    def refresh(self, force: bool = False) -> None:
+        """
+        Scan the processes, unless the last scan is recent enough.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self._last_scan is None:
+                self._initial_scan()
+            elif force or now - self._last_scan >= self.scan_interval:
+                self._scan()
+            else:
+                return
+            self._last_scan = now
+
+    def processes(self, refresh: bool = True) -> List[psutil.Process]:
+        """
+        :return: The root process followed by its descendants.
+        """
+        if refresh:
+            self.refresh()
+        with self._lock:
+            return list(self._processes.values())
+
+    def children(self, refresh: bool = True) -> List[psutil.Process]:
+        """
+        :return: The descendants of the root process.
+        """
+        return [p for p in self.processes(refresh=refresh) if p.pid != self.pid]
+
+    def cpu_time(self, refresh: bool = True) -> float:
+        """
+        Cumulative CPU time (s) of the processes of the tree.
+
+        The CPU time of the waited-for children of each process is included:
+        when a process of the tree exits, its time moves to its parent, so that
+        the difference between two calls covers the processes that exited in
+        between, even those that were never scanned.
+        """
+        if refresh:
+            self.refresh()
+        with self._lock:
+            total = 0.0
+            for pid, process in list(self._processes.items()):
+                try:
+                    times = process.cpu_times()
+                    self._cpu_times[pid] = (
+                        times.user
+                        + times.system
+                        + getattr(times, "children_user", 0.0)
+                        + getattr(times, "children_system", 0.0)
+                    )
+                except psutil.ZombieProcess:
+                    # Keep its last CPU time until it is reaped
+                    pass
+                except psutil.NoSuchProcess:
+                    self._forget(pid)
+                    continue
+                except psutil.Error:
+                    pass
+                total += self._cpu_times.get(pid, 0.0)
+            return total
@@ -1,4 +1,7 @@
+import os
+from array import array
 from dataclasses import dataclass, field
+from typing import List
 
 from codecarbon.core.units import Energy, Power, Time
 from codecarbon.external.logger import logger
@@ -20,6 +23,8 @@ class RAPLFile:
     last_energy: Energy = field(default_factory=lambda: Energy(0))
     # Max value energy can hold before it wraps
     max_energy_reading: Energy = field(default_factory=lambda: Energy(0))
+    # Kind of RAPL domain: "package", "core", "uncore", "dram" or "psys"
+    domain: str = ""
 
     def __post_init__(self):
         self.last_energy = self._get_value()
@@ -56,3 +61,42 @@ class RAPLFile:
         )
         self.energy_delta = energy - self.last_energy
         self.last_energy = new_last_energy
+
+
+class RAPLEnergyCounters:
+    """
+    Fast path to read raw RAPL energy counters, for high-frequency sampling.
+
+    The counter files are opened once and read with `os.pread`, without
+    parsing into `Energy` objects or logging: `read` only writes the raw
+    micro-joule values into a preallocated array.
+    """
+
+    # energy_uj holds an integer of at most 20 digits
+    READ_SIZE = 32
+
+    def __init__(self, rapl_files: List[RAPLFile]):
+        self.names = [rapl_file.name for rapl_file in rapl_files]
+        # Micro-joules above which each counter wraps
+        self.max_uj = []
+        for rapl_file in rapl_files:
+            with open(rapl_file.max_path, "r") as f:
+                self.max_uj.append(float(f.read()))
+        self._fds = [os.open(rapl_file.path, os.O_RDONLY) for rapl_file in rapl_files]
+
+    def __len__(self) -> int:
+        # Still the number of counters once closed, to decode the samples
+        return len(self.names)
+
+    def read(self, out: array, offset: int = 0) -> None:
+        """
+        Write the current value, in micro-joules, of each counter to
+        `out[offset:offset + len(self)]`.
+        """
+        for i, fd in enumerate(self._fds):
+            out[offset + i] = int(os.pread(fd, self.READ_SIZE, 0))
+
+    def close(self) -> None:
+        for fd in self._fds:
+            os.close(fd)
+        self._fds = []
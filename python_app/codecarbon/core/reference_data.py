@@ -0,0 +1,467 @@
+"""
+Binary bundle of the reference data shipped with CodeCarbon, compiled from the
+CSV and JSON files of `codecarbon/data`, which stay the source of truth.
+
+The bundle is memory-mapped: opening it costs one `mmap`, the pages are shared
+by all the processes using it, and a lookup only decodes the row it returns.
+It is built by `codecarbon/data/build_reference_bundle.py`.
+
+Layout, little-endian:
+
+* a header: magic, format version and size of the directory;
+* the directory, in JSON: the size and the SHA-256 of each source file, and for
+  each table its
+  number of rows, its key columns and the offset of each section;
+* 8-byte aligned sections:
+    * the string pool: `u32` offsets of the strings, then the UTF-8 strings,
+      each string being stored once;
+    * for each column, one fixed-width value per row: `int64` ("q"),
+      `float64` ("d"), or the `u32` id of a string ("s") or of a JSON text
+      ("j"), and one state byte per row (see `VALUE`, `NONE`, `MISSING` and
+      `INTEGRAL`) when some rows have no plain value;
+    * for each table with a key, the `u32` rows sorted by key, for a binary
+      search.
+"""
+
+import csv
+import hashlib
+import json
+import mmap
+import struct
+import sys
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+MAGIC = b"CCREFDAT"
+FORMAT_VERSION = 2
+_HEADER = struct.Struct("<8sII")
+_ALIGNMENT = 8
+
+# State of a value of a column
+VALUE = 0
+NONE = 1
+# The field is absent from the row
+MISSING = 2
+# Integer stored in a float64 column
+INTEGRAL = 3
+
+# Columns whose names start with this prefix are not part of the rows
+HIDDEN_PREFIX = "__"
+KEY_COLUMN = "__key__"
+
+
+def _parse_cell(value: str) -> Any:
+    if value == "":
+        return None
+    for parse in (int, float):
+        try:
+            return parse(value)
+        except ValueError:
+            continue
+    return value
+
+
+def read_csv_records(path) -> List[Dict[str, Any]]:
+    """
+    Rows of a CSV file, with the values of each column parsed as integers if
+    they all are, else as floats if they all are, else kept as strings. Empty
+    cells are None.
+    """
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        rows = list(csv.DictReader(f))
+    if not rows:
+        return rows
+    for column in rows[0]:
+        values = [_parse_cell(row[column]) for row in rows]
+        present = {type(value) for value in values if value is not None}
+        if str in present:
+            values = [None if row[column] == "" else row[column] for row in rows]
+        elif present == {int, float}:
+            values = [None if value is None else float(value) for value in values]
+        for row, value in zip(rows, values):
+            row[column] = value
+    return rows
+
+
+class ReferenceTable:
+    """
+    A table of a `ReferenceBundle`, whose rows are decoded on access.
+    """
+
+    def __init__(self, bundle: "ReferenceBundle", name: str, directory: Dict):
+        self.bundle = bundle
+        self.name = name
+        self.key: List[str] = directory["key"]
+        self._rows: int = directory["rows"]
+        # Name, type, values and states of each column
+        self._columns: List[Tuple[str, str, memoryview, Optional[memoryview]]] = []
+        for column in directory["columns"]:
+            values = bundle._view(column["values"], self._rows, _item_format(column))
+            states = (
+                bundle._view(column["states"], self._rows, "B")
+                if column["states"] is not None
+                else None
+            )
+            self._columns.append((column["name"], column["type"], values, states))
+        self._column_indexes = {column[0]: i for i, column in enumerate(self._columns)}
+        self._sorted_rows = (
+            bundle._view(directory["sorted_rows"], self._rows, "I")
+            if directory["sorted_rows"] is not None
+            else None
+        )
+
+    def __len__(self) -> int:
+        return self._rows
+
+    def _value(self, column_index: int, row: int) -> Any:
+        _, column_type, values, states = self._columns[column_index]
+        state = states[row] if states is not None else VALUE
+        if state == NONE:
+            return None
+        if state == MISSING:
+            raise KeyError(self._columns[column_index][0])
+        value = values[row]
+        if column_type == "s":
+            return self.bundle.string(value)
+        if column_type == "j":
+            return json.loads(self.bundle.string(value))
+        if state == INTEGRAL:
+            return int(value)
+        return value
+
+    def value(self, row: int, column: str) -> Any:
+        """
+        Value of a column of a row, KeyError if the row has no such field.
+        """
+        return self._value(self._column_indexes[column], row)
+
+    def row(self, row: int) -> Dict[str, Any]:
+        """
+        The fields of a row, in the order of the source.
+        """
+        fields = {}
+        for i, (name, _, _, states) in enumerate(self._columns):
+            if name.startswith(HIDDEN_PREFIX) or (
+                states is not None and states[row] == MISSING
+            ):
+                continue
+            fields[name] = self._value(i, row)
+        return fields
+
+    def _key(self, row: int) -> Tuple:
+        return tuple(self.value(row, column) for column in self.key)
+
+    def find(self, *key: Any) -> Optional[int]:
+        """
+        Index of the row with this key, by binary search, None if there is none.
+        """
+        if self._sorted_rows is None:
+            raise ValueError(f"Table {self.name} has no key")
+        low, high = 0, self._rows
+        while low < high:
+            middle = (low + high) // 2
+            row = self._sorted_rows[middle]
+            row_key = self._key(row)
+            if row_key == key:
+                return row
+            if _sort_key(row_key) < _sort_key(key):
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def column(self, name: str) -> Iterator[Any]:
+        """
+        The values of a column, in the order of the rows.
+        """
+        index = self._column_indexes[name]
+        return (self._value(index, row) for row in range(self._rows))
+
+
+class ReferenceRecords(Mapping):
+    """
+    Read-only mapping of the rows of a table by their key, like the JSON object
+    the table was compiled from. The key is a tuple for a table with several
+    key columns. Decoded rows are kept.
+    """
+
+    def __init__(self, table: ReferenceTable):
+        self._table = table
+        self._composite_key = len(table.key) > 1
+        self._records: Dict[Any, Mapping[str, Any]] = {}
+
+    def _find(self, key: Any) -> Optional[int]:
+        if self._composite_key:
+            return self._table.find(*key) if isinstance(key, tuple) else None
+        return self._table.find(key)
+
+    def __getitem__(self, key: Any) -> Mapping[str, Any]:
+        record = self._records.get(key)
+        if record is None:
+            row = self._find(key)
+            if row is None:
+                raise KeyError(key)
+            record = self._records[key] = self._table.row(row)
+        return record
+
+    def __iter__(self) -> Iterator[Any]:
+        columns = [self._table.column(column) for column in self._table.key]
+        return zip(*columns) if self._composite_key else columns[0]
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    def __contains__(self, key: Any) -> bool:
+        return key in self._records or self._find(key) is not None
+
+
+class ReferenceBundle:
+    """
+    A memory-mapped bundle of reference data.
+    """
+
+    def __init__(self, path):
+        """
+        :raises ValueError: if the file is not a bundle of this format version.
+        """
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, directory_size = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self._mmap.close()
+            raise ValueError(
+                f"{path} is not a reference data bundle of version {FORMAT_VERSION}"
+            )
+        if sys.byteorder != "little":
+            # The values are read in the native byte order
+            self._mmap.close()
+            raise ValueError("Reference data bundles need a little-endian machine")
+        self._buffer = memoryview(self._mmap)
+        directory_end = _HEADER.size + directory_size
+        directory = json.loads(bytes(self._buffer[_HEADER.size : directory_end]))
+        # Offsets of the sections are relative to the end of the directory
+        self._sections_start = directory_end + (-directory_end % _ALIGNMENT)
+        # Size and SHA-256 of each source file when the bundle was built
+        self.sources: Dict[str, Dict[str, Any]] = directory["sources"]
+        strings = directory["strings"]
+        self._string_offsets = self._view(strings["offsets"], strings["count"] + 1, "I")
+        self._strings_start = self._sections_start + strings["data"]
+        self._strings: Dict[int, str] = {}
+        self.tables = {
+            name: ReferenceTable(self, name, table)
+            for name, table in directory["tables"].items()
+        }
+        self._records: Dict[str, Any] = {}
+
+    def _view(self, offset: int, count: int, item_format: str) -> memoryview:
+        start = self._sections_start + offset
+        size = struct.calcsize(item_format)
+        return self._buffer[start : start + count * size].cast(item_format)
+
+    def string(self, string_id: int) -> str:
+        string = self._strings.get(string_id)
+        if string is None:
+            start = self._strings_start + self._string_offsets[string_id]
+            end = self._strings_start + self._string_offsets[string_id + 1]
+            string = self._strings[string_id] = str(self._buffer[start:end], "utf-8")
+        return string
+
+    def records(self, name: str) -> Any:
+        """
+        The rows of a table as a `ReferenceRecords` if the table has a key, or
+        its single row for a table compiled from a flat JSON object.
+        """
+        records = self._records.get(name)
+        if records is None:
+            table = self.tables[name]
+            records = ReferenceRecords(table) if table.key else table.row(0)
+            self._records[name] = records
+        return records
+
+    def is_built_from(self, sources: Mapping[str, Dict[str, Any]]) -> bool:
+        """
+        Whether the bundle was built from these source files, as described by
+        `source_digest`.
+        """
+        return self.sources == dict(sources)
+
+    def close(self) -> None:
+        for table in self.tables.values():
+            for _, _, values, states in table._columns:
+                values.release()
+                if states is not None:
+                    states.release()
+            if table._sorted_rows is not None:
+                table._sorted_rows.release()
+        self._string_offsets.release()
+        self._buffer.release()
+        self._mmap.close()
+
+
+def source_digest(path) -> Dict[str, Any]:
+    """
+    Size and SHA-256 of a source file, stored in the bundle to tell whether the
+    source changed since the bundle was built.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    return {"size": len(data), "sha256": hashlib.sha256(data).hexdigest()}
+
+
+def _item_format(column: Dict) -> str:
+    return {"q": "q", "d": "d", "s": "I", "j": "I"}[column["type"]]
+
+
+def _sort_key(key: Tuple) -> Tuple:
+    # Keys may hold None, sorted first
+    return tuple((value is not None, value) for value in key)
+
+
+class _BundleWriter:
+    def __init__(self):
+        self._string_ids: Dict[str, int] = {}
+        self._strings: List[bytes] = []
+        self._sections: List[bytes] = []
+        self._size = 0
+
+    def intern(self, string: str) -> int:
+        string_id = self._string_ids.get(string)
+        if string_id is None:
+            string_id = self._string_ids[string] = len(self._strings)
+            self._strings.append(string.encode("utf-8"))
+        return string_id
+
+    def add_section(self, data: bytes) -> int:
+        """
+        Offset of the section from the start of the sections.
+        """
+        offset = self._size
+        data += b"\0" * (-len(data) % _ALIGNMENT)
+        self._sections.append(data)
+        self._size += len(data)
+        return offset
+
+
+def _column_type(values: Sequence[Any]) -> str:
+    types = {type(value) for value in values if value is not None}
+    if types and types <= {int}:
+        if all(-(2**63) <= value < 2**63 for value in values if value is not None):
+            return "q"
+        return "j"
+    if types and types <= {int, float}:
+        if all(abs(value) < 2**53 for value in values if type(value) is int):
+            return "d"
+        return "j"
+    if types == {str}:
+        return "s"
+    return "j"
+
+
+def _encode_table(
+    writer: _BundleWriter, rows: List[Dict[str, Any]], key: List[str]
+) -> Dict:
+    columns: List[str] = []
+    for row in rows:
+        columns.extend(column for column in row if column not in columns)
+    directory_columns = []
+    for column in columns:
+        values = [row.get(column) for row in rows]
+        column_type = _column_type(values)
+        states = bytearray(len(rows))
+        encoded = []
+        for i, row in enumerate(rows):
+            value = row.get(column)
+            if column not in row:
+                states[i] = MISSING
+            elif value is None:
+                states[i] = NONE
+            elif column_type == "d" and type(value) is int:
+                states[i] = INTEGRAL
+            if value is None:
+                encoded.append(0)
+            elif column_type == "s":
+                encoded.append(writer.intern(value))
+            elif column_type == "j":
+                encoded.append(writer.intern(json.dumps(value)))
+            else:
+                encoded.append(value)
+        item_format = _item_format({"type": column_type})
+        values_offset = writer.add_section(
+            struct.pack(f"<{len(encoded)}{item_format}", *encoded)
+        )
+        states_offset = writer.add_section(bytes(states)) if any(states) else None
+        directory_columns.append(
+            {
+                "name": column,
+                "type": column_type,
+                "values": values_offset,
+                "states": states_offset,
+            }
+        )
+    sorted_rows_offset = None
+    if key:
+        keys = [tuple(row.get(column) for column in key) for row in rows]
+        if len(set(keys)) != len(keys):
+            raise ValueError(f"Duplicate keys for {key}")
+        order = sorted(range(len(rows)), key=lambda i: _sort_key(keys[i]))
+        sorted_rows_offset = writer.add_section(struct.pack(f"<{len(order)}I", *order))
+    return {
+        "rows": len(rows),
+        "key": key,
+        "columns": directory_columns,
+        "sorted_rows": sorted_rows_offset,
+    }
+
+
+def build_bundle(
+    tables: Mapping[str, Tuple[List[Dict[str, Any]], List[str]]],
+    sources: Mapping[str, Dict[str, Any]],
+) -> bytes:
+    """
+    Compile tables into a bundle.
+    :param tables: rows and key columns of each table, by name.
+    :param sources: `source_digest` of each source file, by path relative to
+                    the package.
+    """
+    writer = _BundleWriter()
+    directory_tables = {
+        name: _encode_table(writer, rows, key) for name, (rows, key) in tables.items()
+    }
+    offsets = [0]
+    for string in writer._strings:
+        offsets.append(offsets[-1] + len(string))
+    strings = {
+        "count": len(writer._strings),
+        "offsets": writer.add_section(struct.pack(f"<{len(offsets)}I", *offsets)),
+        "data": writer.add_section(b"".join(writer._strings)),
+    }
+    directory = json.dumps(
+        {"sources": dict(sources), "strings": strings, "tables": directory_tables},
+        separators=(",", ":"),
+    ).encode("utf-8")
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, len(directory))
+    padding = b"\0" * (-(len(header) + len(directory)) % _ALIGNMENT)
+    return header + directory + padding + b"".join(writer._sections)
+
+
+def load_source(
+    path, key: Sequence[str] = ()
+) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    Rows and key columns of the table compiled from a CSV or JSON source.
+    :param key: key columns of a CSV source.
+    """
+    if str(path).endswith(".json"):
+        return load_json_records(path)
+    return read_csv_records(path), list(key)
+
+
+def load_json_records(path) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    Rows of a JSON object of objects, keyed by a hidden key column, or a single
+    row for a flat JSON object.
+    """
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if all(isinstance(value, dict) for value in data.values()):
+        return [{KEY_COLUMN: key, **value} for key, value in data.items()], [KEY_COLUMN]
+    return [data], []
@@ -1,8 +1,11 @@
+import os
 from collections import Counter
 from typing import List, Union
 
-from codecarbon.core import cpu, gpu, powermetrics
+from codecarbon.core import cpu, powermetrics
+from codecarbon.core.cgroup import CGroup
 from codecarbon.core.config import parse_gpu_ids
+from codecarbon.core.process_tree import ProcessTree
 from codecarbon.core.util import detect_cpu_model, is_linux_os, is_mac_os, is_windows_os
 from codecarbon.external.hardware import CPU, GPU, MODE_CPU_LOAD, AppleSiliconChip
 from codecarbon.external.logger import logger
@@ -14,6 +17,30 @@ class ResourceTracker:
 
     def __init__(self, tracker):
         self.tracker = tracker
+        # Tree of the tracked process, shared by the CPU, the RAM and the GPU
+        self.process_tree = (
+            ProcessTree(os.getpid())
+            if self.tracker._tracking_mode == "process"
+            else None
+        )
+        # cgroup tracked in "cgroup" tracking mode, shared by the CPU and the RAM
+        self.cgroup = (
+            CGroup(self.tracker._cgroup_path)
+            if self.tracker._tracking_mode == "cgroup"
+            else None
+        )
+        if self.cgroup is not None:
+            logger.info(f"Tracking the cgroup at {self.cgroup.path}")
+
+    def _cpu_tracking_kwargs(self) -> dict:
+        """
+        Arguments of the CPU describing what it tracks.
+        """
+        return {
+            "tracking_mode": self.tracker._tracking_mode,
+            "process_tree": self.process_tree,
+            "cgroup": self.cgroup,
+        }
 
     def set_RAM_tracking(self):
         logger.info("[setup] RAM Tracking...")
@@ -24,12 +51,16 @@ class ResourceTracker:
             logger.info(
                 f"Using user-provided RAM power: {self.tracker._force_ram_power} Watts"
             )
-        else:
-            self.ram_tracker = "RAM power estimation model"
         ram = RAM(
             tracking_mode=self.tracker._tracking_mode,
             force_ram_power=self.tracker._force_ram_power,
+            process_tree=self.process_tree,
+            cgroup=self.cgroup,
         )
+        if ram.is_rapl_measured:
+            self.ram_tracker = "RAPL DRAM"
+        elif self.tracker._force_ram_power is None:
+            self.ram_tracker = "RAM power estimation model"
         self.tracker._conf["ram_total_size"] = ram.machine_memory_GB
         self.tracker._hardware: List[Union[RAM, CPU, GPU, AppleSiliconChip]] = [ram]
 
@@ -56,7 +87,7 @@ class ResourceTracker:
                     MODE_CPU_LOAD,
                     model,
                     max_power,
-                    tracking_mode=self.tracker._tracking_mode,
+                    **self._cpu_tracking_kwargs(),
                 )
                 self.cpu_tracker = MODE_CPU_LOAD
                 self.tracker._conf["cpu_model"] = hardware_cpu.get_model()
@@ -78,7 +109,13 @@ class ResourceTracker:
             logger.info("Tracking Intel CPU via RAPL interface")
             self.cpu_tracker = "RAPL"
             hardware_cpu = CPU.from_utils(
-                output_dir=self.tracker._output_dir, mode="intel_rapl"
+                output_dir=self.tracker._output_dir,
+                mode="intel_rapl",
+                **self._cpu_tracking_kwargs(),
+            )
+            logger.info(
+                "Intel RAPL domains found: "
+                + ", ".join(hardware_cpu._intel_interface.domains)
             )
             self.tracker._hardware.append(hardware_cpu)
             self.tracker._conf["cpu_model"] = hardware_cpu.get_model()
@@ -147,7 +184,7 @@ class ResourceTracker:
                         MODE_CPU_LOAD,
                         model,
                         max_power,
-                        tracking_mode=self.tracker._tracking_mode,
+                        **self._cpu_tracking_kwargs(),
                     )
                     self.cpu_tracker = MODE_CPU_LOAD
                 else:
@@ -155,7 +192,11 @@ class ResourceTracker:
                         "No CPU tracking mode found. Falling back on CPU constant mode."
                     )
                     hardware_cpu = CPU.from_utils(
-                        self.tracker._output_dir, "constant", model, max_power
+                        self.tracker._output_dir,
+                        "constant",
+                        model,
+                        max_power,
+                        **self._cpu_tracking_kwargs(),
                     )
                     self.cpu_tracker = "global constant"
                 self.tracker._hardware.append(hardware_cpu)
@@ -169,7 +210,7 @@ class ResourceTracker:
                         MODE_CPU_LOAD,
                         model,
                         max_power,
-                        tracking_mode=self.tracker._tracking_mode,
+                        **self._cpu_tracking_kwargs(),
                     )
                     self.cpu_tracker = MODE_CPU_LOAD
                 else:
@@ -177,7 +218,11 @@ class ResourceTracker:
                         "Failed to match CPU TDP constant. Falling back on a global constant."
                     )
                     self.cpu_tracker = "global constant"
-                    hardware_cpu = CPU.from_utils(self.tracker._output_dir, "constant")
+                    hardware_cpu = CPU.from_utils(
+                        self.tracker._output_dir,
+                        "constant",
+                        **self._cpu_tracking_kwargs(),
+                    )
                 self.tracker._hardware.append(hardware_cpu)
 
     def set_GPU_tracking(self):
@@ -188,9 +233,15 @@ class ResourceTracker:
                 self.tracker._conf["gpu_ids"] = self.tracker._gpu_ids
                 self.tracker._conf["gpu_count"] = len(self.tracker._gpu_ids)
 
+        from codecarbon.core import gpu
+
         if gpu.is_gpu_details_available():
             logger.info("Tracking Nvidia GPU via pynvml")
-            gpu_devices = GPU.from_utils(self.tracker._gpu_ids)
+            gpu_devices = GPU.from_utils(
+                self.tracker._gpu_ids,
+                tracking_mode=self.tracker._tracking_mode,
+                process_tree=self.process_tree,
+            )
             self.tracker._hardware.append(gpu_devices)
             gpu_names = [n["name"] for n in gpu_devices.devices.get_gpu_static_info()]
             gpu_names_dict = Counter(gpu_names)
@@ -0,0 +1,445 @@
+"""
+Samplers reading the hardware outside of the tracker's own measurement loop.
+They publish cumulative energy counters that the tracker reads on demand.
+"""
+
+import itertools
+import multiprocessing
+import os
+import struct
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from multiprocessing import shared_memory
+from typing import Callable, Dict, Hashable, List, Optional
+
+from codecarbon.core.measure import MeasurePowerEnergy
+from codecarbon.core.process_tree import ProcessTree
+from codecarbon.core.units import Energy, Power
+from codecarbon.external.logger import logger
+from codecarbon.external.scheduler import SamplingEngine
+
+# Layout of the counters published by a sampler, all stored as float64
+COUNTER_FIELDS = (
+    "cpu_energy_kWh",
+    "gpu_energy_kWh",
+    "ram_energy_kWh",
+    "cpu_power_W",
+    "gpu_power_W",
+    "ram_power_W",
+)
+COUNTERS_FORMAT = f"{len(COUNTER_FIELDS)}d"
+
+
+@dataclass
+class EnergyCounters:
+    """
+    Cumulative energy consumed by each kind of hardware since the sampler started,
+    along with the last measured power.
+    """
+
+    cpu_energy: Energy = field(default_factory=lambda: Energy.from_energy(kWh=0))
+    gpu_energy: Energy = field(default_factory=lambda: Energy.from_energy(kWh=0))
+    ram_energy: Energy = field(default_factory=lambda: Energy.from_energy(kWh=0))
+    cpu_power: Power = field(default_factory=lambda: Power.from_watts(watts=0))
+    gpu_power: Power = field(default_factory=lambda: Power.from_watts(watts=0))
+    ram_power: Power = field(default_factory=lambda: Power.from_watts(watts=0))
+
+    @property
+    def total_energy(self) -> Energy:
+        return self.cpu_energy + self.gpu_energy + self.ram_energy
+
+    def __sub__(self, other: "EnergyCounters") -> "EnergyCounters":
+        """
+        Energy consumed between `other` and `self`, with the power of `self`.
+        """
+        return EnergyCounters(
+            cpu_energy=self.cpu_energy - other.cpu_energy,
+            gpu_energy=self.gpu_energy - other.gpu_energy,
+            ram_energy=self.ram_energy - other.ram_energy,
+            cpu_power=self.cpu_power,
+            gpu_power=self.gpu_power,
+            ram_power=self.ram_power,
+        )
+
+    def to_values(self) -> List[float]:
+        return [
+            self.cpu_energy.kWh,
+            self.gpu_energy.kWh,
+            self.ram_energy.kWh,
+            self.cpu_power.W,
+            self.gpu_power.W,
+            self.ram_power.W,
+        ]
+
+    @classmethod
+    def from_values(cls, values: List[float]) -> "EnergyCounters":
+        return cls(
+            cpu_energy=Energy.from_energy(kWh=values[0]),
+            gpu_energy=Energy.from_energy(kWh=values[1]),
+            ram_energy=Energy.from_energy(kWh=values[2]),
+            cpu_power=Power.from_watts(watts=values[3]),
+            gpu_power=Power.from_watts(watts=values[4]),
+            ram_power=Power.from_watts(watts=values[5]),
+        )
+
+    @classmethod
+    def from_measure(cls, measure: MeasurePowerEnergy) -> "EnergyCounters":
+        return cls(
+            cpu_energy=measure._total_cpu_energy,
+            gpu_energy=measure._total_gpu_energy,
+            ram_energy=measure._total_ram_energy,
+            cpu_power=measure._cpu_power,
+            gpu_power=measure._gpu_power,
+            ram_power=measure._ram_power,
+        )
+
+
+class BaseSampler(ABC):
+    """
+    A source of cumulative energy counters for a tracker.
+    """
+
+    @abstractmethod
+    def start(self) -> None:
+        """
+        Start sampling the hardware on behalf of a tracker.
+        """
+
+    @abstractmethod
+    def read_counters(self, refresh: bool = True) -> EnergyCounters:
+        """
+        Read the cumulative counters.
+        :param refresh: measure the hardware first, so that the counters include
+                        the energy consumed up to now.
+        """
+
+    @abstractmethod
+    def stop(self) -> None:
+        """
+        Stop sampling the hardware on behalf of a tracker.
+        """
+
+
+class ProcessSampler(BaseSampler):
+    """
+    Sample the hardware from a helper subprocess, so that the hardware reads do
+    not compete for the GIL of the tracked process.
+
+    The helper runs its own `SamplingEngine` and publishes cumulative counters
+    in a shared memory segment. The tracker only talks to it when it needs fresh
+    counters, i.e. on `flush()` and `stop()`.
+
+    The helper is forked so that it inherits the hardware set up by the tracker:
+    this sampler is only available where the "fork" start method is. Being a
+    child of the tracked process, it is left out of its `ProcessTree`.
+
+    Each refresh request carries an id, echoed by the helper: a reply that came
+    after its request timed out is discarded by the next request.
+    """
+
+    REFRESH = "refresh"
+    STOP = "stop"
+
+    def __init__(
+        self,
+        hardware: list,
+        measure_power_secs: float,
+        timeout: float = 30,
+        process_tree: Optional[ProcessTree] = None,
+    ):
+        """
+        :param hardware: list of hardware components to measure.
+        :param measure_power_secs: interval between two measures in the helper.
+        :param timeout: seconds to wait for the helper to answer a request.
+        :param process_tree: tree of the tracked process measured by the
+                             hardware, if any, to leave the helper out of.
+        """
+        self._hardware = hardware
+        self._measure_power_secs = measure_power_secs
+        self._timeout = timeout
+        self._process_tree = process_tree
+        self._request_ids = itertools.count()
+        self._shm: Optional[shared_memory.SharedMemory] = None
+        self._process = None
+        self._connection = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def is_available() -> bool:
+        return "fork" in multiprocessing.get_all_start_methods()
+
+    @property
+    def is_running(self) -> bool:
+        return self._process is not None and self._process.is_alive()
+
+    def start(self) -> None:
+        if self._process is not None:
+            return
+        # Read initial energy for hardware before the helper inherits it
+        for hardware in self._hardware:
+            hardware.start()
+        context = multiprocessing.get_context("fork")
+        self._shm = shared_memory.SharedMemory(
+            create=True, size=struct.calcsize(COUNTERS_FORMAT)
+        )
+        struct.pack_into(
+            COUNTERS_FORMAT, self._shm.buf, 0, *EnergyCounters().to_values()
+        )
+        self._connection, child_connection = context.Pipe()
+        self._process = context.Process(
+            target=_process_sampler_main,
+            args=(
+                self._hardware,
+                self._measure_power_secs,
+                self._shm,
+                child_connection,
+                self._process_tree,
+            ),
+            name="codecarbon-process-sampler",
+            daemon=True,
+        )
+        self._process.start()
+        child_connection.close()
+        if self._process_tree is not None:
+            self._process_tree.exclude(self._process.pid)
+        logger.info(f"Hardware is sampled in process {self._process.pid}")
+
+    def read_counters(self, refresh: bool = True) -> EnergyCounters:
+        with self._lock:
+            if refresh and self.is_running:
+                try:
+                    request_id = next(self._request_ids)
+                    self._connection.send((self.REFRESH, request_id))
+                    if not self._wait_reply(request_id):
+                        logger.warning(
+                            "Process sampler did not answer in time,"
+                            + " using its last published counters."
+                        )
+                except (BrokenPipeError, EOFError, OSError) as e:
+                    logger.warning(f"Unable to reach the process sampler: {e}")
+            return EnergyCounters.from_values(
+                struct.unpack_from(COUNTERS_FORMAT, self._shm.buf, 0)
+            )
+
+    def _wait_reply(self, request_id: int) -> bool:
+        """
+        Wait for the reply to a request, discarding the late replies to the
+        previous ones. Must be called with the lock.
+        :return: False if the helper did not answer in time.
+        """
+        deadline = time.monotonic() + self._timeout
+        while True:
+            if not self._connection.poll(max(deadline - time.monotonic(), 0)):
+                return False
+            if self._connection.recv() == request_id:
+                return True
+
+    def stop(self) -> None:
+        with self._lock:
+            if self._process is None:
+                return
+            try:
+                self._connection.send(self.STOP)
+            except (BrokenPipeError, OSError):
+                pass
+            self._process.join(self._timeout)
+            if self._process.is_alive():
+                self._process.terminate()
+            self._connection.close()
+            self._process = None
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+
+class SharedSampler:
+    """
+    Sample the hardware once for all the trackers of a process.
+
+    There is one shared sampler per hardware configuration. Each tracker holds a
+    `SharedSamplerSubscription`: the hardware is read by a single sampling engine
+    while at least one subscription is started. Each tracker gets its energy as
+    the difference of the shared counters between its start and its stop, so N
+    concurrent trackers cost one set of hardware reads and stay consistent.
+    """
+
+    _instances: Dict[Hashable, "SharedSampler"] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, key: Hashable, hardware: list, hardware_conf: Dict):
+        """
+        :param key: hardware configuration the sampler is shared for.
+        :param hardware: list of hardware components to measure.
+        :param hardware_conf: tracker configuration describing the hardware, to
+                              be copied by the trackers reusing the sampler.
+        """
+        self.key = key
+        self.hardware = hardware
+        self.hardware_conf = hardware_conf
+        self._measure = MeasurePowerEnergy(hardware=hardware, pue=1)
+        self._measure_lock = threading.Lock()
+        # time.monotonic() of the last measure
+        self._last_measure = 0.0
+        self._engine = SamplingEngine(name="codecarbon-shared-sampler")
+        self._engine.add_job("monitor_power", 1, self._monitor_power)
+        self._subscriptions: List["SharedSamplerSubscription"] = []
+
+    @classmethod
+    def get_or_create(
+        cls,
+        key: Hashable,
+        setup_hardware: Callable[[], list],
+        get_hardware_conf: Callable[[], Dict],
+    ) -> "SharedSampler":
+        """
+        Get the sampler shared for the hardware configuration `key`, creating it
+        with `setup_hardware()` if it does not exist yet.
+        """
+        with cls._instances_lock:
+            sampler = cls._instances.get(key)
+            if sampler is None:
+                hardware = setup_hardware()
+                sampler = cls(key, hardware, get_hardware_conf())
+                cls._instances[key] = sampler
+            return sampler
+
+    def subscription(self, measure_power_secs: float) -> "SharedSamplerSubscription":
+        return SharedSamplerSubscription(self, measure_power_secs)
+
+    def _subscribe(self, subscription: "SharedSamplerSubscription") -> None:
+        with self._instances_lock:
+            with self._measure_lock:
+                if not self._subscriptions:
+                    # Read initial energy for hardware
+                    for hardware in self.hardware:
+                        hardware.start()
+                    self._measure = MeasurePowerEnergy(hardware=self.hardware, pue=1)
+                    self._last_measure = time.monotonic()
+                self._subscriptions.append(subscription)
+            self._instances.setdefault(self.key, self)
+            self._update_measure_job()
+            self._engine.start()
+
+    def _unsubscribe(self, subscription: "SharedSamplerSubscription") -> None:
+        with self._instances_lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+            if self._subscriptions:
+                self._update_measure_job()
+            else:
+                self._engine.stop()
+                if self._instances.get(self.key) is self:
+                    del self._instances[self.key]
+
+    def _update_measure_job(self) -> None:
+        """
+        Measure as often as the most demanding subscribed tracker asks for.
+        """
+        interval = min(s.measure_power_secs for s in self._subscriptions)
+        job = self._engine.get_job("measure_power_and_energy")
+        if job is None:
+            self._engine.add_job("measure_power_and_energy", interval, self._do_measure)
+        elif job.interval != interval:
+            self._engine.set_interval("measure_power_and_energy", interval)
+
+    def _do_measure(self) -> None:
+        with self._measure_lock:
+            self._measure.do_measure()
+            self._last_measure = time.monotonic()
+
+    def _monitor_power(self) -> None:
+        with self._measure_lock:
+            self._measure.monitor_power()
+
+    def read_counters(
+        self, refresh: bool = True, max_age: Optional[float] = None
+    ) -> EnergyCounters:
+        """
+        :param refresh: measure the hardware first.
+        :param max_age: without `refresh`, measure the hardware first anyway if
+                        the last measure is older than `max_age` seconds.
+        """
+        with self._measure_lock:
+            if refresh or (
+                max_age is not None and time.monotonic() - self._last_measure >= max_age
+            ):
+                self._measure.do_measure()
+                self._last_measure = time.monotonic()
+            return EnergyCounters.from_measure(self._measure)
+
+
+class SharedSamplerSubscription(BaseSampler):
+    """
+    The view of a tracker on a `SharedSampler`.
+    """
+
+    def __init__(self, sampler: SharedSampler, measure_power_secs: float):
+        self.sampler = sampler
+        self.measure_power_secs = measure_power_secs
+
+    def start(self) -> None:
+        self.sampler._subscribe(self)
+
+    def read_counters(self, refresh: bool = True) -> EnergyCounters:
+        # The shared counters may be measured at another interval: a read
+        # without refresh, e.g. for the live outputs, still gets counters at
+        # most `measure_power_secs` old
+        return self.sampler.read_counters(
+            refresh=refresh, max_age=self.measure_power_secs
+        )
+
+    def stop(self) -> None:
+        self.sampler._unsubscribe(self)
+
+
+def _process_sampler_main(
+    hardware: list,
+    measure_power_secs: float,
+    shm: shared_memory.SharedMemory,
+    connection,
+    process_tree: Optional[ProcessTree] = None,
+) -> None:
+    """
+    Entry point of the helper process of `ProcessSampler`.
+    The shared memory segment is inherited from the tracked process, which owns it.
+    """
+    if process_tree is not None:
+        # The tree was copied before the helper was started
+        process_tree.exclude(os.getpid())
+    measure = MeasurePowerEnergy(hardware=hardware, pue=1)
+    measure_lock = threading.Lock()
+
+    def _measure():
+        with measure_lock:
+            measure.do_measure()
+            struct.pack_into(
+                COUNTERS_FORMAT,
+                shm.buf,
+                0,
+                *EnergyCounters.from_measure(measure).to_values(),
+            )
+
+    def _monitor_power():
+        with measure_lock:
+            measure.monitor_power()
+
+    engine = SamplingEngine(name="codecarbon-process-sampler")
+    engine.add_job("measure_power_and_energy", measure_power_secs, _measure)
+    engine.add_job("monitor_power", 1, _monitor_power)
+    engine.start()
+    try:
+        while True:
+            try:
+                request = connection.recv()
+            except EOFError:
+                # The tracked process is gone
+                break
+            if request == ProcessSampler.STOP:
+                break
+            _, request_id = request
+            _measure()
+            connection.send(request_id)
+    finally:
+        engine.stop()
@@ -0,0 +1,231 @@
+"""
+In-memory history of the power and energy measured by the tracker.
+"""
+
+import threading
+from array import array
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+
+@dataclass
+class Series:
+    """
+    A view of measured samples, oldest first.
+
+    Attributes:
+        timestamps (List[float]): Time of the end of each sample, as a Unix timestamp.
+        power (List[float]): Mean power over each sample, in W.
+        energy (List[float]): Energy consumed during each sample, in kWh.
+    """
+
+    timestamps: List[float] = field(default_factory=list)
+    power: List[float] = field(default_factory=list)
+    energy: List[float] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+
+class RingBuffer:
+    """
+    Fixed-capacity history of (timestamp, power, energy) samples.
+
+    Samples are stored in preallocated `array('d')` columns, so memory stays
+    O(capacity) however long the tracker runs: once full, the oldest sample is
+    overwritten by each new one. Samples may be appended and read from
+    different threads.
+    """
+
+    def __init__(self, capacity: int):
+        if capacity <= 0:
+            raise ValueError(f"Capacity must be positive: {capacity}")
+        self.capacity = capacity
+        self._timestamps = array("d", bytes(8 * capacity))
+        self._power = array("d", bytes(8 * capacity))
+        self._energy = array("d", bytes(8 * capacity))
+        # Index of the next sample to write
+        self._head = 0
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, timestamp: float, power_W: float, energy_kWh: float) -> None:
+        with self._lock:
+            self._timestamps[self._head] = timestamp
+            self._power[self._head] = power_W
+            self._energy[self._head] = energy_kWh
+            self._head = (self._head + 1) % self.capacity
+            self._size = min(self._size + 1, self.capacity)
+
+    def _physical_index(self, logical_index: int) -> int:
+        """
+        Position in the columns of the `logical_index`-th oldest sample.
+        """
+        return (self._head - self._size + logical_index) % self.capacity
+
+    def _first_index_since(self, since: Optional[float]) -> int:
+        """
+        Logical index of the first sample with a timestamp >= `since`. Must be
+        called with the lock.
+        """
+        if since is None:
+            return 0
+        low, high = 0, self._size
+        while low < high:
+            middle = (low + high) // 2
+            if self._timestamps[self._physical_index(middle)] < since:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _column(self, column: array, start: int) -> List[float]:
+        first = self._physical_index(start)
+        count = self._size - start
+        if first + count <= self.capacity:
+            return column[first : first + count].tolist()
+        return (
+            column[first:].tolist() + column[: first + count - self.capacity].tolist()
+        )
+
+    def since(self, since: Optional[float] = None) -> Series:
+        """
+        :param since: Unix timestamp of the oldest sample to return, None for all
+                      the samples still in the buffer.
+        :return: The samples since `since`, oldest first.
+        """
+        with self._lock:
+            return self._series_from(self._first_index_since(since))
+
+    def _series_from(self, start: int) -> Series:
+        """
+        The samples from the logical index `start`. Must be called with the lock.
+        """
+        return Series(
+            timestamps=self._column(self._timestamps, start),
+            power=self._column(self._power, start),
+            energy=self._column(self._energy, start),
+        )
+
+    def downsample(self, max_points: int, since: Optional[float] = None) -> Series:
+        """
+        Aggregate the samples since `since` into at most `max_points` buckets of
+        consecutive samples. Each bucket keeps the timestamp of its last sample,
+        the mean of its power and the sum of its energy.
+        """
+        if max_points <= 0:
+            raise ValueError(f"max_points must be positive: {max_points}")
+        with self._lock:
+            return self._downsample(max_points, self._first_index_since(since))
+
+    def _downsample(self, max_points: int, start: int) -> Series:
+        """
+        Must be called with the lock.
+        """
+        count = self._size - start
+        if count <= max_points:
+            return self._series_from(start)
+        bucket_size = -(-count // max_points)
+        series = Series()
+        for bucket_start in range(start, self._size, bucket_size):
+            bucket_end = min(bucket_start + bucket_size, self._size)
+            power = 0.0
+            energy = 0.0
+            for i in range(bucket_start, bucket_end):
+                index = self._physical_index(i)
+                power += self._power[index]
+                energy += self._energy[index]
+            series.timestamps.append(
+                self._timestamps[self._physical_index(bucket_end - 1)]
+            )
+            series.power.append(power / (bucket_end - bucket_start))
+            series.energy.append(energy)
+        return series
+
+
+class EnergyTimeline:
+    """
+    Cumulative energy of each component at the time of each measure, used to
+    attribute energy to any interval of time after the fact.
+
+    Times are taken from `time.perf_counter()`. The energy at a time between two
+    measures is linearly interpolated. Points are only kept as long as they may
+    be needed to look up an interval, see `prune()`.
+    """
+
+    def __init__(self, components: Tuple[str, ...]):
+        self.components = components
+        self._times = array("d")
+        self._energies = {component: array("d") for component in components}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._times)
+
+    def append(self, timestamp: float, **energies_kWh: float) -> None:
+        """
+        Record the cumulative energy (kWh) of each component at `timestamp`,
+        which must not be older than the last recorded point.
+        """
+        with self._lock:
+            if self._times and timestamp < self._times[-1]:
+                raise ValueError(
+                    f"Timeline point at {timestamp} is older than the last one"
+                )
+            self._times.append(timestamp)
+            for component in self.components:
+                self._energies[component].append(energies_kWh.get(component, 0.0))
+
+    def _energy_at(self, timestamp: float) -> List[float]:
+        """
+        Cumulative energy of each component at `timestamp`, clamped to the
+        recorded points. Must be called with the lock.
+        """
+        if not self._times:
+            return [0.0] * len(self.components)
+        index = bisect_right(self._times, timestamp)
+        if index == 0:
+            return [self._energies[c][0] for c in self.components]
+        if index == len(self._times):
+            return [self._energies[c][-1] for c in self.components]
+        t0, t1 = self._times[index - 1], self._times[index]
+        ratio = (timestamp - t0) / (t1 - t0)
+        values = []
+        for component in self.components:
+            e0 = self._energies[component][index - 1]
+            e1 = self._energies[component][index]
+            values.append(e0 + (e1 - e0) * ratio)
+        return values
+
+    def energy_between(self, start: float, stop: float) -> dict:
+        """
+        :return: The energy (kWh) consumed by each component between `start`
+                 and `stop`.
+        """
+        with self._lock:
+            at_start = self._energy_at(start)
+            at_stop = self._energy_at(stop)
+        return {
+            component: e1 - e0
+            for component, e0, e1 in zip(self.components, at_start, at_stop)
+        }
+
+    def prune(self, keep_since: Optional[float] = None) -> None:
+        """
+        Forget the points not needed to look up times >= `keep_since`.
+        With None, only the last point is kept.
+        """
+        with self._lock:
+            if keep_since is None:
+                count = len(self._times) - 1
+            else:
+                count = bisect_right(self._times, keep_since) - 1
+            if count <= 0:
+                return
+            del self._times[:count]
+            for component in self.components:
+                del self._energies[component][:count]
@@ -3,11 +3,11 @@ import re
 import subprocess
 import sys
 from contextlib import contextmanager
+from functools import lru_cache
 from os.path import expandvars
 from pathlib import Path
 from typing import Optional, Union
 
-import cpuinfo
 import psutil
 
 from codecarbon.external.logger import logger
@@ -73,7 +73,11 @@ def backup(file_path: Union[str, Path], ext: Optional[str] = ".bak") -> None:
     file_path.rename(backup_path)
 
 
+@lru_cache(maxsize=None)
 def detect_cpu_model() -> str:
+    # The CPU does not change while the process runs, and getting its info is slow
+    import cpuinfo
+
     cpu_info = cpuinfo.get_cpu_info()
     if cpu_info:
         cpu_model_detected = cpu_info.get("brand_raw", "")
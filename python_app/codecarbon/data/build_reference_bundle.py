@@ -0,0 +1,71 @@
+"""
+This script compiles the reference data files listed in
+`DataSource.bundle_sources` into the binary bundle `reference_data.bin`, which
+CodeCarbon memory-maps instead of parsing the CSV and JSON files.
+
+The CSV and JSON files stay the source of truth: run this script after changing
+them and commit the bundle with them. CodeCarbon ignores a bundle whose sources
+changed since it was built, as told by the SHA-256 of each source stored in the
+bundle. With --check, the script only exits with an error if the bundle is out
+of date, e.g. in CI, listing the sources that changed.
+
+cd codecarbon/data
+uv run python build_reference_bundle.py [--check]
+
+"""
+
+import os
+import sys
+
+from codecarbon.core.reference_data import (
+    ReferenceBundle,
+    build_bundle,
+    load_source,
+    source_digest,
+)
+from codecarbon.input import DataSource
+
+package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def main():
+    data_source = DataSource()
+    tables = {}
+    sources = {}
+    for config_key, key in data_source.bundle_sources.items():
+        filepath = data_source.config[config_key]
+        path = os.path.join(package_dir, filepath)
+        tables[config_key] = load_source(path, key)
+        sources[filepath] = source_digest(path)
+    bundle = build_bundle(tables, sources)
+
+    output_file = os.path.join(package_dir, data_source.config["reference_bundle_path"])
+    if "--check" in sys.argv:
+        try:
+            built = ReferenceBundle(output_file)
+        except (OSError, ValueError) as e:
+            print(f"{output_file} cannot be read ({e}), run {__file__}")
+            sys.exit(1)
+        changed = sorted(
+            filepath
+            for filepath, digest in sources.items()
+            if built.sources.get(filepath) != digest
+        )
+        up_to_date = built.is_built_from(sources)
+        built.close()
+        if not up_to_date:
+            print(
+                f"{output_file} is out of date, the sources changed since it was"
+                + f" built: {', '.join(changed) or 'files removed'}, run {__file__}"
+            )
+            sys.exit(1)
+        print(f"{output_file} is up to date")
+        return
+
+    with open(output_file, "wb") as f:
+        f.write(bundle)
+    print(f"Wrote {output_file} ({len(bundle)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+This script fits the power of each CPU family against its load, from the RAPL
+measurements of the profiling CSV files of this directory, and writes the
+curves as lookup tables used by the CPU load mode of CodeCarbon.
+
+For each family, the power is normalized by the power at full load of each
+profiling run, so that the curve gives the share of the TDP used at a load.
+The curve is a least-squares linear spline with knots every 10% of load,
+smoothed by a penalty on its second differences, then made non-decreasing.
+
+cd codecarbon/data/hardware/cpu_load_profiling
+uv run python fit_load_curves.py
+
+"""
+
+import csv
+import glob
+import json
+import os
+import re
+
+import numpy as np
+
+# Families of CPUs, from the name reported by the CPU
+CPU_FAMILIES = {
+    "AMD EPYC": r"AMD EPYC",
+    "AMD Ryzen Threadripper": r"AMD Ryzen Threadripper",
+    "Intel Xeon E3": r"Intel\(R\) Xeon\(R\) CPU E3-",
+    "Intel Xeon E5": r"Intel\(R\) Xeon\(R\) CPU E5-",
+}
+# Knots of the curves, as loads from 0 to 1
+KNOTS = np.linspace(0.0, 1.0, 11)
+SMOOTHING = 0.05
+output_file = "../cpu_load_curves.json"
+
+
+def read_run(path):
+    """
+    Load (0-1) and RAPL power (W) of a profiling run, None if it is empty.
+    """
+    with open(path) as f:
+        rows = list(csv.DictReader(f))
+    if not rows:
+        return None
+    load = np.array([float(row["cpu_load"]) for row in rows]) / 100.0
+    power = np.array([float(row["rapl_power"]) for row in rows])
+    return rows[0]["cpu_name"], load, power
+
+
+def hat_basis(load):
+    """
+    Value of each linear spline basis function of `KNOTS` at each load.
+    """
+    step = KNOTS[1] - KNOTS[0]
+    return np.clip(1.0 - np.abs(load[:, None] - KNOTS[None, :]) / step, 0.0, None)
+
+
+def fit_curve(load, power):
+    """
+    Power at each knot of the smoothed least-squares spline through the points.
+    """
+    basis = hat_basis(load)
+    second_diff = np.diff(np.eye(len(KNOTS)), n=2, axis=0)
+    lhs = basis.T @ basis + SMOOTHING * len(load) * second_diff.T @ second_diff
+    values = np.linalg.solve(lhs, basis.T @ power)
+    return np.maximum.accumulate(np.clip(values, 0.0, None))
+
+
+def main():
+    runs = {family: [] for family in CPU_FAMILIES}
+    for path in sorted(glob.glob(os.path.join("*", "*.csv"))):
+        run = read_run(path)
+        if run is None:
+            continue
+        cpu_name, load, power = run
+        family = next(
+            (f for f, pattern in CPU_FAMILIES.items() if re.match(pattern, cpu_name)),
+            None,
+        )
+        if family is None:
+            print(f"Skipping {path}: unknown CPU family for {cpu_name}")
+            continue
+        # Power relative to the power at full load of the run
+        full_load_power = fit_curve(load, power)[-1]
+        runs[family].append((cpu_name, load, power / full_load_power))
+
+    curves = {}
+    for family, family_runs in runs.items():
+        if not family_runs:
+            continue
+        load = np.concatenate([run[1] for run in family_runs])
+        power = np.concatenate([run[2] for run in family_runs])
+        values = fit_curve(load, power)
+        curves[family] = {
+            "cpus": sorted({run[0] for run in family_runs}),
+            "power": [round(float(value), 4) for value in values / values[-1]],
+        }
+        print(f"{family}: {curves[family]['power']}")
+
+    with open(output_file, "w") as f:
+        json.dump({"load": KNOTS.round(4).tolist(), "curves": curves}, f, indent=2)
+        f.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,40 +3,57 @@ Contains implementations of the Public facing API: EmissionsTracker,
 OfflineEmissionsTracker, context manager and decorator @track_emissions
 """
 
+import atexit
 import dataclasses
 import os
 import platform
+import threading
 import time
 import uuid
 from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
 from functools import wraps
-from typing import Any, Callable, Dict, List, Optional, Union
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
 from codecarbon._version import __version__
+from codecarbon.core.cgroup import find_cgroup
 from codecarbon.core.config import get_hierarchical_config
 from codecarbon.core.emissions import Emissions
+from codecarbon.core.highfrequency import HighFrequencySampler
+from codecarbon.core.process_tree import ProcessTree
 from codecarbon.core.resource_tracker import ResourceTracker
+from codecarbon.core.sampler import (
+    BaseSampler,
+    EnergyCounters,
+    ProcessSampler,
+    SharedSampler,
+)
+from codecarbon.core.timeseries import EnergyTimeline, RingBuffer, Series
 from codecarbon.core.units import Energy, Power, Time, Water
 from codecarbon.core.util import count_cpus, count_physical_cpus, suppress
 from codecarbon.external.geography import CloudMetadata, GeoMetadata
 from codecarbon.external.hardware import CPU, GPU, AppleSiliconChip
 from codecarbon.external.logger import logger, set_logger_format, set_logger_level
 from codecarbon.external.ram import RAM
-from codecarbon.external.scheduler import PeriodicScheduler
-from codecarbon.external.task import Task
+from codecarbon.external.scheduler import AdaptiveSamplingPolicy, SamplingEngine
+from codecarbon.external.task import Task, TaskAggregate
 from codecarbon.input import DataSource
 from codecarbon.lock import Lock
-from codecarbon.output import (
-    BaseOutput,
-    CodeCarbonAPIOutput,
-    EmissionsData,
-    FileOutput,
-    HTTPOutput,
-    LogfireOutput,
-    LoggerOutput,
-    PrometheusOutput,
-)
+from codecarbon.output import BaseOutput, EmissionsData, FileOutput, LoggerOutput
+
+if TYPE_CHECKING:
+    import asyncio
 
 # /!\ Warning: current implementation prevents the user from setting any value to None
 # from the script call
@@ -56,6 +73,44 @@ from codecarbon.output import (
 
 _sentinel = object()
 
+# Names of the periodic jobs run by the tracker's sampling engine
+MEASURE_JOB = "measure_power_and_energy"
+MONITOR_POWER_JOB = "monitor_power"
+LIVE_OUT_JOB = "live_out"
+
+# Hardware components whose measures are kept in the tracker's history
+SERIES_COMPONENTS = ("cpu", "gpu", "ram")
+
+# Configuration set up by the ResourceTracker, shared along with the hardware
+HARDWARE_CONF_KEYS = (
+    "ram_total_size",
+    "cpu_model",
+    "gpu_model",
+    "gpu_count",
+    "gpu_ids",
+)
+
+
+@dataclasses.dataclass
+class MeasureSnapshot:
+    """
+    The totals measured by a tracker at one point in time, to compute their
+    emissions later, possibly from another thread.
+    """
+
+    timestamp: datetime
+    duration: Time
+    cpu_energy: Energy
+    gpu_energy: Energy
+    ram_energy: Energy
+    total_energy: Energy
+    water: Water
+    cpu_power: Power
+    gpu_power: Power
+    ram_power: Power
+    # Tasks whose emissions are computed with the snapshot
+    tasks: List[Task] = dataclasses.field(default_factory=list)
+
 
 class BaseEmissionsTracker(ABC):
     """
@@ -65,8 +120,14 @@ class BaseEmissionsTracker(ABC):
     and `CarbonTracker.`
     """
 
-    _scheduler: Optional[PeriodicScheduler] = None
-    _scheduler_monitor_power: Optional[PeriodicScheduler] = None
+    _sampler: Optional[SamplingEngine] = None
+    # Whether the sampling engine runs in its own thread
+    _sampler_threaded = True
+    _external_sampler: Optional[BaseSampler] = None
+    # Tree of the tracked process in tracking_mode="process"
+    _process_tree: Optional[ProcessTree] = None
+    # Background thread computing and writing the emissions of `wait=False` calls
+    _finalizer: Optional[ThreadPoolExecutor] = None
 
     def _set_from_conf(
         self, var, name, default=None, return_type=None, prevent_setter=False
@@ -182,6 +243,12 @@ class BaseEmissionsTracker(ABC):
         wue: Optional[bool] = _sentinel,
         force_mode_cpu_load: Optional[bool] = _sentinel,
         allow_multiple_runs: Optional[bool] = _sentinel,
+        sampling_backend: Optional[str] = _sentinel,
+        series_capacity: Optional[int] = _sentinel,
+        adaptive_sampling: Optional[bool] = _sentinel,
+        min_measure_power_secs: Optional[float] = _sentinel,
+        max_measure_power_secs: Optional[float] = _sentinel,
+        cgroup_path: Optional[str] = _sentinel,
     ):
         """
         :param project_name: Project name for current experiment run, default name
@@ -224,6 +291,8 @@ class BaseEmissionsTracker(ABC):
         :param tracking_mode: One of "process" or "machine" in order to measure the
                               power consumption due to the entire machine or to try and
                               isolate the tracked processe's in isolation.
+                              Or "cgroup" to measure the processes of a cgroup v2,
+                              e.g. a container, see `cgroup_path`.
                               Defaults to "machine".
         :param log_level: Global codecarbon log level. Accepts one of:
                             {"debug", "info", "warning", "error", "critical"}.
@@ -240,6 +309,33 @@ class BaseEmissionsTracker(ABC):
         :param force_mode_cpu_load: Force the addition of a CPU in MODE_CPU_LOAD
         :param allow_multiple_runs: Allow multiple instances of codecarbon running in parallel. Defaults to False.
         :param wue: WUE (Water Usage Effectiveness) of the datacenter, L/kWh.
+        :param sampling_backend: Where the hardware is sampled. One of "thread" to
+                                 sample from a background thread of the tracked
+                                 process, "process" to sample from a helper
+                                 subprocess, which does not compete for the GIL,
+                                 or "shared" to share a single sampler between
+                                 all the trackers of the process with the same
+                                 hardware configuration. Defaults to "thread".
+        :param series_capacity: Number of measures kept in memory for each
+                                hardware component, see `get_series`.
+                                Defaults to 4096.
+        :param adaptive_sampling: Adapt the interval between two measures to the
+                                  variation of the power: lengthen it while the
+                                  power is stable, shorten it when the power
+                                  changes quickly. Starts from `measure_power_secs`.
+                                  Only with the "thread" sampling backend.
+                                  Defaults to False.
+        :param min_measure_power_secs: Shortest interval (in seconds) between two
+                                       measures with `adaptive_sampling`,
+                                       defaults to 1.
+        :param max_measure_power_secs: Longest interval (in seconds) between two
+                                       measures with `adaptive_sampling`,
+                                       defaults to 60.
+        :param cgroup_path: Directory of the cgroup v2 tracked with
+                            tracking_mode="cgroup", absolute or relative to
+                            the mount point of the cgroup v2 hierarchy,
+                            e.g. /sys/fs/cgroup. Defaults to the cgroup of the
+                            current process.
         """
 
         # logger.info("base tracker init")
@@ -291,13 +387,39 @@ class BaseEmissionsTracker(ABC):
         self._set_from_conf(pue, "pue", 1.0, float)
         self._set_from_conf(wue, "wue", 0, float)
         self._set_from_conf(force_mode_cpu_load, "force_mode_cpu_load", False, bool)
+        self._set_from_conf(sampling_backend, "sampling_backend", "thread")
+        self._set_from_conf(series_capacity, "series_capacity", 4096, int)
+        self._set_from_conf(adaptive_sampling, "adaptive_sampling", False, bool)
+        self._set_from_conf(
+            min_measure_power_secs,
+            "min_measure_power_secs",
+            min(1.0, self._measure_power_secs),
+            float,
+        )
+        self._set_from_conf(
+            max_measure_power_secs,
+            "max_measure_power_secs",
+            max(60.0, self._measure_power_secs),
+            float,
+        )
+        self._set_from_conf(cgroup_path, "cgroup_path")
         self._set_from_conf(
             experiment_id, "experiment_id", "5b0fa12a-3dd7-45bb-9766-cc326314d9f1"
         )
 
-        assert self._tracking_mode in ["machine", "process"]
+        assert self._tracking_mode in ["machine", "process", "cgroup"]
+        assert self._sampling_backend in ["thread", "process", "shared"]
         set_logger_level(self._log_level)
         set_logger_format(self._logger_preamble)
+        if self._tracking_mode == "cgroup":
+            try:
+                self._cgroup_path = find_cgroup(self._cgroup_path)
+            except OSError as e:
+                logger.warning(
+                    f"Cannot track the cgroup: {e}."
+                    + " Falling back to tracking_mode='machine'."
+                )
+                self._tracking_mode = self._conf["tracking_mode"] = "machine"
 
         self._start_time: Optional[float] = None
         self._last_measured_time: float = time.perf_counter()
@@ -309,7 +431,10 @@ class BaseEmissionsTracker(ABC):
         self._cpu_power: Power = Power.from_watts(watts=0)
         self._gpu_power: Power = Power.from_watts(watts=0)
         self._ram_power: Power = Power.from_watts(watts=0)
-        self._measure_occurrence: int = 0
+        self._series: Dict[str, RingBuffer] = {
+            component: RingBuffer(self._series_capacity)
+            for component in SERIES_COMPONENTS
+        }
         self._cloud = None
         self._previous_emissions = None
         self._conf["os"] = platform.platform()
@@ -317,15 +442,38 @@ class BaseEmissionsTracker(ABC):
         self._conf["cpu_count"] = count_cpus()
         self._conf["cpu_physical_count"] = count_physical_cpus()
         self._geo = None
-        self._task_start_measurement_values = {}
-        self._task_stop_measurement_values = {}
         self._tasks: Dict[str, Task] = {}
+        # Tasks running, in start order
+        self._running_tasks: Dict[str, Task] = {}
+        # Tasks running or waiting for their energy to be looked up
+        self._unresolved_tasks: Dict[str, Task] = {}
+        # Totals of the tasks started with `aggregate=True`, by name
+        self._task_aggregates: Dict[str, TaskAggregate] = {}
+        # Most recently started task still running
         self._active_task: Optional[str] = None
-        self._active_task_emissions_at_start: Optional[EmissionsData] = None
+        # Cumulative energy over time, to compute the energy of the tasks
+        self._timeline = EnergyTimeline(SERIES_COMPONENTS)
+        # Measures are run by the sampling engine and by the tasks
+        self._measure_lock = threading.RLock()
 
         # Tracking mode detection
-        ressource_tracker = ResourceTracker(self)
-        ressource_tracker.set_CPU_GPU_ram_tracking()
+        if self._sampling_backend == "shared":
+            shared_sampler = SharedSampler.get_or_create(
+                key=self._get_hardware_key(),
+                setup_hardware=self._setup_hardware,
+                get_hardware_conf=lambda: {
+                    key: self._conf[key]
+                    for key in HARDWARE_CONF_KEYS
+                    if key in self._conf
+                },
+            )
+            self._hardware = shared_sampler.hardware
+            self._conf.update(shared_sampler.hardware_conf)
+            self._external_sampler = shared_sampler.subscription(
+                self._measure_power_secs
+            )
+        else:
+            self._setup_hardware()
 
         self._conf["hardware"] = list(map(lambda x: x.description(), self._hardware))
 
@@ -346,16 +494,54 @@ class BaseEmissionsTracker(ABC):
         else:
             logger.info(f"  GPU model: {self._conf.get('gpu_model')}")
 
-        # Run `self._measure_power_and_energy` every `measure_power_secs` seconds in a
-        # background thread
-        self._scheduler = PeriodicScheduler(
-            function=self._measure_power_and_energy,
-            interval=self._measure_power_secs,
-        )
-        self._scheduler_monitor_power = PeriodicScheduler(
-            function=self._monitor_power,
-            interval=1,
-        )
+        if self._sampling_backend == "process":
+            if ProcessSampler.is_available():
+                self._external_sampler = ProcessSampler(
+                    self._hardware,
+                    self._measure_power_secs,
+                    process_tree=self._process_tree,
+                )
+            else:
+                logger.warning(
+                    "Sampling from a subprocess needs the 'fork' start method,"
+                    + " sampling from a thread instead."
+                )
+
+        # Run `self._measure_power_and_energy` every `measure_power_secs` seconds,
+        # `self._monitor_power` every second and the live outputs every
+        # `api_call_interval` measures, all in a single background thread.
+        # When an external sampler reads the hardware, only the live outputs are run.
+        self._sampler = SamplingEngine(threaded=self._sampler_threaded)
+        self._sampling_policy: Optional[AdaptiveSamplingPolicy] = None
+        self._sampling_stats: Dict[str, Any] = {}
+        if self._adaptive_sampling and self._external_sampler is not None:
+            logger.warning(
+                "Adaptive sampling is only available with the 'thread' sampling"
+                + " backend, measuring every `measure_power_secs` instead."
+            )
+        elif self._adaptive_sampling:
+            self._sampling_policy = AdaptiveSamplingPolicy(
+                self._measure_power_secs,
+                min_interval=self._min_measure_power_secs,
+                max_interval=self._max_measure_power_secs,
+            )
+        if self._external_sampler is None:
+            self._sampler.add_job(
+                MEASURE_JOB,
+                self._measure_power_secs,
+                (
+                    self._measure_power_and_adapt
+                    if self._sampling_policy
+                    else self._measure_power_and_energy
+                ),
+            )
+            self._sampler.add_job(MONITOR_POWER_JOB, 1, self._monitor_power)
+        if self._api_call_interval != -1:
+            self._sampler.add_job(
+                LIVE_OUT_JOB,
+                self._measure_power_secs * max(self._api_call_interval, 1),
+                self._dispatch_live_out,
+            )
 
         self._data_source = DataSource()
 
@@ -376,6 +562,31 @@ class BaseEmissionsTracker(ABC):
         )
         self._init_output_methods(api_key=self._api_key)
 
+    def _setup_hardware(self) -> list:
+        """
+        Detect the hardware to track and how to measure it.
+        :return: The list of hardware components, also set in `self._hardware`.
+        """
+        ressource_tracker = ResourceTracker(self)
+        ressource_tracker.set_CPU_GPU_ram_tracking()
+        self._process_tree = ressource_tracker.process_tree
+        return self._hardware
+
+    def _get_hardware_key(self) -> tuple:
+        """
+        :return: The configuration that determines the hardware set up by
+                 `_setup_hardware`.
+        """
+        return (
+            self._tracking_mode,
+            self._cgroup_path,
+            self._force_cpu_power,
+            self._force_ram_power,
+            self._force_mode_cpu_load,
+            str(self._gpu_ids),
+            os.path.abspath(self._output_dir),
+        )
+
     def _init_output_methods(self, *, api_key: str = None):
         """
         Prepare the different output methods
@@ -393,9 +604,13 @@ class BaseEmissionsTracker(ABC):
             self._output_handlers.append(self._logging_logger)
 
         if self._emissions_endpoint:
+            from codecarbon.output import HTTPOutput
+
             self._output_handlers.append(HTTPOutput(self._emissions_endpoint))
 
         if self._save_to_api:
+            from codecarbon.output import CodeCarbonAPIOutput
+
             cc_api__out = CodeCarbonAPIOutput(
                 endpoint_url=self._api_endpoint,
                 experiment_id=self._experiment_id,
@@ -408,9 +623,13 @@ class BaseEmissionsTracker(ABC):
             self.run_id = uuid.uuid4()
 
         if self._save_to_prometheus:
+            from codecarbon.output import PrometheusOutput
+
             self._output_handlers.append(PrometheusOutput(self._prometheus_url))
 
         if self._save_to_logfire:
+            from codecarbon.output import LogfireOutput
+
             self._output_handlers.append(LogfireOutput())
 
     def service_shutdown(self, signum, frame):
@@ -443,18 +662,35 @@ class BaseEmissionsTracker(ABC):
             return
 
         self._last_measured_time = self._start_time = time.perf_counter()
-        # Read initial energy for hardware
-        for hardware in self._hardware:
-            hardware.start()
-
-        self._scheduler.start()
-        self._scheduler_monitor_power.start()
-
-    def start_task(self, task_name=None) -> None:
+        if self._external_sampler is not None:
+            # The external sampler reads initial energy for hardware
+            self._external_sampler.start()
+            self._counters_at_start: EnergyCounters = (
+                self._external_sampler.read_counters()
+            )
+        else:
+            # Read initial energy for hardware
+            for hardware in self._hardware:
+                hardware.start()
+        self._timeline.append(self._start_time)
+        self._sampler.start()
+
+    def start_task(
+        self, task_name=None, measure: bool = True, aggregate: bool = False
+    ) -> Optional[str]:
         """
-        Start tracking a dedicated execution task.
+        Start tracking a dedicated execution task. Several tasks can be tracked at
+        the same time, nested or overlapping, while the tracker keeps measuring.
+        The tracker is started if it is not already.
         :param task_name: Name of the task to be isolated.
-        :return: None
+        :param measure: Measure the hardware when the task starts. Otherwise, the
+                        energy at the start of the task is interpolated between
+                        the periodic measures, which makes starting a task cheap.
+        :param aggregate: Once its energy is known, add the task to a single
+                          record of all the tasks of this name, instead of
+                          keeping one record per task. Meant for tasks run many
+                          times, e.g. the calls of a function.
+        :return: The name of the task, suffixed if the name was already used.
         """
         # if another instance of codecarbon is already running, stop here
         if (
@@ -471,105 +707,258 @@ class BaseEmissionsTracker(ABC):
             logger.error("Tracker not initialized. Please check the logs.")
             return
 
-        # Stop scheduler as we do not want it to interfere with the task measurement
-        if self._scheduler:
-            self._scheduler.stop()
-
-        # Task background thread for measuring power
-        self._scheduler_monitor_power.start()
-
-        if self._active_task:
-            logger.warning("A task is already under measure")
-            return
+        if self._start_time is None:
+            self.start()
         if not task_name:
             task_name = uuid.uuid4().__str__()
-        if task_name in self._tasks.keys():
-            task_name += "_" + uuid.uuid4().__str__()
-        self._last_measured_time = self._start_time = time.perf_counter()
-        # Read initial energy for hardware
-        for hardware in self._hardware:
-            hardware.start()
-        prepared_data_for_task_start = self._prepare_emissions_data()
-        self._active_task_emissions_at_start = dataclasses.replace(
-            prepared_data_for_task_start
-        )
-        # The existing call to _compute_emissions_delta uses the result of _prepare_emissions_data.
-        # Let's make sure it uses the same one we captured.
-        self._compute_emissions_delta(prepared_data_for_task_start)
-
-        self._tasks.update(
-            {
-                task_name: Task(
-                    task_name=task_name,
-                )
-            }
-        )
-        self._active_task = task_name
-
-    def stop_task(self, task_name: str = None) -> EmissionsData:
+        with self._measure_lock:
+            aggregate_as = task_name if aggregate else None
+            if aggregate or task_name in self._tasks:
+                task_name += "_" + uuid.uuid4().__str__()
+            if measure:
+                self._measure_power_and_energy()
+                task = Task(task_name=task_name, start_time=self._last_measured_time)
+            else:
+                task = Task(task_name=task_name)
+            task.aggregate_as = aggregate_as
+            self._tasks[task_name] = task
+            self._running_tasks[task_name] = task
+            self._unresolved_tasks[task_name] = task
+            self._active_task = task_name
+        return task_name
+
+    def stop_task(
+        self, task_name: str = None, measure: bool = True
+    ) -> Optional[EmissionsData]:
         """
-        Stop tracking a dedicated execution task. Delta energy is computed by task, to isolate its contribution to total
-        emissions.
-        :return: EmissionData for an execution task
+        Stop tracking a dedicated execution task. Its energy is the energy
+        consumed between its start and its stop, to isolate its contribution to
+        total emissions.
+        :param task_name: Name of the task to stop, defaults to the most recently
+                          started task still running.
+        :param measure: Measure the hardware when the task stops and compute its
+                        emissions right away. Otherwise, the emissions of the task
+                        are computed at the next `flush()` or `stop()`.
+        :return: EmissionData for an execution task, None if not computed yet.
         """
-        if self._scheduler_monitor_power:
-            self._scheduler_monitor_power.stop()
-
-        task_name = task_name if task_name else self._active_task
-        if self._tasks.get(task_name) is None:
-            logger.warning("stop_task : No active task to stop.")
-            return None
-        self._measure_power_and_energy()
-        emissions_data = (
-            self._prepare_emissions_data()
-        )  # This is emissions_data_at_stop
+        with self._measure_lock:
+            task_name = task_name if task_name else self._active_task
+            task = self._tasks.get(task_name)
+            if task is None or not task.is_active:
+                logger.warning("stop_task : No active task to stop.")
+                return None
+            if not measure:
+                self._stop_tasks([task])
+                return None
+            self._measure_power_and_energy()
+            self._stop_tasks([task], self._last_measured_time)
+            (record,) = self._attribute_tasks([task])
+        self._compute_task_emissions([record], self._prepare_emissions_data())
+        return record.emissions_data
+
+    def _stop_tasks(self, tasks: List[Task], stop_time: float = None) -> None:
+        """
+        Stop the tasks at `stop_time`, defaults to now.
+        Must be called with the measure lock.
+        """
+        for task in tasks:
+            task.stop(stop_time)
+            del self._running_tasks[task.task_name]
+        self._active_task = next(reversed(self._running_tasks), None)
 
-        if self._active_task_emissions_at_start is None:
-            logger.error(
-                f"Task {task_name}: _active_task_emissions_at_start was None. "
-                "This indicates an issue, possibly start_task was not called or was corrupted. "
-                "Reporting zero delta for this task to avoid errors."
+    def _attribute_stopped_tasks(self, aggregated_only: bool = False) -> List[Task]:
+        """
+        Look up the energy of the tasks stopped before the last measure.
+        Must be called with the measure lock.
+        :param aggregated_only: only the tasks started with `aggregate=True`.
+        :return: The tasks, or their aggregates, see `_attribute_tasks`.
+        """
+        tasks = [
+            task
+            for task in self._unresolved_tasks.values()
+            if not task.is_active
+            and task.stop_time <= self._last_measured_time
+            and (task.aggregate_as is not None or not aggregated_only)
+        ]
+        return self._attribute_tasks(tasks)
+
+    def _attribute_tasks(self, tasks: List[Task]) -> List[Task]:
+        """
+        Look up the energy of stopped tasks in the energy timeline. The tasks
+        started with `aggregate=True` are then added to their aggregate and
+        forgotten.
+        Must be called with the measure lock.
+        :return: The tasks whose emissions are to be computed: the tasks that are
+                 not aggregated and the aggregates of the others.
+        """
+        records: Dict[str, Task] = {}
+        for task in tasks:
+            task.energies = self._timeline.energy_between(
+                task.start_time, task.stop_time
             )
-            emissions_data_delta = dataclasses.replace(emissions_data)
-            # Zero out energy fields for the delta
-            emissions_data_delta.emissions = 0.0
-            emissions_data_delta.emissions_rate = 0.0
-            emissions_data_delta.cpu_energy = 0.0
-            emissions_data_delta.gpu_energy = 0.0
-            emissions_data_delta.ram_energy = 0.0
-            emissions_data_delta.energy_consumed = 0.0
+            del self._unresolved_tasks[task.task_name]
+            if task.aggregate_as is None:
+                records[task.task_name] = task
+                continue
+            aggregate = self._task_aggregates.get(task.aggregate_as)
+            if aggregate is None:
+                aggregate = TaskAggregate(task.aggregate_as, task.start_time)
+                self._task_aggregates[task.aggregate_as] = aggregate
+                # Also listed with the tasks, to be persisted with them
+                self._tasks[task.aggregate_as + "_" + uuid.uuid4().__str__()] = (
+                    aggregate
+                )
+            aggregate.add(task)
+            del self._tasks[task.task_name]
+            records[aggregate.task_id] = aggregate
+        self._prune_timeline()
+        return list(records.values())
+
+    def _compute_task_emissions(
+        self, tasks: List[Task], emissions_data: EmissionsData
+    ) -> None:
+        """
+        Compute the emissions of tasks whose energy was looked up.
+        :param emissions_data: Total emissions, the tasks share its metadata.
+        """
+        if not tasks:
+            return
+        # Emissions are proportional to energy: look up the intensity only once
+        if emissions_data.energy_consumed > 0:
+            kg_per_kWh = emissions_data.emissions / emissions_data.energy_consumed
         else:
-            emissions_data_delta = dataclasses.replace(emissions_data)
-            emissions_data_delta.compute_delta_emission(
-                self._active_task_emissions_at_start
+            kg_per_kWh = self._get_emissions(
+                Energy.from_energy(kWh=1), self._get_cloud_metadata()
+            )
+        for task in tasks:
+            energies, task_duration = task.totals()
+            duration = Time.from_seconds(task_duration)
+            cpu_energy = Energy.from_energy(kWh=energies["cpu"])
+            gpu_energy = Energy.from_energy(kWh=energies["gpu"])
+            ram_energy = Energy.from_energy(kWh=energies["ram"])
+            energy = cpu_energy + gpu_energy + ram_energy
+            emissions = kg_per_kWh * energy.kWh
+            if duration.seconds > 0:
+                emissions_rate = emissions / duration.seconds
+                cpu_power = Power.from_energy_delta_and_delay(cpu_energy, duration)
+                gpu_power = Power.from_energy_delta_and_delay(gpu_energy, duration)
+                ram_power = Power.from_energy_delta_and_delay(ram_energy, duration)
+            else:
+                emissions_rate = 0
+                cpu_power = gpu_power = ram_power = Power.from_watts(0)
+            task.emissions_data = dataclasses.replace(
+                emissions_data,
+                duration=duration.seconds,
+                emissions=emissions,
+                emissions_rate=emissions_rate,
+                cpu_power=cpu_power.W,
+                gpu_power=gpu_power.W,
+                ram_power=ram_power.W,
+                cpu_energy=cpu_energy.kWh,
+                gpu_energy=gpu_energy.kWh,
+                ram_energy=ram_energy.kWh,
+                energy_consumed=energy.kWh,
+                water_consumed=self._wue * energy.kWh,
             )
 
-        # Update global _previous_emissions state using the current totals at task stop.
-        self._compute_emissions_delta(emissions_data)
+    def _prune_timeline(self) -> None:
+        """
+        Only keep the part of the timeline needed by the unresolved tasks.
+        Must be called with the measure lock.
+        """
+        # Tasks are started in order, the first one started the earliest
+        first_task = next(iter(self._unresolved_tasks.values()), None)
+        self._timeline.prune(first_task.start_time if first_task else None)
 
-        task_duration = Time.from_seconds(
-            time.perf_counter() - self._tasks[task_name].start_time
+    def _take_snapshot(self, tasks: Optional[List[Task]] = None) -> MeasureSnapshot:
+        """
+        Copy the totals measured so far.
+        :param tasks: Tasks whose emissions are to be computed with the snapshot,
+                      along with all the task aggregates.
+        """
+        tasks = list(tasks or [])
+        tasks.extend(
+            aggregate
+            for aggregate in self._task_aggregates.values()
+            if aggregate not in tasks
+        )
+        return MeasureSnapshot(
+            timestamp=datetime.now(),
+            duration=Time.from_seconds(time.perf_counter() - self._start_time),
+            cpu_energy=self._total_cpu_energy,
+            gpu_energy=self._total_gpu_energy,
+            ram_energy=self._total_ram_energy,
+            total_energy=self._total_energy,
+            water=self._total_water,
+            cpu_power=self._cpu_power,
+            gpu_power=self._gpu_power,
+            ram_power=self._ram_power,
+            tasks=tasks,
         )
 
-        # task_emission_data is the final delta object to be returned and stored
-        task_emission_data = emissions_data_delta
-        task_emission_data.duration = (
-            task_duration.seconds
-        )  # Set the correct duration for the task
-
-        self._tasks[task_name].emissions_data = task_emission_data
-        self._tasks[task_name].is_active = False
-        self._active_task = None
-        self._active_task_emissions_at_start = None  # Clear task-specific start data
+    def _finalize(
+        self, snapshot: MeasureSnapshot
+    ) -> Tuple[EmissionsData, EmissionsData]:
+        """
+        Compute the emissions of a snapshot and of its tasks.
+        :return: The total and delta emissions to persist.
+        """
+        emissions_data = self._prepare_emissions_data(snapshot)
+        self._compute_task_emissions(snapshot.tasks, emissions_data)
+        emissions_data_delta = self._compute_emissions_delta(emissions_data)
+        return emissions_data, emissions_data_delta
 
-        return task_emission_data
+    def _submit(
+        self, finish: Callable[[MeasureSnapshot], Any], snapshot: MeasureSnapshot
+    ) -> Future:
+        """
+        Run `finish(snapshot)` in the background thread finalizing the snapshots,
+        one at a time in submission order.
+        """
+        if snapshot is None:
+            future = Future()
+            future.set_result(None)
+            return future
+        if self._finalizer is None:
+            self._finalizer = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="codecarbon-finalizer"
+            )
+        return self._finalizer.submit(finish, snapshot)
 
-    @suppress(Exception)
-    def flush(self) -> Optional[float]:
+    def flush(self, wait: bool = True) -> Union[Optional[float], Future]:
         """
         Write the emissions to disk or call the API depending on the configuration,
         but keep running the experiment.
-        :return: CO2 emissions in kgs
+        :param wait: Wait for the emissions to be written. Otherwise, the measures
+                     are snapshotted right away, and the emissions are computed
+                     and written from a background thread.
+        :return: CO2 emissions in kgs, or a Future of them if `wait` is False.
+        """
+        snapshot = self._collect_flush()
+        if not wait:
+            return self._submit(self._finish_flush, snapshot)
+        if self._finalizer is not None:
+            # Keep the order of the previous flushes
+            return self._submit(self._finish_flush, snapshot).result()
+        return self._finish_flush(snapshot)
+
+    @suppress(Exception)
+    def _finish_flush(self, snapshot: Optional[MeasureSnapshot]) -> Optional[float]:
+        if snapshot is None:
+            return None
+        emissions_data, emissions_data_delta = self._finalize(snapshot)
+
+        self._persist_data(
+            total_emissions=emissions_data, delta_emissions=emissions_data_delta
+        )
+
+        return emissions_data.emissions
+
+    @suppress(Exception)
+    def _collect_flush(self) -> Optional[MeasureSnapshot]:
+        """
+        Measure up to now for a flush.
+        :return: The snapshot of the measures, None if not tracking.
         """
         # if another instance of codecarbon is already running, Nothing to do here
         if (
@@ -579,31 +968,57 @@ class BaseEmissionsTracker(ABC):
             logger.warning(
                 "Another instance of codecarbon is already running. Exiting."
             )
-            return
+            return None
         if self._start_time is None:
             logger.error("You first need to start the tracker.")
             return None
 
         # Run to calculate the power used from last
         # scheduled measurement to shutdown
-        self._measure_power_and_energy()
+        with self._measure_lock:
+            self._measure_power_and_energy()
+            tasks = self._attribute_stopped_tasks()
+            return self._take_snapshot(tasks)
 
-        emissions_data = self._prepare_emissions_data()
-        emissions_data_delta = self._compute_emissions_delta(emissions_data)
+    def stop(self, wait: bool = True) -> Union[Optional[float], Future]:
+        """
+        Stops tracking the experiment
+        :param wait: Wait for the emissions to be written. Otherwise, the last
+                     measure is taken right away, and the emissions are computed
+                     and written from a background thread.
+        :return: CO2 emissions in kgs, or a Future of them if `wait` is False.
+        """
+        snapshot = self._collect_stop()
+        if not wait or self._finalizer is not None:
+            future = self._submit(self._finish_stop, snapshot)
+            if self._finalizer is not None:
+                self._finalizer.shutdown(wait=False)
+                self._finalizer = None
+            return future if not wait else future.result()
+        return self._finish_stop(snapshot)
+
+    @suppress(Exception)
+    def _finish_stop(self, snapshot: Optional[MeasureSnapshot]) -> Optional[float]:
+        if snapshot is None:
+            return None
+        emissions_data, emissions_data_delta = self._finalize(snapshot)
 
         self._persist_data(
-            total_emissions=emissions_data, delta_emissions=emissions_data_delta
+            total_emissions=emissions_data,
+            delta_emissions=emissions_data_delta,
+            experiment_name=self._experiment_name,
         )
 
+        self.final_emissions_data = emissions_data
+        self.final_emissions = emissions_data.emissions
         return emissions_data.emissions
 
     @suppress(Exception)
-    def stop(self) -> Optional[float]:
+    def _collect_stop(self) -> Optional[MeasureSnapshot]:
         """
-        Stops tracking the experiment
-        :return: CO2 emissions in kgs
+        Stop measuring and take the last measure.
+        :return: The snapshot of the measures, None if not tracking.
         """
-
         # if another instance of codecarbon is already running, Nothing to do here
         if (
             hasattr(self, "_another_instance_already_running")
@@ -612,7 +1027,7 @@ class BaseEmissionsTracker(ABC):
             logger.warning(
                 "Another instance of codecarbon is already running. Exiting."
             )
-            return
+            return None
         if not self._allow_multiple_runs:
             # Release the lock
             self._lock.release()
@@ -620,34 +1035,27 @@ class BaseEmissionsTracker(ABC):
             logger.error("You first need to start the tracker.")
             return None
 
-        if self._scheduler:
-            self._scheduler.stop()
-            self._scheduler = None
-        if self._scheduler_monitor_power:
-            self._scheduler_monitor_power.stop()
-            self._scheduler_monitor_power = None
+        if self._sampler:
+            self._sampler.stop()
+            self._sampling_stats = self.get_sampling_stats()
+            logger.debug(f"Sampling statistics: {self._sampling_stats}")
+            self._sampler = None
         else:
             logger.warning("Tracker already stopped !")
-        for task_name in self._tasks:
-            if self._tasks[task_name].is_active:
-                self.stop_task(task_name=task_name)
         # Run to calculate the power used from last
         # scheduled measurement to shutdown
         # or if scheduler interval was longer than the run
-        self._measure_power_and_energy()
-
-        emissions_data = self._prepare_emissions_data()
-        emissions_data_delta = self._compute_emissions_delta(emissions_data)
-
-        self._persist_data(
-            total_emissions=emissions_data,
-            delta_emissions=emissions_data_delta,
-            experiment_name=self._experiment_name,
-        )
-
-        self.final_emissions_data = emissions_data
-        self.final_emissions = emissions_data.emissions
-        return emissions_data.emissions
+        with self._measure_lock:
+            self._measure_power_and_energy()
+            # Tasks still running end with the tracker
+            self._stop_tasks(
+                list(self._running_tasks.values()), self._last_measured_time
+            )
+            tasks = list(self._unresolved_tasks.values())
+            snapshot = self._take_snapshot(self._attribute_tasks(tasks))
+        if self._external_sampler is not None:
+            self._external_sampler.stop()
+        return snapshot
 
     def _persist_data(
         self,
@@ -656,26 +1064,47 @@ class BaseEmissionsTracker(ABC):
         experiment_name=None,
     ):
         task_emissions_data = []
-        for task in self._tasks:
-            task_emissions_data.append(self._tasks[task].out())
+        for task in list(self._tasks.values()):
+            if task.is_resolved:
+                task_emissions_data.append(task.out())
 
         for handler in self._output_handlers:
             handler.out(total_emissions, delta_emissions)
             if len(task_emissions_data) > 0:
                 handler.task_out(task_emissions_data, experiment_name)
 
-    def _prepare_emissions_data(self) -> EmissionsData:
+    async def _persist_data_async(
+        self,
+        total_emissions: EmissionsData,
+        delta_emissions: EmissionsData,
+        experiment_name=None,
+    ):
+        task_emissions_data = []
+        for task in list(self._tasks.values()):
+            if task.is_resolved:
+                task_emissions_data.append(task.out())
+
+        for handler in self._output_handlers:
+            await handler.out_async(total_emissions, delta_emissions)
+            if len(task_emissions_data) > 0:
+                await handler.task_out_async(task_emissions_data, experiment_name)
+
+    def _prepare_emissions_data(
+        self, snapshot: Optional[MeasureSnapshot] = None
+    ) -> EmissionsData:
         """
         Prepare the emissions data to be sent to the API or written to a file.
+        :param snapshot: Measures to compute the emissions of, defaults to the
+                         measures so far.
         :return: EmissionsData object with the total emissions data.
         """
+        if snapshot is None:
+            snapshot = self._take_snapshot()
         cloud: CloudMetadata = self._get_cloud_metadata()
-        duration: Time = Time.from_seconds(time.perf_counter() - self._start_time)
+        duration: Time = snapshot.duration
 
+        emissions = self._get_emissions(snapshot.total_energy, cloud)
         if cloud.is_on_private_infra:
-            emissions = self._emissions.get_private_infra_emissions(
-                self._total_energy, self._geo
-            )  # float: kg co2_eq
             country_name = self._geo.country_name
             country_iso_code = self._geo.country_iso_code
             region = self._geo.region
@@ -683,9 +1112,6 @@ class BaseEmissionsTracker(ABC):
             cloud_provider = ""
             cloud_region = ""
         else:
-            emissions = self._emissions.get_cloud_emissions(
-                self._total_energy, cloud, self._geo
-            )
             country_name = self._emissions.get_cloud_country_name(cloud)
             country_iso_code = self._emissions.get_cloud_country_iso_code(cloud)
             region = self._emissions.get_cloud_geo_region(cloud)
@@ -693,21 +1119,21 @@ class BaseEmissionsTracker(ABC):
             cloud_provider = cloud.provider
             cloud_region = cloud.region
         total_emissions = EmissionsData(
-            timestamp=datetime.now().strftime("%Y-%m-%dT%H:%M:%S"),
+            timestamp=snapshot.timestamp.strftime("%Y-%m-%dT%H:%M:%S"),
             project_name=self._project_name,
             run_id=str(self.run_id),
             experiment_id=str(self._experiment_id),
             duration=duration.seconds,
             emissions=emissions,  # kg
             emissions_rate=emissions / duration.seconds,  # kg/s
-            cpu_power=self._cpu_power.W,
-            gpu_power=self._gpu_power.W,
-            ram_power=self._ram_power.W,
-            cpu_energy=self._total_cpu_energy.kWh,
-            gpu_energy=self._total_gpu_energy.kWh,
-            ram_energy=self._total_ram_energy.kWh,
-            energy_consumed=self._total_energy.kWh,
-            water_consumed=self._total_water.litres,
+            cpu_power=snapshot.cpu_power.W,
+            gpu_power=snapshot.gpu_power.W,
+            ram_power=snapshot.ram_power.W,
+            cpu_energy=snapshot.cpu_energy.kWh,
+            gpu_energy=snapshot.gpu_energy.kWh,
+            ram_energy=snapshot.ram_energy.kWh,
+            energy_consumed=snapshot.total_energy.kWh,
+            water_consumed=snapshot.water.litres,
             country_name=country_name,
             country_iso_code=country_iso_code,
             region=region,
@@ -731,6 +1157,14 @@ class BaseEmissionsTracker(ABC):
         logger.debug(total_emissions)
         return total_emissions
 
+    def _get_emissions(self, energy: Energy, cloud: CloudMetadata) -> float:
+        """
+        :return: CO2 emissions in kg for the energy consumed where we run.
+        """
+        if cloud.is_on_private_infra:
+            return self._emissions.get_private_infra_emissions(energy, self._geo)
+        return self._emissions.get_cloud_emissions(energy, cloud, self._geo)
+
     def _compute_emissions_delta(self, total_emissions: EmissionsData) -> EmissionsData:
         """
         Compute the delta emissions since the last call to this method.
@@ -773,7 +1207,44 @@ class BaseEmissionsTracker(ABC):
             if isinstance(hardware, CPU):
                 hardware.monitor_power()
 
+    def _read_external_sampler(self, refresh: bool = True) -> None:
+        """
+        Set the totals from the counters of the external sampler, which are
+        cumulative since the tracker started.
+        :param refresh: ask the sampler to measure first, else use the counters
+                        of its last periodic measure.
+        """
+        counters = (
+            self._external_sampler.read_counters(refresh=refresh)
+            - self._counters_at_start
+        )
+        timestamp = time.time()
+        for component, total, energy, power in (
+            ("cpu", self._total_cpu_energy, counters.cpu_energy, counters.cpu_power),
+            ("gpu", self._total_gpu_energy, counters.gpu_energy, counters.gpu_power),
+            ("ram", self._total_ram_energy, counters.ram_energy, counters.ram_power),
+        ):
+            self._series[component].append(
+                timestamp, power.W, (energy * self._pue - total).kWh
+            )
+        self._total_cpu_energy = counters.cpu_energy * self._pue
+        self._total_gpu_energy = counters.gpu_energy * self._pue
+        self._total_ram_energy = counters.ram_energy * self._pue
+        self._total_energy = counters.total_energy * self._pue
+        self._total_water = Water.from_litres(litres=self._wue * self._total_energy.kWh)
+        self._cpu_power = counters.cpu_power
+        self._gpu_power = counters.gpu_power
+        self._ram_power = counters.ram_power
+        logger.info(
+            f"{self._total_energy.kWh:.6f} kWh of electricity and {self._total_water.litres:.6f} L of water were used since the beginning."
+        )
+
     def _do_measurements(self) -> None:
+        if self._external_sampler is not None:
+            self._read_external_sampler()
+            return
+        # Power and energy measured for each component during this measure
+        measured: Dict[str, List] = {}
         for hardware in self._hardware:
             h_time = time.perf_counter()
             # Compute last_duration again for more accuracy
@@ -787,7 +1258,9 @@ class BaseEmissionsTracker(ABC):
             water = Water.from_litres(litres=self._wue * energy.kWh)
             self._total_energy += energy
             self._total_water += water
+            component = None
             if isinstance(hardware, CPU):
+                component = "cpu"
                 self._total_cpu_energy += energy
                 self._cpu_power = power
                 logger.info(
@@ -798,6 +1271,7 @@ class BaseEmissionsTracker(ABC):
                     f"Energy consumed for All CPU : {self._total_cpu_energy.kWh:.6f} kWh"
                 )
             elif isinstance(hardware, GPU):
+                component = "gpu"
                 self._total_gpu_energy += energy
                 self._gpu_power = power
                 logger.info(
@@ -805,6 +1279,7 @@ class BaseEmissionsTracker(ABC):
                     + f". Total GPU Power : {self._gpu_power.W} W"
                 )
             elif isinstance(hardware, RAM):
+                component = "ram"
                 self._total_ram_energy += energy
                 self._ram_power = power
                 logger.info(
@@ -813,6 +1288,7 @@ class BaseEmissionsTracker(ABC):
                 )
             elif isinstance(hardware, AppleSiliconChip):
                 if hardware.chip_part == "CPU":
+                    component = "cpu"
                     self._total_cpu_energy += energy
                     self._cpu_power = power
                     logger.info(
@@ -820,6 +1296,7 @@ class BaseEmissionsTracker(ABC):
                         + f". Total CPU Power : {self._cpu_power.W} W"
                     )
                 elif hardware.chip_part == "GPU":
+                    component = "gpu"
                     self._total_gpu_energy += energy
                     self._gpu_power = power
                     logger.info(
@@ -828,17 +1305,76 @@ class BaseEmissionsTracker(ABC):
                     )
             else:
                 logger.error(f"Unknown hardware type: {hardware} ({type(hardware)})")
+            if component is not None:
+                component_power, component_energy = measured.get(
+                    component, (Power.from_watts(0), Energy.from_energy(0))
+                )
+                measured[component] = (
+                    component_power + power,
+                    component_energy + energy,
+                )
             h_time = time.perf_counter() - h_time
             logger.debug(
                 f"Done measure for {hardware.__class__.__name__} - measurement time: {h_time:,.4f} s - last call {last_duration:,.2f} s"
             )
+        timestamp = time.time()
+        for component, (power, energy) in measured.items():
+            self._series[component].append(timestamp, power.W, energy.kWh)
         logger.info(
             f"{self._total_energy.kWh:.6f} kWh of electricity and {self._total_water.litres:.6f} L of water were used since the beginning."
         )
 
+    def get_series(
+        self,
+        component: str,
+        since: Optional[float] = None,
+        max_points: Optional[int] = None,
+    ) -> Series:
+        """
+        Get the history of the measures of a hardware component. Only the last
+        `series_capacity` measures are kept.
+        :param component: One of "cpu", "gpu" or "ram".
+        :param since: Unix timestamp of the oldest measure to return, None for all
+                      the measures kept.
+        :param max_points: If set, consecutive measures are aggregated so that at
+                           most `max_points` are returned.
+        :return: Series of the timestamps, power (W) and energy (kWh) of the
+                 measures, oldest first.
+        """
+        if component not in self._series:
+            raise ValueError(
+                f"Unknown component '{component}', expected one of {SERIES_COMPONENTS}"
+            )
+        if max_points is not None:
+            return self._series[component].downsample(max_points, since=since)
+        return self._series[component].since(since)
+
+    def high_frequency_sampler(
+        self, frequency: float = 100, capacity: int = 100_000
+    ) -> HighFrequencySampler:
+        """
+        Get a sampler of the CPU energy at `frequency` Hz, to measure short
+        sections of code. It runs independently of the periodic measures.
+        Only available when the CPU is measured with Intel RAPL.
+        :param frequency: Number of samples per second.
+        :param capacity: Maximum number of samples recorded.
+        :return: A `HighFrequencySampler`, to be used as a context manager, or
+                 started, stopped and closed.
+        """
+        for hardware in self._hardware:
+            if isinstance(hardware, CPU) and hardware._mode == "intel_rapl":
+                return HighFrequencySampler(
+                    hardware._intel_interface.energy_counters(),
+                    frequency=frequency,
+                    capacity=capacity,
+                )
+        raise RuntimeError(
+            "High-frequency sampling needs the CPU to be measured with Intel RAPL"
+        )
+
     def _measure_power_and_energy(self) -> None:
         """
-        A function that is periodically run by the `BackgroundScheduler`
+        A function that is periodically run by the sampling engine
         every `self._measure_power_secs` seconds.
         :return: None
         """
@@ -850,11 +1386,16 @@ class BaseEmissionsTracker(ABC):
             )
             raise e
 
-        warning_duration = self._measure_power_secs * 3
+        measure_job = self._sampler.get_job(MEASURE_JOB) if self._sampler else None
+        warning_duration = (
+            measure_job.interval if measure_job else self._measure_power_secs
+        ) * 3
+        # With an external sampler, the engine runs no measure job: the tracker
+        # only measures on flush, stop and tasks
         if (
             last_duration > warning_duration
-            and self._scheduler
-            and not self._scheduler._stopped
+            and measure_job is not None
+            and self._sampler.is_running
         ):
             warn_msg = (
                 "Background scheduler didn't run for a long period"
@@ -862,26 +1403,101 @@ class BaseEmissionsTracker(ABC):
             )
             logger.warning(warn_msg, last_duration)
 
-        self._do_measurements()
-        self._last_measured_time = time.perf_counter()
-        self._measure_occurrence += 1
-        # Special case: metrics and api calls are sent every `api_call_interval` measures
-        if (
-            self._api_call_interval != -1
-            and len(self._output_handlers) > 0
-            and self._measure_occurrence >= self._api_call_interval
-        ):
-            emissions = self._prepare_emissions_data()
-            emissions_delta = self._compute_emissions_delta(emissions)
-            logger.info(
-                f"{emissions_delta.emissions_rate * 1000:.6f} g.CO2eq/s mean an estimation of "
-                + f"{emissions_delta.emissions_rate * 3600 * 24 * 365:,} kg.CO2eq/year"
+        with self._measure_lock:
+            self._do_measurements()
+            self._last_measured_time = time.perf_counter()
+            self._timeline.append(
+                self._last_measured_time,
+                cpu=self._total_cpu_energy.kWh,
+                gpu=self._total_gpu_energy.kWh,
+                ram=self._total_ram_energy.kWh,
             )
-            for handler in self._output_handlers:
-                handler.live_out(emissions, emissions_delta)
-            self._measure_occurrence = 0
+            if self._unresolved_tasks:
+                # Fold the aggregated tasks as they stop, so that they do not
+                # pile up until the next flush
+                self._attribute_stopped_tasks(aggregated_only=True)
+            self._prune_timeline()
         logger.debug(f"last_duration={last_duration}\n------------------------")
 
+    def _measure_power_and_adapt(self) -> None:
+        """
+        Run by the sampling engine instead of `_measure_power_and_energy` with
+        `adaptive_sampling`: measure, then reschedule the next measure from the
+        variation of the total power.
+        :return: None
+        """
+        self._measure_power_and_energy()
+        power = self._cpu_power + self._gpu_power + self._ram_power
+        interval = self._sampling_policy.observe(power.W)
+        job = self._sampler.get_job(MEASURE_JOB) if self._sampler else None
+        if job is None or job.interval == interval:
+            return
+        logger.debug(f"Measuring power every {interval:.2f} s")
+        self._sampler.set_interval(MEASURE_JOB, interval)
+        # The power is monitored every second at the base interval, and at
+        # least once per measure
+        monitor_interval = max(1.0, interval / self._measure_power_secs)
+        self._sampler.set_interval(
+            MONITOR_POWER_JOB, min(monitor_interval, max(1.0, interval))
+        )
+
+    def get_sampling_stats(self) -> Dict[str, Any]:
+        """
+        Statistics of the periodic measures.
+        :return: A dict with the tick statistics of each job of the sampling
+                 engine ("jobs"), the current interval between two measures in
+                 seconds ("measure_interval") and the achieved number of measures
+                 per second ("achieved_sample_rate").
+        """
+        if self._sampler is None:
+            return self._sampling_stats
+        jobs = self._sampler.stats()
+        measure_job = jobs.get(MEASURE_JOB)
+        if self._sampling_policy is not None:
+            achieved_rate = self._sampling_policy.achieved_rate
+        elif measure_job and self._start_time is not None:
+            elapsed = time.perf_counter() - self._start_time
+            achieved_rate = measure_job["ticks"] / elapsed if elapsed > 0 else 0.0
+        else:
+            achieved_rate = 0.0
+        return {
+            "jobs": jobs,
+            "measure_interval": measure_job["interval"] if measure_job else None,
+            "achieved_sample_rate": achieved_rate,
+        }
+
+    def _dispatch_live_out(self) -> None:
+        """
+        A function that is periodically run by the sampling engine every
+        `self._api_call_interval` measures to send metrics and api calls.
+        :return: None
+        """
+        live_emissions = self._collect_live_out()
+        if live_emissions is None:
+            return
+        emissions, emissions_delta = live_emissions
+        for handler in self._output_handlers:
+            handler.live_out(emissions, emissions_delta)
+
+    def _collect_live_out(self) -> Optional[Tuple[EmissionsData, EmissionsData]]:
+        """
+        :return: The total and delta emissions for the live outputs, None if
+                 there is no output.
+        """
+        if len(self._output_handlers) == 0:
+            return None
+        if self._external_sampler is not None:
+            # The totals are only refreshed on flush and stop otherwise
+            with self._measure_lock:
+                self._read_external_sampler(refresh=False)
+        emissions = self._prepare_emissions_data()
+        emissions_delta = self._compute_emissions_delta(emissions)
+        logger.info(
+            f"{emissions_delta.emissions_rate * 1000:.6f} g.CO2eq/s mean an estimation of "
+            + f"{emissions_delta.emissions_rate * 3600 * 24 * 365:,} kg.CO2eq/year"
+        )
+        return emissions, emissions_delta
+
     def __enter__(self):
         self.start()
         return self
@@ -949,15 +1565,11 @@ class OfflineEmissionsTracker(BaseEmissionsTracker):
                     "Cloud Region must be provided " + " if cloud provider is set"
                 )
 
-            df = DataSource().get_cloud_emissions_data()
             if (
-                len(
-                    df.loc[
-                        (df["provider"] == self._cloud_provider)
-                        & (df["region"] == self._cloud_region)
-                    ]
+                DataSource().get_cloud_region_data(
+                    self._cloud_provider, self._cloud_region
                 )
-                == 0
+                is None
             ):
                 logger.error(
                     "Cloud Provider/Region "
@@ -1013,6 +1625,147 @@ class EmissionsTracker(BaseEmissionsTracker):
         return self._cloud
 
 
+class _AsyncTrackerMixin:
+    """
+    Run the measures of a tracker as a task of the asyncio event loop it is
+    started from, and send the outputs with their async variants.
+    The measures run in the event loop: no thread is started, unless the tracker
+    uses the "shared" sampling backend.
+    """
+
+    _sampler_threaded = False
+
+    def __init__(self, *args, **kwargs):
+        self._sampler_task: Optional["asyncio.Task"] = None
+        self._live_out_tasks: set = set()
+        super().__init__(*args, **kwargs)
+
+    def start(self) -> None:
+        """
+        Starts tracking the experiment, must be called from a running event loop.
+        :return: None
+        """
+        super().start()
+        if self._start_time is None or self._sampler_task is not None:
+            return
+        # Already imported by the caller, as it runs an event loop
+        import asyncio
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            logger.error(
+                "An async tracker must be started from a running event loop,"
+                + " the hardware will only be measured on flush and stop."
+            )
+            return
+        self._sampler_task = loop.create_task(self._sampler.run_async())
+
+    async def astart(self) -> None:
+        self.start()
+
+    async def aflush(self) -> Optional[float]:
+        """
+        Same as `flush()`, the outputs are sent without blocking the event loop.
+        :return: CO2 emissions in kgs
+        """
+        snapshot = self._collect_flush()
+        if snapshot is None:
+            return None
+        with suppress(Exception):
+            emissions_data, emissions_data_delta = await self._run_blocking(
+                self._finalize, snapshot
+            )
+            await self._persist_data_async(
+                total_emissions=emissions_data, delta_emissions=emissions_data_delta
+            )
+            return emissions_data.emissions
+
+    async def astop(self) -> Optional[float]:
+        """
+        Same as `stop()`, the outputs are sent without blocking the event loop.
+        :return: CO2 emissions in kgs
+        """
+        snapshot = self._collect_stop()
+        with suppress(Exception):
+            if self._sampler_task is not None:
+                await self._sampler_task
+                self._sampler_task = None
+            if self._live_out_tasks:
+                import asyncio
+
+                await asyncio.gather(*self._live_out_tasks)
+            if snapshot is None:
+                return None
+            emissions_data, emissions_data_delta = await self._run_blocking(
+                self._finalize, snapshot
+            )
+            await self._persist_data_async(
+                total_emissions=emissions_data,
+                delta_emissions=emissions_data_delta,
+                experiment_name=self._experiment_name,
+            )
+            self.final_emissions_data = emissions_data
+            self.final_emissions = emissions_data.emissions
+            return emissions_data.emissions
+
+    def _dispatch_live_out(self) -> None:
+        """
+        Run by the sampling engine in the event loop: send the live outputs from
+        a separate task, so that the measures are not delayed by the network.
+        """
+        import asyncio
+
+        task = asyncio.get_running_loop().create_task(self._dispatch_live_out_async())
+        self._live_out_tasks.add(task)
+        task.add_done_callback(self._live_out_tasks.discard)
+
+    async def _dispatch_live_out_async(self) -> None:
+        live_emissions = await self._run_blocking(self._collect_live_out)
+        if live_emissions is None:
+            return
+        emissions, emissions_delta = live_emissions
+        for handler in self._output_handlers:
+            try:
+                await handler.live_out_async(emissions, emissions_delta)
+            except Exception as e:
+                logger.error(f"Live output {handler} failed: {e}", exc_info=True)
+
+    async def _run_blocking(self, function, *args):
+        """
+        Run `function` in a worker thread: the emissions data may need the carbon
+        intensity or the location from the network, which must not block the
+        event loop.
+        """
+        import asyncio
+
+        return await asyncio.get_running_loop().run_in_executor(None, function, *args)
+
+    async def __aenter__(self):
+        await self.astart()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, tb) -> None:
+        await self.astop()
+
+
+class AsyncEmissionsTracker(_AsyncTrackerMixin, EmissionsTracker):
+    """
+    An online emissions tracker for asyncio applications:
+    ```py
+    async with AsyncEmissionsTracker() as tracker:
+        await serve()
+    ```
+    """
+
+
+class AsyncOfflineEmissionsTracker(_AsyncTrackerMixin, OfflineEmissionsTracker):
+    """
+    An offline emissions tracker for asyncio applications, see
+    `AsyncEmissionsTracker`.
+    """
+
+
 class TaskEmissionsTracker:
     """
     Track emissions for a specific task
@@ -1034,15 +1787,59 @@ class TaskEmissionsTracker:
         self.task_name = task_name
 
     def __enter__(self):
-        self.tracker.start_task(self.task_name)
+        self.task_name = self.tracker.start_task(self.task_name)
         return self
 
     def __exit__(self, exc_type, exc_value, tb) -> None:
-        self.tracker.stop_task()
+        self.tracker.stop_task(self.task_name)
         if self.is_default_tracker:
             self.tracker.stop()
 
 
+class _TrackerPool:
+    """
+    Started trackers shared by the functions decorated with
+    `track_emissions(reuse_tracker=True)`, one per configuration.
+    They are stopped when the interpreter exits.
+    """
+
+    def __init__(self):
+        self._trackers: Dict[Hashable, BaseEmissionsTracker] = {}
+        self._lock = threading.Lock()
+        self._stop_at_exit = False
+
+    def get(
+        self, key: Hashable, build_tracker: Callable[[], BaseEmissionsTracker]
+    ) -> BaseEmissionsTracker:
+        """
+        Get the started tracker of configuration `key`, built with
+        `build_tracker()` on first use.
+        """
+        tracker = self._trackers.get(key)
+        if tracker is not None:
+            return tracker
+        with self._lock:
+            tracker = self._trackers.get(key)
+            if tracker is None:
+                tracker = build_tracker()
+                tracker.start()
+                self._trackers[key] = tracker
+                if not self._stop_at_exit:
+                    atexit.register(self.stop_all)
+                    self._stop_at_exit = True
+        return tracker
+
+    def stop_all(self) -> None:
+        with self._lock:
+            trackers = list(self._trackers.values())
+            self._trackers.clear()
+        for tracker in trackers:
+            tracker.stop()
+
+
+_tracker_pool = _TrackerPool()
+
+
 def track_emissions(
     fn: Callable = None,
     project_name: Optional[str] = _sentinel,
@@ -1080,6 +1877,7 @@ def track_emissions(
     pue: Optional[int] = _sentinel,
     wue: Optional[float] = _sentinel,
     allow_multiple_runs: Optional[bool] = _sentinel,
+    reuse_tracker: bool = False,
 ):
     """
     Decorator that supports both `EmissionsTracker` and `OfflineEmissionsTracker`
@@ -1156,80 +1954,114 @@ def track_emissions(
     :param pue: PUE (Power Usage Effectiveness) of the datacenter.
     :param wue: WUE (Water Usage Effectiveness) of the datacenter, L/kWh.
     :param allow_multiple_runs: Prevent multiple instances of codecarbon running. Defaults to False.
+    :param reuse_tracker: Share a tracker, started on the first call, between the
+                          calls of the decorated functions with the same
+                          configuration. The calls of each function are
+                          recorded as a single task, and the tracker is
+                          stopped when the interpreter exits.
+                          Defaults to False, where each call runs its own tracker.
 
     :return: The decorated function
     """
+    tracker_config = {
+        name: value
+        for name, value in locals().items()
+        if name not in ("fn", "reuse_tracker")
+    }
+
+    def _build_tracker() -> BaseEmissionsTracker:
+        if offline and offline is not _sentinel:
+            if (country_iso_code is None or country_iso_code is _sentinel) and (
+                cloud_provider is None or cloud_provider is _sentinel
+            ):
+                raise Exception("Needs ISO Code of the Country for Offline mode")
+            return OfflineEmissionsTracker(
+                project_name=project_name,
+                measure_power_secs=measure_power_secs,
+                output_dir=output_dir,
+                output_file=output_file,
+                save_to_file=save_to_file,
+                save_to_logger=save_to_logger,
+                logging_logger=logging_logger,
+                save_to_prometheus=save_to_prometheus,
+                save_to_logfire=save_to_logfire,
+                prometheus_url=prometheus_url,
+                output_handlers=output_handlers,
+                gpu_ids=gpu_ids,
+                co2_signal_api_token=co2_signal_api_token,
+                tracking_mode=tracking_mode,
+                log_level=log_level,
+                on_csv_write=on_csv_write,
+                logger_preamble=logger_preamble,
+                country_iso_code=country_iso_code,
+                region=region,
+                cloud_provider=cloud_provider,
+                cloud_region=cloud_region,
+                country_2letter_iso_code=country_2letter_iso_code,
+                force_cpu_power=force_cpu_power,
+                force_ram_power=force_ram_power,
+                pue=pue,
+                wue=wue,
+                allow_multiple_runs=allow_multiple_runs,
+            )
+        return EmissionsTracker(
+            project_name=project_name,
+            measure_power_secs=measure_power_secs,
+            api_call_interval=api_call_interval,
+            api_endpoint=api_endpoint,
+            api_key=api_key,
+            output_dir=output_dir,
+            output_file=output_file,
+            save_to_file=save_to_file,
+            save_to_api=save_to_api,
+            save_to_logger=save_to_logger,
+            logging_logger=logging_logger,
+            save_to_prometheus=save_to_prometheus,
+            save_to_logfire=save_to_logfire,
+            prometheus_url=prometheus_url,
+            output_handlers=output_handlers,
+            gpu_ids=gpu_ids,
+            emissions_endpoint=emissions_endpoint,
+            experiment_id=experiment_id,
+            experiment_name=experiment_name,
+            co2_signal_api_token=co2_signal_api_token,
+            tracking_mode=tracking_mode,
+            log_level=log_level,
+            on_csv_write=on_csv_write,
+            logger_preamble=logger_preamble,
+            force_cpu_power=force_cpu_power,
+            force_ram_power=force_ram_power,
+            pue=pue,
+            wue=wue,
+            allow_multiple_runs=allow_multiple_runs,
+        )
 
     def _decorate(fn: Callable):
+        if reuse_tracker:
+            pool_key = tuple(
+                (name, repr(value))
+                for name, value in sorted(tracker_config.items())
+                if value is not _sentinel
+            )
+
+            @wraps(fn)
+            def pooled_fn(*args, **kwargs):
+                tracker = _tracker_pool.get(pool_key, _build_tracker)
+                task_name = tracker.start_task(
+                    fn.__qualname__, measure=False, aggregate=True
+                )
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    if task_name is not None:
+                        tracker.stop_task(task_name, measure=False)
+
+            return pooled_fn
+
         @wraps(fn)
         def wrapped_fn(*args, **kwargs):
             fn_result = None
-            if offline and offline is not _sentinel:
-                if (country_iso_code is None or country_iso_code is _sentinel) and (
-                    cloud_provider is None or cloud_provider is _sentinel
-                ):
-                    raise Exception("Needs ISO Code of the Country for Offline mode")
-                tracker = OfflineEmissionsTracker(
-                    project_name=project_name,
-                    measure_power_secs=measure_power_secs,
-                    output_dir=output_dir,
-                    output_file=output_file,
-                    save_to_file=save_to_file,
-                    save_to_logger=save_to_logger,
-                    logging_logger=logging_logger,
-                    save_to_prometheus=save_to_prometheus,
-                    save_to_logfire=save_to_logfire,
-                    prometheus_url=prometheus_url,
-                    output_handlers=output_handlers,
-                    gpu_ids=gpu_ids,
-                    co2_signal_api_token=co2_signal_api_token,
-                    tracking_mode=tracking_mode,
-                    log_level=log_level,
-                    on_csv_write=on_csv_write,
-                    logger_preamble=logger_preamble,
-                    country_iso_code=country_iso_code,
-                    region=region,
-                    cloud_provider=cloud_provider,
-                    cloud_region=cloud_region,
-                    country_2letter_iso_code=country_2letter_iso_code,
-                    force_cpu_power=force_cpu_power,
-                    force_ram_power=force_ram_power,
-                    pue=pue,
-                    wue=wue,
-                    allow_multiple_runs=allow_multiple_runs,
-                )
-            else:
-                tracker = EmissionsTracker(
-                    project_name=project_name,
-                    measure_power_secs=measure_power_secs,
-                    api_call_interval=api_call_interval,
-                    api_endpoint=api_endpoint,
-                    api_key=api_key,
-                    output_dir=output_dir,
-                    output_file=output_file,
-                    save_to_file=save_to_file,
-                    save_to_api=save_to_api,
-                    save_to_logger=save_to_logger,
-                    logging_logger=logging_logger,
-                    save_to_prometheus=save_to_prometheus,
-                    save_to_logfire=save_to_logfire,
-                    prometheus_url=prometheus_url,
-                    output_handlers=output_handlers,
-                    gpu_ids=gpu_ids,
-                    emissions_endpoint=emissions_endpoint,
-                    experiment_id=experiment_id,
-                    experiment_name=experiment_name,
-                    co2_signal_api_token=co2_signal_api_token,
-                    tracking_mode=tracking_mode,
-                    log_level=log_level,
-                    on_csv_write=on_csv_write,
-                    logger_preamble=logger_preamble,
-                    force_cpu_power=force_cpu_power,
-                    force_ram_power=force_ram_power,
-                    pue=pue,
-                    wue=wue,
-                    allow_multiple_runs=allow_multiple_runs,
-                )
+            tracker = _build_tracker()
             tracker.start()
             try:
                 fn_result = fn(*args, **kwargs)
@@ -1270,7 +2102,7 @@ def track_task_emissions(
         @wraps(fn)
         def wrapped_fn(*args, **kwargs):
             fn_result = None
-            tracker.start_task(task_name=task_name)
+            started_task_name = tracker.start_task(task_name=task_name)
             try:
                 fn_result = fn(*args, **kwargs)
             finally:
@@ -1278,7 +2110,7 @@ def track_task_emissions(
                     "\nGraceful stopping task measurement: collecting and writing information.\n"
                     + "Please Allow for a few seconds..."
                 )
-                tracker.stop_task()
+                tracker.stop_task(started_task_name)
                 if is_tracker_default:
                     tracker.stop()
                 logger.info("Done!\n")
@@ -7,8 +7,6 @@ import urllib.parse
 from dataclasses import dataclass
 from typing import Callable, Dict, Optional
 
-import requests
-
 from codecarbon.core.cloud import get_env_cloud_details
 from codecarbon.external.logger import logger
 
@@ -90,6 +88,8 @@ class GeoMetadata:
 
     @classmethod
     def from_geo_js(cls, url: str) -> "GeoMetadata":
+        import requests
+
         try:
             response: Dict = requests.get(url, timeout=0.5).json()
 
@@ -2,21 +2,34 @@
 Encapsulates external dependencies to retrieve hardware metadata
 """
 
-import math
 import re
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
-from typing import Dict, Iterable, List, Optional, Tuple
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple, Union
 
 import psutil
 
+from codecarbon.core.cgroup import CGroup
 from codecarbon.core.cpu import IntelPowerGadget, IntelRAPL
-from codecarbon.core.gpu import AllGPUDevices
+from codecarbon.core.cpu_load import (
+    CGroupCPULoad,
+    CPULoad,
+    LoadCurve,
+    MachineCPULoad,
+    ProcessCPULoad,
+    get_fitted_load_curve,
+    get_load_curve,
+    threadripper_load_curve,
+)
 from codecarbon.core.powermetrics import ApplePowermetrics
+from codecarbon.core.process_tree import ProcessTree
 from codecarbon.core.units import Energy, Power, Time
 from codecarbon.core.util import count_cpus, detect_cpu_model
 from codecarbon.external.logger import logger
 
+if TYPE_CHECKING:
+    from codecarbon.core.gpu import GPUProcessShare
+
 # default W value for a CPU if no model is found in the ref csv
 POWER_CONSTANT = 85
 
@@ -54,46 +67,50 @@ class BaseHardware(ABC):
 
 @dataclass
 class GPU(BaseHardware):
+    """
+    In "process" tracking mode, the energy of each GPU is split between its
+    processes and only the share of the processes of `process_tree` is counted,
+    see `GPUProcessShare`.
+    """
+
     gpu_ids: Optional[List]
+    tracking_mode: str = "machine"
+    process_tree: Optional[ProcessTree] = None
 
     def __repr__(self) -> str:
         return super().__repr__() + " ({})".format(
-            ", ".join([d["name"] for d in self.devices.get_gpu_details()])
+            ", ".join([d["name"] for d in self.devices.get_gpu_static_info()])
         )
 
     def __post_init__(self):
+        # pynvml is only imported on machines with GPUs
+        from codecarbon.core.gpu import AllGPUDevices, GPUProcessShare
+
         self.devices = AllGPUDevices()
         self.num_gpus = self.devices.device_count
         self._total_power = Power(
             0  # It will be 0 until we call for the first time measure_power_and_energy
         )
+        self._monitored_gpu_ids: Optional[List[int]] = None
+        self._process_shares: Optional[List["GPUProcessShare"]] = None
+        if self.tracking_mode == "process":
+            if self.process_tree is None:
+                self.process_tree = ProcessTree(psutil.Process().pid)
+            self._process_shares = [
+                GPUProcessShare(gpu_device, self.process_tree)
+                for gpu_device in self.devices.devices
+            ]
 
     def measure_power_and_energy(
         self, last_duration: float, gpu_ids: Iterable[int] = None
     ) -> Tuple[Power, Energy]:
         if not gpu_ids:
-            gpu_ids = self._get_gpu_ids()
-        all_gpu_details: List[Dict] = self.devices.get_delta(
-            Time.from_seconds(last_duration)
-        )
+            if self._monitored_gpu_ids is None:
+                self._monitored_gpu_ids = self._get_gpu_ids()
+            gpu_ids = self._monitored_gpu_ids
         # We get the total energy and power of only the ones in gpu_ids
-        total_energy = Energy.from_energy(
-            sum(
-                [
-                    gpu_details["delta_energy_consumption"].kWh
-                    for idx, gpu_details in enumerate(all_gpu_details)
-                    if idx in gpu_ids
-                ]
-            )
-        )
-        self._total_power = Power(
-            sum(
-                [
-                    gpu_details["power_usage"].kW
-                    for idx, gpu_details in enumerate(all_gpu_details)
-                    if idx in gpu_ids
-                ]
-            )
+        self._total_power, total_energy = self.devices.get_energy_delta(
+            Time.from_seconds(last_duration), gpu_ids, self._process_shares
         )
         return self._total_power, total_energy
 
@@ -148,14 +165,23 @@ class GPU(BaseHardware):
             d.start()
 
     @classmethod
-    def from_utils(cls, gpu_ids: Optional[List] = None) -> "GPU":
-        gpus = cls(gpu_ids=gpu_ids)
+    def from_utils(
+        cls,
+        gpu_ids: Optional[List] = None,
+        tracking_mode: str = "machine",
+        process_tree: Optional[ProcessTree] = None,
+    ) -> "GPU":
+        gpus = cls(
+            gpu_ids=gpu_ids, tracking_mode=tracking_mode, process_tree=process_tree
+        )
         new_gpu_ids = gpus._get_gpu_ids()
         if len(new_gpu_ids) < gpus.num_gpus:
             logger.warning(
                 f"You have {gpus.num_gpus} GPUs but we will monitor only {len(new_gpu_ids)} ({new_gpu_ids}) of them. Check your configuration."
             )
-        return cls(gpu_ids=new_gpu_ids)
+        gpus.gpu_ids = new_gpu_ids
+        gpus._monitored_gpu_ids = new_gpu_ids
+        return gpus
 
 
 @dataclass
@@ -168,8 +194,29 @@ class CPU(BaseHardware):
         tdp: int,
         rapl_dir: str = "/sys/class/powercap/intel-rapl/subsystem",
         tracking_mode: str = "machine",
+        load_curve: Optional[Union[str, LoadCurve]] = None,
+        process_tree: Optional[ProcessTree] = None,
+        cgroup: Optional[CGroup] = None,
     ):
-        assert tracking_mode in ["machine", "process"]
+        """
+        :param tracking_mode: "machine", "process" or "cgroup". In "cgroup" mode,
+                              the power measured for the whole machine by Intel
+                              RAPL is apportioned by the share of the busy CPU
+                              time used by the cgroup, and the constant power by
+                              the share of the CPUs the cgroup may use.
+        :param load_curve: in MODE_CPU_LOAD, curve giving the power from the TDP
+                           and the CPU load, or its name in `LOAD_CURVES` or the
+                           name of a CPU family with a fitted curve. Defaults to
+                           the fitted curve of the family of the CPU for the
+                           machine, or "cubic" if there is none, and to "linear"
+                           for the process or the cgroup.
+        :param process_tree: in "process" tracking mode, the tree of the tracked
+                             process, to share its scans with other hardware.
+                             Created if not given.
+        :param cgroup: in "cgroup" tracking mode, the tracked cgroup. Defaults to
+                       the cgroup of the current process.
+        """
+        assert tracking_mode in ["machine", "process", "cgroup"]
         self._power_history: List[Power] = []
         self._output_dir = output_dir
         self._mode = mode
@@ -180,6 +227,24 @@ class CPU(BaseHardware):
         self._pid = psutil.Process().pid
         self._cpu_count = count_cpus()
         self._process = psutil.Process(self._pid)
+        if load_curve is None:
+            if tracking_mode == "machine":
+                load_curve = get_fitted_load_curve(model) or "cubic"
+            else:
+                load_curve = "linear"
+        self._load_curve = get_load_curve(load_curve)
+        self._cgroup = None
+        if tracking_mode == "machine":
+            self._load_meter: CPULoad = MachineCPULoad()
+        elif tracking_mode == "cgroup":
+            self._cgroup = cgroup if cgroup is not None else CGroup()
+            self._load_meter = CGroupCPULoad(self._cgroup, self._cpu_count)
+        else:
+            if process_tree is None:
+                process_tree = ProcessTree(self._pid)
+            self._load_meter = ProcessCPULoad(
+                self._process, self._cpu_count, process_tree=process_tree
+            )
 
         if self._mode == "intel_power_gadget":
             self._intel_interface = IntelPowerGadget(self._output_dir)
@@ -199,6 +264,9 @@ class CPU(BaseHardware):
 
     @staticmethod
     def _calculate_power_from_cpu_load(tdp, cpu_load, model):
+        fitted_curve = get_fitted_load_curve(model)
+        if fitted_curve is not None:
+            return fitted_curve(tdp, cpu_load / 100.0)
         if "AMD Ryzen Threadripper" in model:
             return CPU._calculate_power_from_cpu_load_treadripper(tdp, cpu_load)
         else:
@@ -207,46 +275,23 @@ class CPU(BaseHardware):
 
     @staticmethod
     def _calculate_power_from_cpu_load_treadripper(tdp, cpu_load):
-        load = cpu_load / 100.0
-
-        if load < 0.1:  # Below 10% CPU load
-            return tdp * (0.05 * load * 10)
-        elif load <= 0.3:  # 10-30% load - linear phase
-            return tdp * (0.05 + 1.8 * (load - 0.1))
-        elif load <= 0.5:  # 30-50% load - adjusted coefficients
-            # Increased base power and adjusted curve
-            base_power = 0.45  # Increased from 0.41
-            power_range = 0.50  # Increased from 0.44
-            factor = ((load - 0.3) / 0.2) ** 1.8  # Reduced power from 2.0 to 1.8
-            return tdp * (base_power + power_range * factor)
-        else:  # Above 50% - plateau phase
-            return tdp * (0.85 + 0.15 * (1 - math.exp(-(load - 0.5) * 5)))
+        return threadripper_load_curve(tdp, cpu_load / 100.0)
 
     def _get_power_from_cpu_load(self):
         """
         When in MODE_CPU_LOAD
+        Estimate the power from the CPU load since the previous call, without waiting.
         """
+        cpu_load = self._load_meter.load()
+        power = self._load_curve(self._tdp, cpu_load)
         if self._tracking_mode == "machine":
-            tdp = self._tdp
-            cpu_load = psutil.cpu_percent(
-                interval=0.5, percpu=False
-            )  # Convert to 0-1 range
-            logger.debug(f"CPU load : {self._tdp=} W and {cpu_load:.1f} %")
-            # Cubic relationship with minimum 10% of TDP
-            load_factor = 0.1 + 0.9 * ((cpu_load / 100.0) ** 3)
-            power = tdp * load_factor
             logger.debug(
-                f"CPU load {self._tdp} W and {cpu_load:.1f}% {load_factor=} => estimation of {power} W for whole machine."
+                f"CPU load {self._tdp} W and {cpu_load * 100:.1f}% => estimation of {power} W for whole machine."
             )
-        elif self._tracking_mode == "process":
-
-            cpu_load = self._process.cpu_percent(interval=0.5) / self._cpu_count
-            power = self._tdp * cpu_load / 100
+        else:
             logger.debug(
                 f"CPU load {self._tdp} W and {cpu_load * 100:.1f}% => estimation of {power} W for process {self._pid}."
             )
-        else:
-            raise Exception(f"Unknown tracking_mode {self._tracking_mode}")
         return Power.from_watts(power)
 
     def _get_power_from_cpus(self) -> Power:
@@ -259,12 +304,18 @@ class CPU(BaseHardware):
             return power
         elif self._mode == "constant":
             power = self._tdp * CONSUMPTION_PERCENTAGE_CONSTANT
+            if self._cgroup is not None:
+                cpu_limit = self._cgroup.cpu_limit()
+                if cpu_limit is not None:
+                    power *= min(cpu_limit / self._cpu_count, 1.0)
             return Power.from_watts(power)
         if self._mode == "intel_rapl":
-            # Don't call get_cpu_details to avoid computing energy twice and losing data.
-            all_cpu_details: Dict = self._intel_interface.get_static_cpu_details()
-        else:
-            all_cpu_details: Dict = self._intel_interface.get_cpu_details()
+            # Don't read the counters again to avoid computing energy twice and losing data.
+            power = self._intel_interface.get_package_power()
+            if self._cgroup is not None:
+                power *= self._load_meter.busy_share
+            return power
+        all_cpu_details: Dict = self._intel_interface.get_cpu_details()
 
         power = 0
         for metric, value in all_cpu_details.items():
@@ -281,14 +332,7 @@ class CPU(BaseHardware):
         Get CPU energy deltas from RAPL files
         :return: energy in kWh
         """
-        all_cpu_details: Dict = self._intel_interface.get_cpu_details(delay)
-
-        energy = 0
-        for metric, value in all_cpu_details.items():
-            if re.match(r"^Processor Energy Delta_\d", metric):
-                energy += value
-                # logger.debug(f"_get_energy_from_cpus - MATCH {metric} : {value}")
-        return Energy.from_energy(energy)
+        return self._intel_interface.get_package_energy(delay)
 
     def total_power(self) -> Power:
         self._power_history.append(self._get_power_from_cpus())
@@ -303,6 +347,10 @@ class CPU(BaseHardware):
     def measure_power_and_energy(self, last_duration: float) -> Tuple[Power, Energy]:
         if self._mode == "intel_rapl":
             energy = self._get_energy_from_cpus(delay=Time(seconds=last_duration))
+            if self._cgroup is not None:
+                # Share of the CPU time of the machine used by the cgroup since the last measure
+                self._load_meter.load()
+                energy *= self._load_meter.busy_share
             power = self.total_power()
             # Patch AMD Threadripper that count 2x the power
             if "AMD Ryzen Threadripper" in self._model:
@@ -316,9 +364,9 @@ class CPU(BaseHardware):
     def start(self):
         if self._mode in ["intel_power_gadget", "intel_rapl", "apple_powermetrics"]:
             self._intel_interface.start()
-        if self._mode == MODE_CPU_LOAD:
-            # The first time this is called it will return a meaningless 0.0 value which you are supposed to ignore.
-            _ = self._get_power_from_cpu_load()
+        if self._mode == MODE_CPU_LOAD or self._cgroup is not None:
+            # Read the CPU times the first load is computed from
+            self._load_meter.start()
 
     def monitor_power(self):
         cpu_power = self._get_power_from_cpus()
@@ -335,6 +383,9 @@ class CPU(BaseHardware):
         model: Optional[str] = None,
         tdp: Optional[int] = None,
         tracking_mode: str = "machine",
+        load_curve: Optional[Union[str, LoadCurve]] = None,
+        process_tree: Optional[ProcessTree] = None,
+        cgroup: Optional[CGroup] = None,
     ) -> "CPU":
         if model is None:
             model = detect_cpu_model()
@@ -343,7 +394,16 @@ class CPU(BaseHardware):
 
         if tdp is None:
             tdp = POWER_CONSTANT
-            cpu = cls(output_dir=output_dir, mode=mode, model=model, tdp=tdp)
+            cpu = cls(
+                output_dir=output_dir,
+                mode=mode,
+                model=model,
+                tdp=tdp,
+                tracking_mode=tracking_mode,
+                load_curve=load_curve,
+                process_tree=process_tree,
+                cgroup=cgroup,
+            )
             cpu._is_generic_tdp = True
             return cpu
 
@@ -353,6 +413,9 @@ class CPU(BaseHardware):
             model=model,
             tdp=tdp,
             tracking_mode=tracking_mode,
+            load_curve=load_curve,
+            process_tree=process_tree,
+            cgroup=cgroup,
         )
 
 
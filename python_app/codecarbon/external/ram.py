@@ -2,11 +2,15 @@ import math
 import re
 import subprocess
 from dataclasses import dataclass
-from typing import Optional
+from typing import Optional, Tuple
 
 import psutil
 
-from codecarbon.core.units import Power
+from codecarbon.core.cgroup import CGroup
+from codecarbon.core.cpu import IntelRAPL
+from codecarbon.core.process_memory import ProcessMemory
+from codecarbon.core.process_tree import ProcessTree
+from codecarbon.core.units import Energy, Power, Time
 from codecarbon.core.util import SLURM_JOB_ID
 from codecarbon.external.hardware import B_TO_GB, BaseHardware
 from codecarbon.external.logger import logger
@@ -38,6 +42,9 @@ class RAM(BaseHardware):
         children: bool = True,
         tracking_mode: str = "machine",
         force_ram_power: Optional[int] = None,
+        rapl_dir: Optional[str] = "/sys/class/powercap/intel-rapl/subsystem",
+        process_tree: Optional[ProcessTree] = None,
+        cgroup: Optional[CGroup] = None,
     ):
         """
         Instantiate a RAM object from a reference pid. If none is provided, will use the
@@ -49,22 +56,67 @@ class RAM(BaseHardware):
                                  children). Defaults to psutil.Process().pid.
             children (int, optional): Look for children of the process when computing
                                       total RAM used. Defaults to True.
-            tracking_mode (str, optional): Whether to track "machine" or "process" RAM.
-                                          Defaults to "machine".
+            tracking_mode (str, optional): Whether to track "machine", "process" or
+                                           "cgroup" RAM. Defaults to "machine".
             force_ram_power (int, optional): User-provided RAM power in watts. If provided,
                                            this value is used instead of estimating RAM power.
                                            Defaults to None.
+            rapl_dir (str, optional): Directory of the Intel RAPL files. When they
+                                      expose "dram" domains, the RAM energy is measured
+                                      from them in "machine" tracking mode instead of
+                                      being estimated. None to always estimate it.
+            process_tree (ProcessTree, optional): Tree of the process `pid`, to share
+                                                  its scans with other hardware. Created
+                                                  if needed and not given.
+            cgroup (CGroup, optional): In "cgroup" tracking mode, the tracked cgroup.
+                                       Defaults to the cgroup of the current process.
         """
         self._pid = pid
         self._children = children
         self._tracking_mode = tracking_mode
         self._force_ram_power = force_ram_power
+        self._process_tree = process_tree
+        self._process_memory: Optional[ProcessMemory] = None
+        self._cgroup = cgroup
+        if self._tracking_mode == "cgroup" and self._cgroup is None:
+            self._cgroup = CGroup()
         # Check if using ARM architecture
         self.is_arm_cpu = self._detect_arm_cpu()
 
         if self._force_ram_power is not None:
             logger.info(f"Using user-provided RAM power: {self._force_ram_power} Watts")
 
+        self._rapl: Optional[IntelRAPL] = None
+        if (
+            rapl_dir is not None
+            and self._force_ram_power is None
+            and self._tracking_mode == "machine"
+        ):
+            self._rapl = self._setup_rapl_dram(rapl_dir)
+
+    @staticmethod
+    def _setup_rapl_dram(rapl_dir: str) -> Optional[IntelRAPL]:
+        """
+        Open the RAPL "dram" domains, if any, to measure the RAM energy.
+        """
+        try:
+            rapl = IntelRAPL(rapl_dir=rapl_dir, domains=("dram",))
+        except Exception as e:
+            logger.debug(f"Not measuring RAM with Intel RAPL: {e}")
+            return None
+        if not rapl.has_domain("dram"):
+            logger.debug("No Intel RAPL dram domain to measure RAM")
+            return None
+        logger.info("Measuring RAM energy with Intel RAPL dram domains")
+        return rapl
+
+    @property
+    def is_rapl_measured(self) -> bool:
+        """
+        Whether the RAM energy is measured by Intel RAPL instead of estimated.
+        """
+        return self._rapl is not None
+
     def _detect_arm_cpu(self) -> bool:
         """
         Detect if the CPU is ARM-based
@@ -199,9 +251,18 @@ class RAM(BaseHardware):
         Returns:
             list(int): The list of RAM values
         """
-        current_process = psutil.Process(self._pid)
-        children = current_process.children(recursive=True)
-        return [child.memory_info().rss for child in children]
+        process_memory = self._get_process_memory()
+        return [process_memory.memory(child) for child in self._process_tree.children()]
+
+    def _get_process_memory(self) -> ProcessMemory:
+        """
+        The reader of the memory (PSS) of the tracked processes, created on first use.
+        """
+        if self._process_memory is None:
+            if self._process_tree is None:
+                self._process_tree = ProcessTree(self._pid)
+            self._process_memory = ProcessMemory(self._process_tree)
+        return self._process_memory
 
     def _read_slurm_scontrol(self):
         try:
@@ -288,15 +349,31 @@ class RAM(BaseHardware):
     def process_memory_GB(self):
         """
         Property to compute the process's total memory usage in bytes.
+        Pages shared between the processes are only counted once, see `ProcessMemory`.
 
         Returns:
             float: RAM usage (GB)
         """
         children_memories = self._get_children_memories() if self._children else []
-        main_memory = psutil.Process(self._pid).memory_info().rss
+        process_memory = self._get_process_memory()
+        main_memory = process_memory.memory(self._process_tree.root)
+        process_memory.prune()
         memories = children_memories + [main_memory]
         return sum([m for m in memories if m] + [0]) / B_TO_GB
 
+    @property
+    def cgroup_memory_GB(self):
+        """
+        Property to compute the memory used by the processes of the cgroup.
+
+        Returns:
+            float: RAM usage (GB)
+        """
+        memory = self._cgroup.memory_bytes()
+        if memory is None:
+            return self.machine_memory_GB
+        return memory / B_TO_GB
+
     @property
     def machine_memory_GB(self):
         """
@@ -311,6 +388,18 @@ class RAM(BaseHardware):
             else psutil.virtual_memory().total / B_TO_GB
         )
 
+    def start(self) -> None:
+        if self._rapl is not None:
+            self._rapl.start()
+
+    def measure_power_and_energy(self, last_duration: float) -> Tuple[Power, Energy]:
+        if self._rapl is not None:
+            energy = self._rapl.get_domain_energy(
+                Time(seconds=last_duration), domain="dram"
+            )
+            return self._rapl.get_domain_power("dram"), energy
+        return super().measure_power_and_energy(last_duration=last_duration)
+
     def total_power(self) -> Power:
         """
         Compute the Power (kW) consumed by the current process (and its children if
@@ -319,6 +408,10 @@ class RAM(BaseHardware):
         Returns:
             Power: kW of power consumption, using either the user-provided value or a power model
         """
+        if self._rapl is not None:
+            # Power measured over the last RAPL read
+            return self._rapl.get_domain_power("dram")
+
         # If user provided a RAM power value, use it directly
         if self._force_ram_power is not None:
             logger.debug(
@@ -327,11 +420,12 @@ class RAM(BaseHardware):
             return Power.from_watts(self._force_ram_power)
 
         try:
-            memory_GB = (
-                self.machine_memory_GB
-                if self._tracking_mode == "machine"
-                else self.process_memory_GB
-            )
+            if self._tracking_mode == "machine":
+                memory_GB = self.machine_memory_GB
+            elif self._tracking_mode == "cgroup":
+                memory_GB = self.cgroup_memory_GB
+            else:
+                memory_GB = self.process_memory_GB
             ram_power = Power.from_watts(self._calculate_ram_power(memory_GB))
             logger.debug(
                 f"RAM power estimation: {ram_power.W:.2f}W for {memory_GB:.2f}GB"
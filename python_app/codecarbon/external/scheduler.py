@@ -1,52 +1,398 @@
-from threading import Lock, Timer
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
 
+from codecarbon.external.logger import logger
 
-class PeriodicScheduler:
+if TYPE_CHECKING:
+    import asyncio
+
+
+@dataclass
+class SamplingJob:
+    """
+    A periodic job multiplexed on a `SamplingEngine`.
+
+    Deadlines are computed as `anchor + index * interval` on the monotonic clock,
+    so the schedule does not drift with the time spent running the jobs.
+    """
+
+    name: str
+    interval: float
+    function: Callable
+    args: Tuple = ()
+    kwargs: Dict[str, Any] = field(default_factory=dict)
+    paused: bool = False
+    # Monotonic time the schedule is counted from
+    anchor: float = 0.0
+    # Index of the next tick since `anchor`
+    index: int = 1
+    # Statistics
+    ticks: int = 0
+    missed_ticks: int = 0
+    late_ticks: int = 0
+    max_lateness: float = 0.0
+
+    @property
+    def next_deadline(self) -> float:
+        return self.anchor + self.index * self.interval
+
+    def arm(self, now: float) -> None:
+        """
+        Restart the schedule of the job from `now`.
+        """
+        self.anchor = now
+        self.index = 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "interval": self.interval,
+            "paused": self.paused,
+            "ticks": self.ticks,
+            "missed_ticks": self.missed_ticks,
+            "late_ticks": self.late_ticks,
+            "max_lateness": self.max_lateness,
+        }
+
+
+class SamplingEngine:
     """
-    A periodic task running in threading.Timers
-    From https://stackoverflow.com/a/18906292/14541668
+    Run several periodic jobs from a single long-lived background thread.
+
+    Rather than re-creating a `threading.Timer` on every tick, the engine keeps
+    one daemon thread sleeping until the earliest monotonic deadline of its
+    jobs. Jobs due at the same time run in registration order.
+    A tick that could not run before the next one was due is counted as missed
+    and skipped, a tick that ran more than `late_tolerance` (fraction of the
+    interval) after its deadline is counted as late.
+
+    With `threaded=False`, no thread is started: the jobs are run from an asyncio
+    event loop by awaiting `run_async()`.
     """
 
-    def __init__(self, interval, function, *args, **kwargs):
+    # Jobs whose deadlines are this close (in seconds) run in the same wake-up
+    COALESCE_WINDOW = 0.001
+
+    def __init__(
+        self,
+        name: str = "codecarbon-sampler",
+        late_tolerance: float = 0.1,
+        threaded: bool = True,
+    ):
         """
-        Init the scheduler. You have to call start() after initialization.
-        ::interval:: interval in seconds to run the function.
-        ::function:: function to run.
-        ::args:: args to pass to the function.
-        ::kwargs:: kwargs to pass to the function.
+        ::name:: name of the background thread.
+        ::late_tolerance:: fraction of the interval after which a tick is late.
+        ::threaded:: run the jobs from a background thread, otherwise from
+        `run_async()`.
         """
-        self._lock = Lock()
-        self._timer = None
-        self.function = function
-        self.interval = interval
-        self.args = args
-        self.kwargs = kwargs
+        self.name = name
+        self.late_tolerance = late_tolerance
+        self.threaded = threaded
+        self._jobs: Dict[str, SamplingJob] = {}
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
         self._stopped = True
+        # Event loop running `run_async()`, and the event waking it up
+        self._event_loop: Optional["asyncio.AbstractEventLoop"] = None
+        self._wakeup: Optional["asyncio.Event"] = None
+
+    @property
+    def is_running(self) -> bool:
+        return not self._stopped
+
+    def add_job(
+        self, name: str, interval: float, function: Callable, *args, **kwargs
+    ) -> SamplingJob:
+        """
+        Register a job to run `function(*args, **kwargs)` every `interval` seconds.
+        If the engine is already running, the job's first tick is one interval
+        from now.
+        """
+        if interval <= 0:
+            raise ValueError(f"Interval of job '{name}' must be positive: {interval}")
+        job = SamplingJob(
+            name=name, interval=interval, function=function, args=args, kwargs=kwargs
+        )
+        with self._condition:
+            if name in self._jobs:
+                raise ValueError(f"A job named '{name}' is already registered")
+            job.arm(time.monotonic())
+            self._jobs[name] = job
+            self._ensure_thread()
+            self._notify()
+        return job
+
+    def remove_job(self, name: str) -> None:
+        with self._condition:
+            self._jobs.pop(name, None)
+            self._notify()
+
+    def get_job(self, name: str) -> Optional[SamplingJob]:
+        return self._jobs.get(name)
+
+    def pause_job(self, name: str) -> None:
+        with self._condition:
+            if name in self._jobs:
+                self._jobs[name].paused = True
+                self._notify()
+
+    def resume_job(self, name: str) -> None:
+        """
+        Resume a paused job, its next tick is one interval from now.
+        """
+        with self._condition:
+            job = self._jobs.get(name)
+            if job is not None and job.paused:
+                job.paused = False
+                job.arm(time.monotonic())
+                self._notify()
+
+    def set_interval(self, name: str, interval: float) -> None:
+        """
+        Change the interval of a job, its next tick is one new interval after
+        its last one.
+        """
+        if interval <= 0:
+            raise ValueError(f"Interval of job '{name}' must be positive: {interval}")
+        with self._condition:
+            job = self._jobs.get(name)
+            if job is None:
+                return
+            last_tick = job.anchor + (job.index - 1) * job.interval
+            job.interval = interval
+            job.arm(last_tick)
+            self._notify()
+
+    def _notify(self) -> None:
+        """
+        Wake up the loop running the jobs, as the schedule changed.
+        Must be called with the lock.
+        """
+        self._condition.notify()
+        if self._event_loop is not None:
+            try:
+                self._event_loop.call_soon_threadsafe(self._wakeup.set)
+            except RuntimeError:
+                # The event loop is closed
+                pass
 
-    def start(self, from_run=False):
+    def start(self) -> None:
         """
-        Start the scheduler.
-        ::from_run:: For internal purposes to allow re-scheduling
-        Please do not use from_run=True until you know what you do !
+        Start the engine. All jobs are armed from now, the background thread is
+        only started once there is a job to run.
+        Does nothing if the engine is already running.
         """
-        self._lock.acquire()
-        if from_run or self._stopped:
+        with self._condition:
+            if not self._stopped:
+                return
             self._stopped = False
-            self._timer = Timer(self.interval, self._run)
-            self._timer.daemon = True
-            self._timer.start()
-        self._lock.release()
+            now = time.monotonic()
+            for job in self._jobs.values():
+                job.arm(now)
+            self._ensure_thread()
 
-    def _run(self):
-        self.start(from_run=True)
-        self.function(*self.args, **self.kwargs)
+    def _ensure_thread(self) -> None:
+        """
+        Start the background thread of a running engine once it has jobs.
+        Must be called with the lock.
+        """
+        if (
+            not self.threaded
+            or self._stopped
+            or self._thread is not None
+            or not self._jobs
+        ):
+            return
+        self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+        self._thread.start()
 
-    def stop(self):
+    def stop(self, timeout: Optional[float] = None) -> None:
         """
-        Stop the scheduler.
+        Stop the background thread, waiting for a running job to finish.
         """
-        if not self._stopped:
-            self._lock.acquire()
+        with self._condition:
+            if self._stopped:
+                return
             self._stopped = True
-            self._timer.cancel()
-            self._lock.release()
+            self._notify()
+        thread = self._thread
+        self._thread = None
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Return the tick statistics of every job.
+        """
+        with self._condition:
+            return {name: job.stats() for name, job in self._jobs.items()}
+
+    def _next_deadline(self) -> Optional[float]:
+        deadlines = [j.next_deadline for j in self._jobs.values() if not j.paused]
+        return min(deadlines) if deadlines else None
+
+    def _collect_due_jobs(self, now: float) -> List[SamplingJob]:
+        """
+        Book-keep and return the jobs due at `now`. Must be called with the lock.
+        """
+        due = []
+        for job in self._jobs.values():
+            if job.paused or job.next_deadline > now + self.COALESCE_WINDOW:
+                continue
+            lateness = max(now - job.next_deadline, 0.0)
+            job.ticks += 1
+            job.max_lateness = max(job.max_lateness, lateness)
+            if lateness > job.interval * self.late_tolerance:
+                job.late_ticks += 1
+            # Skip the ticks we were not able to run in time
+            missed = int(lateness // job.interval)
+            if missed:
+                job.missed_ticks += missed
+                logger.warning(
+                    f"Sampling job '{job.name}' missed {missed} tick(s),"
+                    + f" it ran {lateness:.2f} s after its deadline."
+                )
+            job.index += missed + 1
+            due.append(job)
+        return due
+
+    def run_pending(self, now: Optional[float] = None) -> Optional[float]:
+        """
+        Run the jobs due at `now` (defaults to the current monotonic time) in the
+        calling thread.
+        :return: The next deadline, None if there is no active job.
+        """
+        if now is None:
+            now = time.monotonic()
+        with self._condition:
+            due = self._collect_due_jobs(now)
+        for job in due:
+            try:
+                job.function(*job.args, **job.kwargs)
+            except Exception as e:
+                logger.error(f"Sampling job '{job.name}' failed: {e}", exc_info=True)
+        with self._condition:
+            return self._next_deadline()
+
+    async def run_async(self) -> None:
+        """
+        Run the jobs from the running event loop until the engine is stopped.
+        The jobs are called in the event loop, they must not block it.
+        """
+        if self.threaded:
+            raise RuntimeError(f"Sampling engine '{self.name}' runs in a thread")
+        import asyncio
+
+        with self._condition:
+            self._event_loop = asyncio.get_running_loop()
+            self._wakeup = asyncio.Event()
+        try:
+            while self.is_running:
+                self._wakeup.clear()
+                deadline = self.run_pending()
+                timeout = None
+                if deadline is not None:
+                    timeout = max(deadline - time.monotonic(), 0)
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            with self._condition:
+                self._event_loop = None
+                self._wakeup = None
+
+    def _loop(self) -> None:
+        while True:
+            with self._condition:
+                while not self._stopped:
+                    deadline = self._next_deadline()
+                    if deadline is None:
+                        self._condition.wait()
+                        continue
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    self._condition.wait(timeout)
+                if self._stopped:
+                    return
+            self.run_pending()
+
+
+class AdaptiveSamplingPolicy:
+    """
+    Choose the interval between two measures from the variation of the power.
+
+    When the relative change of the power between two measures is below
+    `stable_threshold`, the interval grows by `growth_factor`; when it is above
+    `burst_threshold`, the interval shrinks by `shrink_factor`. The interval always
+    stays within [`min_interval`, `max_interval`].
+    """
+
+    def __init__(
+        self,
+        interval: float,
+        min_interval: float,
+        max_interval: float,
+        stable_threshold: float = 0.05,
+        burst_threshold: float = 0.2,
+        growth_factor: float = 1.5,
+        shrink_factor: float = 0.5,
+    ):
+        if not 0 < min_interval <= max_interval:
+            raise ValueError(
+                f"Invalid sampling bounds: [{min_interval}, {max_interval}]"
+            )
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.stable_threshold = stable_threshold
+        self.burst_threshold = burst_threshold
+        self.growth_factor = growth_factor
+        self.shrink_factor = shrink_factor
+        self.interval = self._clamp(interval)
+        self._last_power: Optional[float] = None
+        self._first_sample_time: Optional[float] = None
+        self._last_sample_time: Optional[float] = None
+        self.samples = 0
+
+    def _clamp(self, interval: float) -> float:
+        return min(max(interval, self.min_interval), self.max_interval)
+
+    def observe(self, power_W: float, now: Optional[float] = None) -> float:
+        """
+        Record the power of a new measure.
+        :return: The interval until the next measure.
+        """
+        if now is None:
+            now = time.monotonic()
+        if self._first_sample_time is None:
+            self._first_sample_time = now
+        self._last_sample_time = now
+        self.samples += 1
+        if self._last_power is not None:
+            change = abs(power_W - self._last_power) / max(abs(self._last_power), 1e-3)
+            if change < self.stable_threshold:
+                self.interval = self._clamp(self.interval * self.growth_factor)
+            elif change > self.burst_threshold:
+                self.interval = self._clamp(self.interval * self.shrink_factor)
+        self._last_power = power_W
+        return self.interval
+
+    @property
+    def achieved_rate(self) -> float:
+        """
+        Mean number of measures per second since the first one.
+        """
+        if self.samples < 2 or self._last_sample_time == self._first_sample_time:
+            return 0.0
+        return (self.samples - 1) / (self._last_sample_time - self._first_sample_time)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "interval": self.interval,
+            "min_interval": self.min_interval,
+            "max_interval": self.max_interval,
+            "samples": self.samples,
+            "achieved_rate": self.achieved_rate,
+        }
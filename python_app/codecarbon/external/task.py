@@ -1,4 +1,5 @@
 import time
+from typing import Dict, Optional, Tuple
 from uuid import uuid4
 
 from codecarbon.output import EmissionsData, TaskEmissionsData
@@ -7,16 +8,42 @@ from codecarbon.output import EmissionsData, TaskEmissionsData
 class Task:
     """
     A task, used to segregate electrical consumption when executing a treatment.
+    A task is an interval of `time.perf_counter()` times, its energy is looked up
+    in the timeline of the tracker once it is stopped. Tasks may overlap or nest.
     """
 
     is_active: bool
-    emissions_data: EmissionsData
+    emissions_data: Optional[EmissionsData]
 
-    def __init__(self, task_name):  # , task_measure
+    def __init__(self, task_name, start_time: Optional[float] = None):
         self.task_id: str = task_name + uuid4().__str__()
         self.task_name: str = task_name
-        self.start_time = time.perf_counter()
+        self.start_time = time.perf_counter() if start_time is None else start_time
+        self.stop_time: Optional[float] = None
         self.is_active = True
+        # Energy (kWh) consumed by each component during the task
+        self.energies: Optional[Dict[str, float]] = None
+        self.emissions_data = None
+        # Name of the `TaskAggregate` the task is added to once its energy is
+        # known, if any
+        self.aggregate_as: Optional[str] = None
+
+    def stop(self, stop_time: Optional[float] = None) -> None:
+        self.stop_time = time.perf_counter() if stop_time is None else stop_time
+        self.is_active = False
+
+    def totals(self) -> Tuple[Dict[str, float], float]:
+        """
+        Energy (kWh) consumed by each component during the task, and its duration (s).
+        """
+        return self.energies, self.stop_time - self.start_time
+
+    @property
+    def is_resolved(self) -> bool:
+        """
+        Whether the emissions of the stopped task have been computed.
+        """
+        return self.emissions_data is not None
 
     def out(self):
         return TaskEmissionsData(
@@ -53,3 +80,42 @@ class Task:
             tracking_mode=self.emissions_data.tracking_mode,
             on_cloud=self.emissions_data.on_cloud,
         )
+
+
+class TaskAggregate(Task):
+    """
+    The total of the tasks of the same name, e.g. all the calls of a function,
+    kept as a single record so that the memory and the outputs do not grow
+    with the number of tasks.
+    """
+
+    def __init__(self, task_name, start_time: float):
+        super().__init__(task_name, start_time)
+        self.stop(start_time)
+        self.calls = 0
+        # Replaced at once, so that readers get consistent totals
+        self._totals: Tuple[Dict[str, float], float] = (
+            {"cpu": 0.0, "gpu": 0.0, "ram": 0.0},
+            0.0,
+        )
+        self.energies = self._totals[0]
+
+    def add(self, task: Task) -> None:
+        """
+        Add a stopped task whose energy is known.
+        """
+        energies, duration = self._totals
+        task_energies, task_duration = task.totals()
+        self._totals = (
+            {
+                component: energy + task_energies[component]
+                for component, energy in energies.items()
+            },
+            duration + task_duration,
+        )
+        self.energies = self._totals[0]
+        self.stop_time = max(self.stop_time, task.stop_time)
+        self.calls += 1
+
+    def totals(self) -> Tuple[Dict[str, float], float]:
+        return self._totals
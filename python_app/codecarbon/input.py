@@ -5,10 +5,32 @@ App configuration: This will likely change when we have a common location for da
 import atexit
 import json
 import sys
+import threading
 from contextlib import ExitStack
-from typing import Dict
+from functools import lru_cache
+from types import MappingProxyType
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Mapping,
+    Optional,
+    Tuple,
+    Union,
+)
 
-import pandas as pd
+from codecarbon.core.reference_data import (
+    ReferenceBundle,
+    read_csv_records,
+    source_digest,
+)
+from codecarbon.external.logger import logger
+
+if TYPE_CHECKING:
+    # Only needed by the DataFrame getters, used by the dashboard
+    import pandas as pd
 
 if sys.version_info >= (3, 9):
     from importlib.resources import as_file as importlib_resources_as_file
@@ -17,8 +39,22 @@ else:
     from importlib_resources import as_file as importlib_resources_as_file
     from importlib_resources import files as importlib_resources_files
 
+# Closes the files extracted from the package at exit, if any
+_resource_files = ExitStack()
+atexit.register(_resource_files.close)
+
 
 class DataSource:
+    """
+    The reference data is loaded on first use and kept for the lifetime of the
+    process, shared by all the instances: the dictionaries returned must not be
+    modified.
+    """
+
+    # Reference data already loaded, by package, file path and loader name
+    _cache: Dict[Tuple[str, str, str], Any] = {}
+    _cache_lock = threading.Lock()
+
     def __init__(self):
         self.config = {
             "geo_js_url": "https://get.geojs.io/v1/ip/geo.json",
@@ -28,6 +64,18 @@ class DataSource:
             "global_energy_mix_data_path": "data/private_infra/global_energy_mix.json",  # noqa: E501
             "carbon_intensity_per_source_path": "data/private_infra/carbon_intensity_per_source.json",
             "cpu_power_path": "data/hardware/cpu_power.csv",
+            "cpu_load_curves_path": "data/hardware/cpu_load_curves.json",
+            "reference_bundle_path": "data/reference_data.bin",
+        }
+        # Sources compiled in the reference data bundle, with the key columns
+        # of the CSV files
+        self.bundle_sources = {
+            "cloud_emissions_path": ["provider", "region"],
+            "cpu_power_path": [],
+            "global_energy_mix_data_path": [],
+            "usa_emissions_data_path": [],
+            "can_energy_mix_data_path": [],
+            "carbon_intensity_per_source_path": [],
         }
         self.module_name = "codecarbon"
 
@@ -36,11 +84,10 @@ class DataSource:
         return self.config["geo_js_url"]
 
     @staticmethod
+    @lru_cache(maxsize=None)
     def get_ressource_path(package: str, filepath: str):
-        file_manager = ExitStack()
-        atexit.register(file_manager.close)
         ref = importlib_resources_files(package).joinpath(filepath)
-        path = file_manager.enter_context(importlib_resources_as_file(ref))
+        path = _resource_files.enter_context(importlib_resources_as_file(ref))
         return path
 
     @property
@@ -82,58 +129,167 @@ class DataSource:
     def cpu_power_path(self):
         return self.get_ressource_path(self.module_name, self.config["cpu_power_path"])
 
-    def get_global_energy_mix_data(self) -> Dict:
+    @property
+    def cpu_load_curves_path(self):
+        return self.get_ressource_path(
+            self.module_name, self.config["cpu_load_curves_path"]
+        )
+
+    def _load(self, config_key: str, loader: Callable[[Any], Any]) -> Any:
+        """
+        Reference data of the file `self.config[config_key]`, read with
+        `loader(path)` the first time it is requested in the process.
+        """
+        key = (self.module_name, self.config[config_key], loader.__name__)
+        data = DataSource._cache.get(key)
+        if data is None:
+            with DataSource._cache_lock:
+                data = DataSource._cache.get(key)
+                if data is None:
+                    data = loader(self.get_ressource_path(*key[:2]))
+                    DataSource._cache[key] = data
+        return data
+
+    @staticmethod
+    def _load_json(path) -> Dict:
+        with open(path) as f:
+            return json.load(f)
+
+    def _open_bundle(self, path) -> Union[ReferenceBundle, bool]:
+        """
+        The bundle at `path`, False if it cannot be used.
+        """
+        try:
+            bundle = ReferenceBundle(path)
+        except (OSError, ValueError) as e:
+            logger.debug(f"Not using the reference data bundle: {e}")
+            return False
+        sources = {}
+        for config_key in self.bundle_sources:
+            filepath = self.config[config_key]
+            source = self.get_ressource_path(self.module_name, filepath)
+            sources[filepath] = source_digest(source)
+        if not bundle.is_built_from(sources):
+            logger.debug(
+                "Not using the reference data bundle: it is out of date, see "
+                "codecarbon/data/build_reference_bundle.py"
+            )
+            bundle.close()
+            return False
+        return bundle
+
+    def get_reference_bundle(self) -> Optional[ReferenceBundle]:
+        """
+        Returns the bundle of the reference data, None if it is missing or out
+        of date, in which case the data is read from its sources.
+        """
+        return self._load("reference_bundle_path", self._open_bundle) or None
+
+    def _load_records(self, config_key: str) -> Mapping:
         """
-        Returns Global Energy Mix Data
+        Reference data of a JSON file, from the bundle when it is available.
         """
-        with open(self.global_energy_mix_data_path) as f:
-            global_energy_mix: Dict = json.load(f)
-        return global_energy_mix
+        bundle = self.get_reference_bundle()
+        if bundle is not None and config_key in bundle.tables:
+            return bundle.records(config_key)
+        return self._load(config_key, self._load_json)
 
-    def get_cloud_emissions_data(self) -> pd.DataFrame:
+    def get_global_energy_mix_data(self) -> Mapping:
         """
-        Returns Cloud Regions Impact Data
+        Returns Global Energy Mix Data, by country ISO code
         """
-        return pd.read_csv(self.cloud_emissions_path)
+        return self._load_records("global_energy_mix_data_path")
 
-    def get_country_emissions_data(self, country_iso_code: str) -> Dict:
+    def get_cloud_emissions_data(self) -> "pd.DataFrame":
+        """
+        Returns Cloud Regions Impact Data, requires pandas.
+        See `get_cloud_region_data` for the data of a region.
+        """
+        import pandas as pd
+
+        return self._load("cloud_emissions_path", pd.read_csv).copy()
+
+    @staticmethod
+    def _index_cloud_regions(path) -> Mapping[Tuple[str, str], Mapping[str, Any]]:
+        """
+        Rows of the cloud emissions data, by provider and region.
+        """
+        return MappingProxyType(
+            {(row["provider"], row["region"]): row for row in read_csv_records(path)}
+        )
+
+    def get_cloud_region_data(
+        self, provider: str, region: str
+    ) -> Optional[Mapping[str, Any]]:
+        """
+        Returns the Impact Data of a Cloud Region, as a read-only row of the
+        cloud emissions data (None for the empty cells), None if the region is
+        unknown.
+        """
+        bundle = self.get_reference_bundle()
+        if bundle is not None:
+            cloud_regions = bundle.records("cloud_emissions_path")
+        else:
+            cloud_regions = self._load(
+                "cloud_emissions_path", self._index_cloud_regions
+            )
+        cloud_region = cloud_regions.get((provider, region))
+        return MappingProxyType(cloud_region) if cloud_region is not None else None
+
+    def get_country_emissions_data(self, country_iso_code: str) -> Mapping:
         """
         Returns Emissions Across Regions in a country
         :param country_iso_code: ISO code similar to one used in file names
         :return: emissions in lbs/MWh and region code
         """
         try:
-            with open(self.country_emissions_data_path(country_iso_code)) as f:
-                country_emissions_data: Dict = json.load(f)
-            return country_emissions_data
+            return self._load_records(f"{country_iso_code}_emissions_data_path")
         except KeyError:
             # KeyError raised from line 39, when there is no data path specified for
             # the given country
             raise DataSourceException
 
-    def get_country_energy_mix_data(self, country_iso_code: str) -> Dict:
+    def get_country_energy_mix_data(self, country_iso_code: str) -> Mapping:
         """
         Returns Energy Mix Across Regions in a country
         :param country_iso_code: ISO code similar to one used in file names
         :return: energy mix by region code
         """
-        with open(self.country_energy_mix_data_path(country_iso_code)) as f:
-            country_energy_mix_data: Dict = json.load(f)
-        return country_energy_mix_data
+        return self._load_records(f"{country_iso_code}_energy_mix_data_path")
 
-    def get_carbon_intensity_per_source_data(self) -> Dict:
+    def get_carbon_intensity_per_source_data(self) -> Mapping:
         """
         Returns Carbon intensity per source. In gCO2.eq/kWh.
         """
-        with open(self.carbon_intensity_per_source_path) as f:
-            carbon_intensity_per_source: Dict = json.load(f)
-        return carbon_intensity_per_source
+        return self._load_records("carbon_intensity_per_source_path")
+
+    def get_cpu_power_data(self) -> "pd.DataFrame":
+        """
+        Returns CPU power Data, requires pandas.
+        See `get_cpu_power_rows` for the TDP of the CPU models.
+        """
+        import pandas as pd
+
+        return self._load("cpu_power_path", pd.read_csv).copy()
+
+    def get_cpu_power_rows(self) -> Iterable[Tuple[str, Any]]:
+        """
+        Returns the name and the TDP (W) of each CPU of the CPU power data
+        """
+        bundle = self.get_reference_bundle()
+        if bundle is not None:
+            table = bundle.tables["cpu_power_path"]
+            return zip(table.column("Name"), table.column("TDP"))
+        return (
+            (row["Name"], row["TDP"]) for row in read_csv_records(self.cpu_power_path)
+        )
 
-    def get_cpu_power_data(self) -> pd.DataFrame:
+    def get_cpu_load_curves_data(self) -> Dict:
         """
-        Returns CPU power Data
+        Returns the CPU power curves fitted for each CPU family, as the share of
+        the TDP used at each load.
         """
-        return pd.read_csv(self.cpu_power_path)
+        return self._load("cpu_load_curves_path", self._load_json)
 
 
 class DataSourceException(Exception):
@@ -1,7 +1,13 @@
 """
 Provides functionality for persistence of data
+
+The output methods calling a remote endpoint are imported on first use, as
+`codecarbon.output.HTTPOutput` for instance, so that their dependencies are
+not loaded by the trackers that do not use them.
 """
 
+import importlib
+
 from codecarbon.output_methods.base_output import BaseOutput  # noqa: F401
 
 # emissions data
@@ -13,15 +19,24 @@ from codecarbon.output_methods.emissions_data import (  # noqa: F401
 # Output to a file
 from codecarbon.output_methods.file import FileOutput  # noqa: F401
 
-# Output calling a REST http endpoint
-from codecarbon.output_methods.http import CodeCarbonAPIOutput, HTTPOutput  # noqa: F401
-
 # Output to a logger
 from codecarbon.output_methods.logger import (  # noqa: F401
     GoogleCloudLoggerOutput,
     LoggerOutput,
 )
-from codecarbon.output_methods.metrics.logfire import LogfireOutput  # noqa: F401
 
-# output is sent to metrics
-from codecarbon.output_methods.metrics.prometheus import PrometheusOutput  # noqa: F401
+_LAZY_OUTPUTS = {
+    # Output calling a REST http endpoint
+    "CodeCarbonAPIOutput": "codecarbon.output_methods.http",
+    "HTTPOutput": "codecarbon.output_methods.http",
+    # output is sent to metrics
+    "LogfireOutput": "codecarbon.output_methods.metrics.logfire",
+    "PrometheusOutput": "codecarbon.output_methods.metrics.prometheus",
+}
+
+
+def __getattr__(name):
+    module_name = _LAZY_OUTPUTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(module_name), name)
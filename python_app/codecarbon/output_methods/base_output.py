@@ -12,6 +12,8 @@ class BaseOutput:
         - `live_out` is used by live measurement events, e.g. the iterative update of prometheus metrics
         - `task_out` is used by terminate calls such as emissions_tracker.flush and emissions_tracker.stop, but uses
           emissions segregated by task
+    The `*_async` variants are used instead by the AsyncEmissionsTracker. They call the blocking methods by default,
+    strategies doing network I/O should override them so that they do not block the event loop.
     """
 
     def out(self, total: EmissionsData, delta: EmissionsData):
@@ -22,3 +24,12 @@ class BaseOutput:
 
     def task_out(self, data: List[TaskEmissionsData], experiment_name: str):
         pass
+
+    async def out_async(self, total: EmissionsData, delta: EmissionsData):
+        self.out(total, delta)
+
+    async def live_out_async(self, total: EmissionsData, delta: EmissionsData):
+        self.live_out(total, delta)
+
+    async def task_out_async(self, data: List[TaskEmissionsData], experiment_name: str):
+        self.task_out(data, experiment_name)
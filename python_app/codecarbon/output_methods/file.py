@@ -1,8 +1,6 @@
 import csv
 import os
-from typing import List
-
-import pandas as pd
+from typing import Dict, Iterable, List
 
 from codecarbon.core.util import backup
 from codecarbon.external.logger import logger
@@ -33,6 +31,23 @@ class FileOutput(BaseOutput):
             f"Emissions data (if any) will be saved to file {os.path.abspath(self.save_file_path)}"
         )
 
+    def _read_header(self) -> List[str]:
+        with open(self.save_file_path, newline="") as csv_file:
+            return next(csv.reader(csv_file), [])
+
+    def _read_rows(self) -> List[Dict[str, str]]:
+        with open(self.save_file_path, newline="") as csv_file:
+            return list(csv.DictReader(csv_file))
+
+    @staticmethod
+    def _write_rows(path: str, fieldnames: Iterable[str], rows: Iterable[Dict]):
+        with open(path, "w", newline="") as csv_file:
+            writer = csv.DictWriter(
+                csv_file, fieldnames=fieldnames, lineterminator="\n"
+            )
+            writer.writeheader()
+            writer.writerows(rows)
+
     def has_valid_headers(self, data: EmissionsData):
         with open(self.save_file_path) as csv_file:
             csv_reader = csv.DictReader(csv_file)
@@ -55,41 +70,40 @@ class FileOutput(BaseOutput):
             logger.warning("The CSV format has changed, backing up old emission file.")
             backup(self.save_file_path)
             file_exists = False
-        new_df = pd.DataFrame.from_records([dict(total.values)])
-        if not file_exists:
-            df = new_df
-        elif self.on_csv_write == "append":
-            df = pd.read_csv(self.save_file_path)
-            df = pd.concat([df, new_df])
-        else:
-            df = pd.read_csv(self.save_file_path)
-            df_run = df.loc[df.run_id == total.run_id]
-            if len(df_run) < 1:
-                df = pd.concat([df, new_df])
-            elif len(df_run) > 1:
+        new_row = dict(total.values)
+        fieldnames = list(new_row.keys())
+        if file_exists and self.on_csv_write == "update":
+            rows = self._read_rows()
+            run_rows = [
+                i for i, row in enumerate(rows) if row["run_id"] == total.run_id
+            ]
+            if len(run_rows) == 1:
+                rows[run_rows[0]] = new_row
+                self._write_rows(self.save_file_path, fieldnames, rows)
+                return
+            if len(run_rows) > 1:
                 logger.warning(
-                    f"CSV contains more than 1 ({len(df_run)})"
+                    f"CSV contains more than 1 ({len(run_rows)})"
                     + f" rows with current run ID ({total.run_id})."
                     + "Appending instead of updating."
                 )
-                df = pd.concat([df, new_df])
-            else:
-                df.at[df.run_id == total.run_id, total.values.keys()] = (
-                    total.values.values()
+        if file_exists and self._read_header() == fieldnames:
+            # Only the new row is written
+            with open(self.save_file_path, "a", newline="") as csv_file:
+                writer = csv.DictWriter(
+                    csv_file, fieldnames=fieldnames, lineterminator="\n"
                 )
-
-        df.to_csv(self.save_file_path, index=False)
+                writer.writerow(new_row)
+        else:
+            self._write_rows(self.save_file_path, fieldnames, [new_row])
 
     def task_out(self, data: List[TaskEmissionsData], experiment_name: str):
         run_id = data[0].run_id
         save_task_file_path = os.path.join(
             self.output_dir, "emissions_" + experiment_name + "_" + run_id + ".csv"
         )
-        df = pd.DataFrame(columns=data[0].values.keys())
-        new_df = pd.DataFrame.from_records(
-            [dict(data_point.values) for data_point in data]
+        self._write_rows(
+            save_task_file_path,
+            data[0].values.keys(),
+            (data_point.values for data_point in data),
         )
-        # Filter out empty or all-NA columns, to avoid warnings from Pandas
-        new_df = new_df.dropna(axis=1, how="all")
-        df = pd.concat([df, new_df], ignore_index=True)
-        df.to_csv(save_task_file_path, index=False)
@@ -1,3 +1,4 @@
+import asyncio
 import dataclasses
 import getpass
 
@@ -18,6 +19,7 @@ class HTTPOutput(BaseOutput):
 
     def __init__(self, endpoint_url: str):
         self.endpoint_url: str = endpoint_url
+        self._httpx_warned: bool = False
 
     def out(self, total: EmissionsData, delta: EmissionsData):
         try:
@@ -32,6 +34,33 @@ class HTTPOutput(BaseOutput):
         except Exception as e:
             logger.error(e, exc_info=True)
 
+    async def out_async(self, total: EmissionsData, delta: EmissionsData):
+        try:
+            from httpx import AsyncClient
+        except ImportError:
+            if not self._httpx_warned:
+                self._httpx_warned = True
+                logger.warning(
+                    "httpx is not installed, emissions are sent from a worker thread."
+                    + " Please install it using `pip install httpx`"
+                )
+            await asyncio.get_running_loop().run_in_executor(
+                None, self.out, total, delta
+            )
+            return
+        try:
+            payload = dataclasses.asdict(total)
+            payload["user"] = getpass.getuser()
+            async with AsyncClient(timeout=10) as client:
+                resp = await client.post(self.endpoint_url, json=payload)
+            if resp.status_code != 201:
+                logger.warning(
+                    "HTTP Output returned an unexpected status code: ",
+                    resp,
+                )
+        except Exception as e:
+            logger.error(e, exc_info=True)
+
 
 class CodeCarbonAPIOutput(BaseOutput):
     """
@@ -69,3 +98,15 @@ class CodeCarbonAPIOutput(BaseOutput):
             self.api.add_emission(dataclasses.asdict(delta))
         except Exception as e:
             logger.error(e, exc_info=True)
+
+    async def live_out_async(self, total: EmissionsData, delta: EmissionsData):
+        try:
+            await self.api.add_emission_async(dataclasses.asdict(delta))
+        except Exception as e:
+            logger.error(e, exc_info=True)
+
+    async def out_async(self, total: EmissionsData, delta: EmissionsData):
+        try:
+            await self.api.add_emission_async(dataclasses.asdict(delta))
+        except Exception as e:
+            logger.error(e, exc_info=True)
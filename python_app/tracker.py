@@ -1,17 +1,17 @@
 # python_app/tracker.py
 
+import importlib.util
 import uuid
 import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
 import requests
 from config import BACKEND_URL
 
-# CodeCarbon import with graceful fallback
-try:
-    from codecarbon import EmissionsTracker
-    CODECARBON_AVAILABLE = True
-except ImportError:
-    CODECARBON_AVAILABLE = False
+# CodeCarbon is only imported when a session starts, so that it does not delay
+# the login window; falls back to the estimation when it is missing
+CODECARBON_AVAILABLE = importlib.util.find_spec("codecarbon") is not None
+if not CODECARBON_AVAILABLE:
     print("WARNING: codecarbon not installed - emissions estimated from duration only")
 
 
@@ -88,6 +88,8 @@ class TrackerSession:
         if CODECARBON_AVAILABLE:
             try:
                 print("Starting CodeCarbon tracker...")
+                from codecarbon import EmissionsTracker
+
                 self.tracker = EmissionsTracker(
                     project_name="DesktopTracker",
                     output_dir=".",
@@ -106,22 +108,48 @@ class TrackerSession:
 
     # ── stop ──────────────────────────────────────────────────────────────────
 
-    def stop(self) -> dict | None:
+    def stop(self, wait: bool = True) -> dict | None | Future:
+        """
+        Stop the session, compute its emissions and upload them.
+        With wait=False the measures are taken right away, the rest runs in a
+        background thread and a Future of the result is returned, so that the
+        caller (e.g. the UI thread) is not blocked.
+        """
         if not self.running:
             print("Tracker was not running.")
-            return None
+            if wait:
+                return None
+            future = Future()
+            future.set_result(None)
+            return future
 
         duration_seconds = time.time() - self.start_time if self.start_time else 0
         self.running     = False
 
+        # Snapshot the CodeCarbon measures now, they are finalized in the background
+        codecarbon_future = None
+        if self._using_codecarbon and self.tracker is not None:
+            try:
+                print("Stopping CodeCarbon tracker...")
+                codecarbon_future = self.tracker.stop(wait=False)
+            except Exception as e:
+                print(f"WARNING: CodeCarbon stop() failed ({e}) – falling back to estimation")
+
+        if wait:
+            return self._finish_stop(duration_seconds, codecarbon_future)
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tracker-stop")
+        future   = executor.submit(self._finish_stop, duration_seconds, codecarbon_future)
+        executor.shutdown(wait=False)
+        return future
+
+    def _finish_stop(self, duration_seconds: float, codecarbon_future) -> dict | None:
         energy_kwh     = 0.0
         emissions_gco2 = 0.0
 
         # ── Try to get real measurements from CodeCarbon ──────────────────────
-        if self._using_codecarbon and self.tracker is not None:
+        if codecarbon_future is not None:
             try:
-                print("Stopping CodeCarbon tracker...")
-                emissions_kg = self.tracker.stop()
+                emissions_kg = codecarbon_future.result()
 
                 final_data = getattr(self.tracker, 'final_emissions_data', None)
 